@@ -1,7 +1,12 @@
 from django.contrib import admin
-from django.db.models import Count, Sum, Avg
+from django.db.models import Sum
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import AIServiceLog, AIServiceUsage, ServiceConfiguration
+from .models import (
+    AIServiceLog, AIServiceUsage, ServiceConfiguration, ExtractionCacheEntry, ServiceLatencyHistogram,
+    ServiceRollup, AggregationWatermark
+)
+from .rollups import get_rollups, summarize
 
 
 @admin.register(AIServiceLog)
@@ -165,6 +170,44 @@ class ServiceConfigurationAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(ExtractionCacheEntry)
+class ExtractionCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('content_hash_short', 'file_size', 'hit_count', 'last_accessed_at', 'created_at')
+    search_fields = ('content_hash',)
+    readonly_fields = ('content_hash', 'file_size', 'hit_count', 'last_accessed_at', 'created_at')
+    exclude = ('result',)
+    
+    def content_hash_short(self, obj):
+        return obj.content_hash[:12] + '...'
+    content_hash_short.short_description = 'Content Hash'
+
+
+@admin.register(ServiceRollup)
+class ServiceRollupAdmin(admin.ModelAdmin):
+    list_display = ('service_type', 'period', 'period_start', 'total_requests', 'failed_requests', 'total_cost')
+    list_filter = ('period', 'service_type')
+    date_hierarchy = 'period_start'
+    readonly_fields = (
+        'period', 'period_start', 'service_type', 'total_requests', 'successful_requests', 'failed_requests',
+        'failures_by_error_code', 'total_tokens', 'total_cost', 'updated_at'
+    )
+
+
+@admin.register(AggregationWatermark)
+class AggregationWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_id', 'last_timestamp', 'updated_at')
+    readonly_fields = ('name', 'last_id', 'last_timestamp', 'updated_at')
+
+
+@admin.register(ServiceLatencyHistogram)
+class ServiceLatencyHistogramAdmin(admin.ModelAdmin):
+    list_display = ('service_type', 'hour', 'count', 'min_time', 'max_time', 'updated_at')
+    list_filter = ('service_type',)
+    date_hierarchy = 'hour'
+    exclude = ('buckets',)
+    readonly_fields = ('service_type', 'hour', 'count', 'total_time', 'min_time', 'max_time', 'updated_at')
+
+
 # Custom admin view for analytics - create a simple proxy model
 class AIServiceAnalytics(AIServiceLog):
     """Proxy model for analytics view"""
@@ -198,14 +241,25 @@ class AIServiceAnalyticsAdmin(admin.ModelAdmin):
         week_ago = today - timedelta(days=7)
         month_ago = today - timedelta(days=30)
         
-        # Service usage by type
-        service_stats = AIServiceUsage.objects.filter(
-            date__gte=week_ago
-        ).values('service_type').annotate(
-            total_requests=Sum('total_requests'),
-            total_cost=Sum('total_cost'),
-            avg_success_rate=Avg('successful_requests') * 100 / Avg('total_requests')
-        ).order_by('-total_requests')
+        # Service usage by type (daily rollups)
+        week_rollups = list(get_rollups('day', timezone.now() - timedelta(days=7)))
+        rows_by_service = {}
+        for row in week_rollups:
+            rows_by_service.setdefault(row.service_type, []).append(row)
+        service_totals = {service_type: summarize(rows) for service_type, rows in rows_by_service.items()}
+        
+        service_stats = sorted(
+            [
+                {
+                    'service_type': service_type,
+                    'total_requests': totals.total_requests,
+                    'total_cost': totals.total_cost,
+                    'avg_success_rate': totals.success_rate,
+                }
+                for service_type, totals in service_totals.items()
+            ],
+            key=lambda stats: stats['total_requests'], reverse=True
+        )
         
         # Top users by usage
         top_users = AIServiceUsage.objects.filter(
@@ -218,20 +272,22 @@ class AIServiceAnalyticsAdmin(admin.ModelAdmin):
         ).order_by('-total_requests')[:10]
         
         # Error analysis
-        error_stats = AIServiceLog.objects.filter(
-            created_at__gte=week_ago,
-            status='failed'
-        ).values('service_type', 'error_code').annotate(
-            error_count=Count('id')
-        ).order_by('-error_count')
+        error_stats = sorted(
+            [
+                {'service_type': service_type, 'error_code': error_code, 'error_count': count}
+                for service_type, totals in service_totals.items()
+                for error_code, count in totals.failures_by_error_code.items()
+            ],
+            key=lambda stats: stats['error_count'], reverse=True
+        )
         
         # Daily trends
-        daily_stats = AIServiceUsage.objects.filter(
-            date__gte=week_ago
-        ).values('date').annotate(
-            total_requests=Sum('total_requests'),
-            total_cost=Sum('total_cost')
-        ).order_by('date')
+        daily_totals = {}
+        for row in week_rollups:
+            totals = daily_totals.setdefault(row.period_start.date(), {'total_requests': 0, 'total_cost': 0})
+            totals['total_requests'] += row.total_requests
+            totals['total_cost'] += row.total_cost
+        daily_stats = [{'date': date, **totals} for date, totals in sorted(daily_totals.items())]
         
         extra_context = extra_context or {}
         extra_context.update({
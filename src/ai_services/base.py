@@ -1,7 +1,12 @@
 import logging
+from decimal import Decimal
 from abc import ABC, abstractmethod
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from django.utils import timezone
 from .models import AIServiceLog, AIServiceUsage
+from .rate_limit import check_rate_limit
+from .log_buffer import record_log
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +24,8 @@ class BaseAIService(ABC):
         pass
     
     def create_log_entry(self, user=None, endpoint='', method='POST', request_size=0, **kwargs) -> AIServiceLog:
-        """Create a new log entry for the service call"""
-        return AIServiceLog.objects.create(
+        """Start an unsaved log entry for the service call; persist it with record_log once completed"""
+        return AIServiceLog(
             user=user,
             service_type=self.service_type,
             endpoint=endpoint,
@@ -29,66 +34,48 @@ class BaseAIService(ABC):
             **kwargs
         )
     
+    def record_log(self, log_entry: AIServiceLog):
+        """Queue a completed log entry for a batched write"""
+        record_log(log_entry)
+    
     def update_usage_stats(self, user, tokens=0, characters=0, cost=0, success=True):
-        """Update daily usage statistics"""
+        """Update daily usage statistics with an atomic increment"""
         if not user:
             return
         
-        today = timezone.now().date()
-        usage, created = AIServiceUsage.objects.get_or_create(
-            user=user,
-            date=today,
-            service_type=self.service_type,
-            defaults={
-                'total_requests': 0,
-                'successful_requests': 0,
-                'failed_requests': 0,
-                'total_tokens': 0,
-                'total_characters': 0,
-                'total_response_time': 0,
-                'total_cost': 0,
-            }
-        )
-        
-        # Update counters
-        usage.total_requests += 1
-        if success:
-            usage.successful_requests += 1
-        else:
-            usage.failed_requests += 1
+        lookup = {'user': user, 'date': timezone.now().date(), 'service_type': self.service_type}
+        increments = {
+            'total_requests': F('total_requests') + 1,
+            'successful_requests': F('successful_requests') + (1 if success else 0),
+            'failed_requests': F('failed_requests') + (0 if success else 1),
+            'total_tokens': F('total_tokens') + tokens,
+            'total_characters': F('total_characters') + characters,
+            'total_cost': F('total_cost') + Decimal(str(cost)),
+            'updated_at': timezone.now(),
+        }
         
-        usage.total_tokens += tokens
-        usage.total_characters += characters
-        usage.total_cost += cost
+        if AIServiceUsage.objects.filter(**lookup).update(**increments):
+            return
         
-        usage.save()
+        # First call of the day for this user and service
+        try:
+            with transaction.atomic():
+                AIServiceUsage.objects.create(
+                    total_requests=1,
+                    successful_requests=1 if success else 0,
+                    failed_requests=0 if success else 1,
+                    total_tokens=tokens,
+                    total_characters=characters,
+                    total_cost=Decimal(str(cost)),
+                    **lookup
+                )
+        except IntegrityError:
+            # Another worker created the row first
+            AIServiceUsage.objects.filter(**lookup).update(**increments)
     
     def check_rate_limits(self, user) -> bool:
-        """Check if user has exceeded rate limits"""
-        if not user:
-            return True
-        
-        today = timezone.now().date()
-        try:
-            usage = AIServiceUsage.objects.get(
-                user=user,
-                date=today,
-                service_type=self.service_type
-            )
-            
-            # Check daily limits based on subscription tier
-            daily_limits = {
-                'free': 50,
-                'pro': 500,
-                'edu': 1000,
-                'enterprise': 10000,
-            }
-            
-            limit = daily_limits.get(user.subscription_tier, 50)
-            return usage.total_requests < limit
-            
-        except AIServiceUsage.DoesNotExist:
-            return True
+        """Consume one request from the service and user rate limits"""
+        return check_rate_limit(self.service_type, user)
     
     def estimate_cost(self, tokens=0, characters=0, **kwargs) -> float:
         """Estimate the cost for the operation"""
@@ -102,12 +89,13 @@ class BaseAIService(ABC):
         
         log_entry.mark_completed(
             status='failed',
-            error_message=error_message
+            error_message=error_message,
+            save=False
         )
         
         if error_code:
             log_entry.error_code = error_code
-            log_entry.save()
+        self.record_log(log_entry)
     
     def validate_input(self, **kwargs) -> bool:
         """Validate input parameters"""
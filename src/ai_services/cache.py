@@ -0,0 +1,250 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Any, Optional
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import ExtractionCacheEntry
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def sha256_file(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """Compute the SHA-256 of a file without loading it into memory"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def increment_counter(key: str, amount: int = 1) -> None:
+    """Increment a shared counter in the Django cache"""
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+    except Exception as e:
+        logger.warning(f"Failed to increment cache counter {key}: {e}")
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache of Document Intelligence results keyed by file SHA-256
+    
+    Entries live in the database so every worker shares them. Entries older
+    than the TTL are treated as misses. Eviction of expired entries and of
+    the least recently used entries beyond max_entries runs periodically
+    (ai_services.tasks.evict_extraction_cache) rather than on every write.
+    """
+    
+    HITS_KEY = 'ai_services:extraction_cache:hits'
+    MISSES_KEY = 'ai_services:extraction_cache:misses'
+    
+    def __init__(self, max_entries: int = None, ttl: int = None):
+        self.max_entries = max_entries or getattr(settings, 'EXTRACTION_CACHE_MAX_ENTRIES', 1000)
+        self.ttl = ttl if ttl is not None else getattr(settings, 'EXTRACTION_CACHE_TTL', 30 * 24 * 3600)
+    
+    def get(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached extraction result or None on a miss"""
+        entry = ExtractionCacheEntry.objects.filter(content_hash=content_hash).first()
+        
+        if entry is None:
+            increment_counter(self.MISSES_KEY)
+            return None
+        
+        if self._is_expired(entry):
+            entry.delete()
+            increment_counter(self.MISSES_KEY)
+            return None
+        
+        ExtractionCacheEntry.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_accessed_at=timezone.now()
+        )
+        increment_counter(self.HITS_KEY)
+        
+        return entry.result
+    
+    def set(self, content_hash: str, result: Dict[str, Any], file_size: int = 0) -> None:
+        """Store an extraction result"""
+        ExtractionCacheEntry.objects.update_or_create(
+            content_hash=content_hash,
+            defaults={
+                'result': result,
+                'file_size': file_size,
+                'last_accessed_at': timezone.now(),
+            }
+        )
+    
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used entries beyond max_entries"""
+        deleted = 0
+        
+        if self.ttl:
+            cutoff = timezone.now() - timedelta(seconds=self.ttl)
+            deleted += ExtractionCacheEntry.objects.filter(created_at__lt=cutoff).delete()[0]
+        
+        overflow = ExtractionCacheEntry.objects.count() - self.max_entries
+        if overflow > 0:
+            stale_ids = list(
+                ExtractionCacheEntry.objects.order_by('last_accessed_at').values_list('id', flat=True)[:overflow]
+            )
+            deleted += ExtractionCacheEntry.objects.filter(id__in=stale_ids).delete()[0]
+        
+        if deleted:
+            logger.info(f"Evicted {deleted} extraction cache entries")
+        
+        return deleted
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and cache size"""
+        hits = cache.get(self.HITS_KEY, 0)
+        misses = cache.get(self.MISSES_KEY, 0)
+        lookups = hits + misses
+        
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'entries': ExtractionCacheEntry.objects.count(),
+        }
+    
+    def _is_expired(self, entry: ExtractionCacheEntry) -> bool:
+        if not self.ttl:
+            return False
+        return entry.created_at < timezone.now() - timedelta(seconds=self.ttl)
+
+
+class BaseCacheBackend:
+    """Interface for pluggable result cache backends"""
+    
+    def get(self, key: str):
+        raise NotImplementedError
+    
+    def set(self, key: str, value, timeout: int = None) -> None:
+        raise NotImplementedError
+    
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class LocalMemoryCacheBackend(BaseCacheBackend):
+    """Process-local LRU cache with per-entry TTL"""
+    
+    def __init__(self, max_entries: int = 1000, timeout: int = None, **kwargs):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value, timeout: int = None) -> None:
+        timeout = timeout if timeout is not None else self.timeout
+        expires_at = time.monotonic() + timeout if timeout else None
+        
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DjangoCacheBackend(BaseCacheBackend):
+    """Backend on top of a Django cache alias (Redis in production)"""
+    
+    def __init__(self, alias: str = 'default', timeout: int = None, **kwargs):
+        self.cache = caches[alias]
+        self.timeout = timeout
+    
+    def get(self, key: str):
+        return self.cache.get(key)
+    
+    def set(self, key: str, value, timeout: int = None) -> None:
+        self.cache.set(key, value, timeout if timeout is not None else self.timeout)
+    
+    def delete(self, key: str) -> None:
+        self.cache.delete(key)
+
+
+def get_cache_backend(backend_path: str, **options) -> BaseCacheBackend:
+    """Instantiate a cache backend from its dotted path"""
+    return import_string(backend_path)(**options)
+
+
+class SummaryCache:
+    """
+    Cache of generated summaries keyed on the text hash and prompt parameters
+    
+    The backend is configured with SUMMARY_CACHE_BACKEND and
+    SUMMARY_CACHE_OPTIONS. Hit/miss counters are kept in the Django cache.
+    """
+    
+    HITS_KEY = 'ai_services:summary_cache:hits'
+    MISSES_KEY = 'ai_services:summary_cache:misses'
+    
+    def __init__(self, backend: BaseCacheBackend = None):
+        self.backend = backend or get_cache_backend(
+            getattr(settings, 'SUMMARY_CACHE_BACKEND', 'ai_services.cache.DjangoCacheBackend'),
+            **getattr(settings, 'SUMMARY_CACHE_OPTIONS', {})
+        )
+    
+    @staticmethod
+    def make_key(text: str, style: str, length: str, subject_area: str,
+                 difficulty_level: str, deployment_name: str) -> str:
+        """Build the cache key for a summary request"""
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        params = '|'.join([
+            text_hash, style or '', length or '', subject_area or '',
+            difficulty_level or '', deployment_name or ''
+        ])
+        return f"ai_services:summary:{hashlib.sha256(params.encode('utf-8')).hexdigest()}"
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached summary result or None on a miss"""
+        try:
+            result = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {e}")
+            result = None
+        
+        increment_counter(self.HITS_KEY if result is not None else self.MISSES_KEY)
+        return result
+    
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a summary result"""
+        try:
+            self.backend.set(key, result)
+        except Exception as e:
+            logger.warning(f"Summary cache store failed: {e}")
+    
+    def hit_ratio(self) -> float:
+        """Get the hit ratio across all workers"""
+        hits = cache.get(self.HITS_KEY, 0)
+        misses = cache.get(self.MISSES_KEY, 0)
+        lookups = hits + misses
+        return round(hits / lookups, 4) if lookups else 0.0
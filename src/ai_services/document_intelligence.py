@@ -6,6 +6,7 @@ from azure.core.credentials import AzureKeyCredential
 from azure.core.exceptions import HttpResponseError
 from django.conf import settings
 from .base import BaseAIService, RateLimitExceeded, ServiceUnavailable, InvalidInput
+from .cache import ExtractionCache, sha256_file
 
 class DocumentIntelligenceService(BaseAIService):
     """Azure Document Intelligence service for text extraction"""
@@ -22,17 +23,24 @@ class DocumentIntelligenceService(BaseAIService):
             endpoint=self.endpoint,
             credential=AzureKeyCredential(self.api_key)
         )
+        
+        self.cache_enabled = getattr(settings, 'EXTRACTION_CACHE_ENABLED', True)
+        self.extraction_cache = ExtractionCache()
     
     def get_service_type(self) -> str:
         return 'document_intelligence'
     
-    def extract_text(self, file_path: str, user=None) -> Dict[str, Any]:
+    def extract_text(self, file_path: str, user=None, content_hash: str = None) -> Dict[str, Any]:
         """
         Extract text from a document file
         
+        Results are cached by the SHA-256 of the file content, so identical
+        uploads are served without another Azure round-trip.
+        
         Args:
             file_path: Path to the document file
             user: User making the request (for logging)
+            content_hash: Precomputed SHA-256 of the file, if known
             
         Returns:
             Dict containing extracted text and metadata
@@ -42,6 +50,14 @@ class DocumentIntelligenceService(BaseAIService):
         if not os.path.exists(file_path):
             raise InvalidInput(f"File not found: {file_path}")
         
+        # Serve identical files from the extraction cache
+        if self.cache_enabled:
+            content_hash = content_hash or sha256_file(file_path)
+            cached_result = self.extraction_cache.get(content_hash)
+            if cached_result is not None:
+                self.logger.info(f"Extraction cache hit for {content_hash[:12]}")
+                return dict(cached_result, content_hash=content_hash, cache_hit=True)
+        
         # Check rate limits
         if not self.check_rate_limits(user):
             raise RateLimitExceeded("Daily rate limit exceeded for Document Intelligence")
@@ -57,16 +73,14 @@ class DocumentIntelligenceService(BaseAIService):
         )
         
         try:
-            # Read the file
+            # Stream the file to the API instead of reading it into memory
             with open(file_path, 'rb') as file:
-                file_content = file.read()
-            
-            # Updated API call for newer Azure Document Intelligence SDK
-            poller = self.client.begin_analyze_document(
-                model_id="prebuilt-read",
-                body=file_content,
-                content_type="application/octet-stream"
-            )
+                # Updated API call for newer Azure Document Intelligence SDK
+                poller = self.client.begin_analyze_document(
+                    model_id="prebuilt-read",
+                    body=file,
+                    content_type="application/octet-stream"
+                )
             
             # Wait for completion
             result = poller.result()
@@ -81,12 +95,13 @@ class DocumentIntelligenceService(BaseAIService):
             # Update log entry
             log_entry.mark_completed(
                 status='success',
-                response_size=len(json.dumps(extracted_data))
+                response_size=len(json.dumps(extracted_data)),
+                save=False
             )
             log_entry.characters_processed = len(extracted_data.get('text', ''))
             log_entry.estimated_cost = estimated_cost
             log_entry.azure_operation_id = getattr(poller, 'operation_id', '')
-            log_entry.save()
+            self.record_log(log_entry)
             
             # Update usage stats
             self.update_usage_stats(
@@ -96,7 +111,14 @@ class DocumentIntelligenceService(BaseAIService):
                 success=True
             )
             
-            return extracted_data
+            if self.cache_enabled:
+                try:
+                    self.extraction_cache.set(content_hash, extracted_data, file_size=file_size)
+                except Exception as cache_error:
+                    # Caching is best-effort and must not fail the extraction
+                    self.logger.warning(f"Failed to cache extraction result: {cache_error}")
+            
+            return dict(extracted_data, content_hash=content_hash, cache_hit=False)
             
         except HttpResponseError as e:
             self.handle_error(log_entry, e, error_code=str(e.status_code))
@@ -150,12 +172,13 @@ class DocumentIntelligenceService(BaseAIService):
             # Update log entry
             log_entry.mark_completed(
                 status='success',
-                response_size=len(json.dumps(extracted_data))
+                response_size=len(json.dumps(extracted_data)),
+                save=False
             )
             log_entry.characters_processed = len(extracted_data.get('text', ''))
             log_entry.estimated_cost = estimated_cost
             log_entry.azure_operation_id = getattr(poller, 'operation_id', '')
-            log_entry.save()
+            self.record_log(log_entry)
             
             # Update usage stats
             self.update_usage_stats(
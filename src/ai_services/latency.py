@@ -0,0 +1,154 @@
+"""
+Mergeable response-time histograms
+
+Response times are counted in logarithmic buckets (bucket i covers
+(GAMMA^(i-1), GAMMA^i] milliseconds), so any quantile is estimated within
+RELATIVE_ACCURACY of the true value using a few hundred buckets at most.
+Histograms are persisted per service and hour in ServiceLatencyHistogram
+and merged by adding bucket counts, so a percentile over any window costs
+one row per hour rather than one per request.
+"""
+import logging
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+# Response times at or below this many milliseconds share bucket 0
+MIN_TRACKED_VALUE = 1.0
+
+
+def bucket_index(value: float) -> int:
+    """Bucket holding a response time in milliseconds"""
+    if value <= MIN_TRACKED_VALUE:
+        return 0
+    return math.ceil(math.log(value) / LOG_GAMMA)
+
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket, within RELATIVE_ACCURACY of anything in it"""
+    if index <= 0:
+        return MIN_TRACKED_VALUE
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+
+class LatencyHistogram:
+    """Sparse log-bucketed histogram of response times in milliseconds"""
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None, count: int = 0, total: float = 0.0,
+                 minimum: Optional[float] = None, maximum: Optional[float] = None):
+        self.buckets = defaultdict(int, buckets or {})
+        self.count = count
+        self.total = total
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, value: float, count: int = 1) -> None:
+        self.buckets[bucket_index(value)] += count
+        self.count += count
+        self.total += value * count
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Add other's counts into this histogram"""
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.minimum is not None:
+            self.minimum = other.minimum if self.minimum is None else min(self.minimum, other.minimum)
+        if other.maximum is not None:
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Estimated q-quantile (0 <= q <= 1), or 0 for an empty histogram"""
+        if not self.count:
+            return 0.0
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return min(max(bucket_value(index), self.minimum), self.maximum)
+        return self.maximum
+
+    def to_json(self) -> Dict[str, int]:
+        """Bucket counts keyed by index as strings, for a JSONField"""
+        return {str(index): count for index, count in self.buckets.items() if count}
+
+    @classmethod
+    def from_row(cls, row) -> 'LatencyHistogram':
+        return cls(
+            buckets={int(index): count for index, count in row.buckets.items()},
+            count=row.count,
+            total=row.total_time,
+            minimum=row.min_time,
+            maximum=row.max_time,
+        )
+
+
+def _hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def save_histograms(histograms: Dict[tuple, LatencyHistogram]) -> None:
+    """Merge {(service_type, hour): histogram} into the stored hourly rows"""
+    from .models import ServiceLatencyHistogram
+
+    for (service_type, hour), histogram in histograms.items():
+        with transaction.atomic():
+            row, _ = ServiceLatencyHistogram.objects.select_for_update().get_or_create(
+                service_type=service_type, hour=hour
+            )
+            merged = LatencyHistogram.from_row(row).merge(histogram)
+            row.buckets = merged.to_json()
+            row.count = merged.count
+            row.total_time = merged.total
+            row.min_time = merged.minimum
+            row.max_time = merged.maximum
+            row.save()
+
+
+def record_latencies(entries: Iterable) -> None:
+    """Add the response times of completed AIServiceLog entries to the hourly histograms"""
+    histograms = {}
+    for entry in entries:
+        if entry.response_time is None or entry.created_at is None:
+            continue
+        key = (entry.service_type, _hour(entry.created_at))
+        histograms.setdefault(key, LatencyHistogram()).add(entry.response_time)
+
+    if not histograms:
+        return
+
+    try:
+        save_histograms(histograms)
+    except Exception as e:
+        logger.error(f"Failed to update latency histograms: {str(e)}")
+
+
+def get_latency_histogram(service_type: str, start, end=None) -> LatencyHistogram:
+    """Merged histogram of the hourly buckets overlapping [start, end)"""
+    from .models import ServiceLatencyHistogram
+
+    rows = ServiceLatencyHistogram.objects.filter(service_type=service_type, hour__gte=_hour(start))
+    if end is not None:
+        rows = rows.filter(hour__lt=end)
+
+    histogram = LatencyHistogram()
+    for row in rows.iterator():
+        histogram.merge(LatencyHistogram.from_row(row))
+    return histogram
@@ -0,0 +1,148 @@
+"""
+Buffered writer for AIServiceLog
+
+Completed log entries are collected in process memory and written with a
+single bulk_create once AI_LOG_BUFFER_SIZE entries are queued or the oldest
+entry is AI_LOG_BUFFER_MAX_AGE seconds old. Pending entries are flushed at
+interpreter exit and on Celery worker shutdown. Entries whose request_id
+is already stored are skipped, so an entry that is flushed twice is stored
+and counted once. Response times of written entries are added to the
+hourly latency histograms.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.db import close_old_connections, connection
+from .latency import record_latencies
+from .models import AIServiceLog
+
+logger = logging.getLogger(__name__)
+
+
+class LogBuffer:
+    """Thread-safe in-memory queue of AIServiceLog instances"""
+
+    def __init__(self, max_size: int = 100, max_age: float = 5.0, max_pending: int = 10000):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_pending = max_pending
+        self._entries = []
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+        self._pid = os.getpid()
+
+    def add(self, entry: AIServiceLog) -> None:
+        """Queue a completed log entry"""
+        self._check_process()
+
+        with self._lock:
+            self._entries.append(entry)
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            should_flush = len(self._entries) >= self.max_size or self._is_stale()
+
+        self._ensure_flusher()
+        # Inside the caller's atomic block a rollback would also discard other
+        # threads' entries; those are left to the flusher thread or a later add
+        if should_flush and not connection.in_atomic_block:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all queued entries not stored yet; returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+                self._oldest_at = None
+
+            if not entries:
+                return 0
+
+            try:
+                # Entries stored by an earlier flush would be skipped by the insert but
+                # still counted in the latency histograms, so they are left out here
+                unique = list({entry.request_id: entry for entry in entries}.values())
+                stored = set(
+                    AIServiceLog.objects.filter(request_id__in=[entry.request_id for entry in unique])
+                    .values_list('request_id', flat=True)
+                )
+                new_entries = [entry for entry in unique if entry.request_id not in stored]
+                AIServiceLog.objects.bulk_create(new_entries, batch_size=500, ignore_conflicts=True)
+            except Exception as e:
+                logger.error(f"Failed to flush {len(entries)} AI service logs: {str(e)}")
+                # Keep the entries for the next flush, dropping the oldest beyond max_pending
+                with self._lock:
+                    self._entries = (entries + self._entries)[-self.max_pending:]
+                    if self._oldest_at is None:
+                        self._oldest_at = time.monotonic()
+                return 0
+            
+            record_latencies(new_entries)
+            return len(new_entries)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _is_stale(self) -> bool:
+        return self._oldest_at is not None and time.monotonic() - self._oldest_at >= self.max_age
+
+    def _check_process(self):
+        # Entries and the flusher thread belong to the parent after a fork
+        if self._pid != os.getpid():
+            self._entries = []
+            self._oldest_at = None
+            self._lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._flusher = None
+            self._pid = os.getpid()
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name='ai-log-flusher', daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.max_age)
+            if self._pid != os.getpid():
+                return
+            with self._lock:
+                stale = self._is_stale()
+            if stale:
+                close_old_connections()
+                self.flush()
+
+
+log_buffer = LogBuffer(
+    max_size=getattr(settings, 'AI_LOG_BUFFER_SIZE', 100),
+    max_age=getattr(settings, 'AI_LOG_BUFFER_MAX_AGE', 5.0)
+)
+
+
+def record_log(entry: AIServiceLog) -> None:
+    """Persist a completed log entry through the buffer, or directly when buffering is off"""
+    if getattr(settings, 'AI_LOG_BUFFER_ENABLED', True):
+        log_buffer.add(entry)
+    else:
+        entry.save()
+        record_latencies([entry])
+
+
+def flush_logs(**kwargs) -> int:
+    """Flush buffered log entries"""
+    return log_buffer.flush()
+
+
+atexit.register(flush_logs)
+worker_process_shutdown.connect(flush_logs, weak=False)
+worker_shutdown.connect(flush_logs, weak=False)
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from ai_services.latency import LatencyHistogram, save_histograms
+from ai_services.models import AIServiceLog, ServiceLatencyHistogram
+
+
+class Command(BaseCommand):
+    help = 'Rebuild hourly latency histograms from existing AI service logs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Rebuild the last N days')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Log rows read per database round trip')
+    
+    def handle(self, *args, **options):
+        start = (timezone.now() - timedelta(days=options['days'])).replace(minute=0, second=0, microsecond=0)
+        
+        deleted, _ = ServiceLatencyHistogram.objects.filter(hour__gte=start).delete()
+        
+        logs = AIServiceLog.objects.filter(
+            created_at__gte=start, response_time__isnull=False
+        ).order_by().values_list('service_type', 'created_at', 'response_time')
+        
+        histograms = {}
+        count = 0
+        for service_type, created_at, response_time in logs.iterator(chunk_size=options['chunk_size']):
+            key = (service_type, created_at.replace(minute=0, second=0, microsecond=0))
+            histograms.setdefault(key, LatencyHistogram()).add(response_time)
+            count += 1
+        
+        save_histograms(histograms)
+        self.stdout.write(
+            f"Replaced {deleted} histograms with {len(histograms)} built from {count} logs since {start:%Y-%m-%d %H:00}"
+        )
@@ -0,0 +1,71 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from ai_services.retrieval import SentenceIndex
+
+
+def legacy_extract_relevant_context(question, context, answer):
+    """The substring scan previously used by OpenAIService._extract_relevant_context"""
+    words = question.lower().split()
+    sentences = context.split('.')
+    
+    relevant_sentences = []
+    for sentence in sentences:
+        sentence_lower = sentence.lower()
+        if any(word in sentence_lower for word in words if len(word) > 3):
+            relevant_sentences.append(sentence.strip())
+            if len(relevant_sentences) >= 2:
+                break
+    
+    return '. '.join(relevant_sentences) + '.' if relevant_sentences else context[:200] + '...'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark answer context-snippet extraction on a synthetic large document'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--sentences', type=int, default=50000, help='Number of sentences in the document')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Number of distinct words')
+        parser.add_argument('--questions', type=int, default=50, help='Number of questions to time')
+        parser.add_argument('--seed', type=int, default=42)
+    
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [f"term{i}x" for i in range(options['vocabulary'])]
+        
+        text = ' '.join(
+            ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+            for _ in range(options['sentences'])
+        )
+        questions = [
+            ' '.join(rng.choice(vocabulary) for _ in range(5)) + '?'
+            for _ in range(options['questions'])
+        ]
+        answer = ' '.join(rng.choice(vocabulary) for _ in range(30))
+        
+        self.stdout.write(
+            f"Document: {len(text):,} characters, {options['sentences']:,} sentences; "
+            f"{len(questions)} questions"
+        )
+        
+        start = time.perf_counter()
+        for question in questions:
+            legacy_extract_relevant_context(question, text, answer)
+        legacy_ms = (time.perf_counter() - start) * 1000 / len(questions)
+        
+        start = time.perf_counter()
+        sentence_index = SentenceIndex.build(text)
+        build_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        for question in questions:
+            spans = sentence_index.lookup(question, answer, limit=2)
+            ' '.join(text[span_start:span_end] for span_start, span_end in spans)
+        indexed_ms = (time.perf_counter() - start) * 1000 / len(questions)
+        
+        self.stdout.write(f"Legacy scan:     {legacy_ms:10.3f} ms/question")
+        self.stdout.write(f"Index build:     {build_ms:10.3f} ms (once per document)")
+        self.stdout.write(f"Indexed lookup:  {indexed_ms:10.3f} ms/question")
+        self.stdout.write(self.style.SUCCESS(
+            f"Speedup: {legacy_ms / indexed_ms if indexed_ms else float('inf'):.1f}x per question"
+        ))
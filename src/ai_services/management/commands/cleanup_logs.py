@@ -1,15 +1,16 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from datetime import timedelta
 from ai_services.models import AIServiceLog
+from ai_services.retention import archive_expired_logs, get_policies
 
 class Command(BaseCommand):
-    help = 'Clean up old or test AI service logs'
-    
+    help = 'Archive and remove expired log rows, or remove test AI service logs'
+
     def add_arguments(self, parser):
         parser.add_argument('--test-only', action='store_true', help='Only remove test logs')
-        parser.add_argument('--days', type=int, default=1, help='Remove logs older than N days')
-    
+        parser.add_argument('--days', type=int, help='Remove logs older than N days instead of applying the per-level retention windows')
+        parser.add_argument('--model', choices=list(get_policies()), help='Only clean up this log model')
+        parser.add_argument('--dry-run', action='store_true', help='Count expired rows without archiving or deleting them')
+
     def handle(self, *args, **options):
         if options['test_only']:
             # Remove logs that look like test requests
@@ -20,9 +21,15 @@ class Command(BaseCommand):
             count = test_logs.count()
             test_logs.delete()
             self.stdout.write(f"Deleted {count} test logs")
-        else:
-            cutoff_date = timezone.now() - timedelta(days=options['days'])
-            old_logs = AIServiceLog.objects.filter(created_at__lt=cutoff_date)
-            count = old_logs.count()
-            old_logs.delete()
-            self.stdout.write(f"Deleted {count} logs older than {options['days']} days")
\ No newline at end of file
+            return
+
+        labels = [options['model']] if options['model'] else list(get_policies())
+        for label in labels:
+            report = archive_expired_logs(label, dry_run=options['dry_run'], days=options['days'])
+            if report['dry_run']:
+                self.stdout.write(f"{label}: {report['rows']} rows would be archived and deleted")
+            else:
+                self.stdout.write(
+                    f"{label}: archived and deleted {report['rows']} rows into {report['files']} files "
+                    f"({report['rows_per_second']} rows/s)"
+                )
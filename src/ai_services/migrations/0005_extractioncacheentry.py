@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0004_alter_aiservicelog_error_code_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the source file', max_length=64, unique=True)),
+                ('result', models.JSONField(help_text='Processed analysis result (text, confidence, tables, page_count)')),
+                ('file_size', models.PositiveBigIntegerField(default=0, help_text='Source file size in bytes')),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('last_accessed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Extraction Cache Entry',
+                'verbose_name_plural': 'Extraction Cache Entries',
+                'ordering': ['-last_accessed_at'],
+            },
+        ),
+    ]
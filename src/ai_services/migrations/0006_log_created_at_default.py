@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0005_extractioncacheentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aiservicelog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0006_log_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aiservicelog',
+            index=models.Index(fields=['service_type', 'created_at', 'status'], name='aisvclog_service_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aiservicelog',
+            index=models.Index(condition=models.Q(('status', 'failed')), fields=['service_type', 'created_at'], name='aisvclog_failed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aiserviceusage',
+            index=models.Index(fields=['date', 'service_type'], name='aisvcusage_date_service_idx'),
+        ),
+    ]
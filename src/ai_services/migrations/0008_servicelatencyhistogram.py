@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0007_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceLatencyHistogram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service_type', models.CharField(choices=[('document_intelligence', 'Document Intelligence'), ('openai_chat', 'OpenAI Chat Completion'), ('openai_embedding', 'OpenAI Embeddings'), ('speech_synthesis', 'Speech Synthesis'), ('speech_recognition', 'Speech Recognition')], max_length=30)),
+                ('hour', models.DateTimeField(help_text='Start of the hour the requests were made in')),
+                ('buckets', models.JSONField(default=dict)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_time', models.FloatField(default=0.0, help_text='Sum of response times in milliseconds')),
+                ('min_time', models.FloatField(blank=True, null=True)),
+                ('max_time', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Service Latency Histogram',
+                'verbose_name_plural': 'Service Latency Histograms',
+                'ordering': ['-hour'],
+                'unique_together': {('service_type', 'hour')},
+            },
+        ),
+    ]
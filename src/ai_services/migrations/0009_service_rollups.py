@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0008_servicelatencyhistogram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Aggregation Watermark',
+                'verbose_name_plural': 'Aggregation Watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='ServiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('period_start', models.DateTimeField(help_text='Start of the hour or UTC day')),
+                ('service_type', models.CharField(choices=[('document_intelligence', 'Document Intelligence'), ('openai_chat', 'OpenAI Chat Completion'), ('openai_embedding', 'OpenAI Embeddings'), ('speech_synthesis', 'Speech Synthesis'), ('speech_recognition', 'Speech Recognition')], max_length=30)),
+                ('total_requests', models.PositiveIntegerField(default=0)),
+                ('successful_requests', models.PositiveIntegerField(default=0)),
+                ('failed_requests', models.PositiveIntegerField(default=0)),
+                ('failures_by_error_code', models.JSONField(blank=True, default=dict)),
+                ('total_tokens', models.PositiveBigIntegerField(default=0)),
+                ('total_cost', models.DecimalField(decimal_places=6, default=0, max_digits=14)),
+                ('total_response_time', models.FloatField(default=0.0, help_text='Sum of response times in milliseconds')),
+                ('latency_buckets', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Service Rollup',
+                'verbose_name_plural': 'Service Rollups',
+                'ordering': ['-period_start'],
+                'unique_together': {('period', 'period_start', 'service_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0009_service_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aggregationwatermark',
+            name='last_timestamp',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0010_watermark_last_timestamp'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='servicerollup',
+            name='latency_buckets',
+        ),
+        migrations.RemoveField(
+            model_name='servicerollup',
+            name='total_response_time',
+        ),
+    ]
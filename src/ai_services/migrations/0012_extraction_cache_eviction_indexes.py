@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_services', '0011_rollup_drop_latency'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='extractioncacheentry',
+            index=models.Index(fields=['last_accessed_at'], name='extcache_accessed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='extractioncacheentry',
+            index=models.Index(fields=['created_at'], name='extcache_created_idx'),
+        ),
+    ]
@@ -1,9 +1,12 @@
 import uuid
 import time
+import logging
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 
 class AIServiceLog(models.Model):
     """Log all AI service calls for monitoring and billing"""
@@ -55,19 +58,30 @@ class AIServiceLog(models.Model):
     additional_data = models.JSONField(null=True, blank=True)
     
     # Timestamps
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set on construction rather than insert, since entries are written in batches
+    created_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'AI Service Log'
         verbose_name_plural = 'AI Service Logs'
+        indexes = [
+            # Health and performance metrics: one service over a recent window, split by status
+            models.Index(fields=['service_type', 'created_at', 'status'], name='aisvclog_service_time_idx'),
+            # Error-rate checks only count failures
+            models.Index(
+                fields=['service_type', 'created_at'],
+                name='aisvclog_failed_idx',
+                condition=models.Q(status='failed'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.service_type} - {self.status} - {self.created_at}"
     
-    def mark_completed(self, status='success', response_size=None, error_message=None):
-        """Mark the log entry as completed"""
+    def mark_completed(self, status='success', response_size=None, error_message=None, save=True):
+        """Mark the log entry as completed, saving it unless save is False"""
         self.status = status
         self.completed_at = timezone.now()
         if response_size:
@@ -78,17 +92,20 @@ class AIServiceLog(models.Model):
         # Calculate response time in milliseconds
         if self.created_at:
             self.response_time = (self.completed_at - self.created_at).total_seconds() * 1000
-    
-        self.save()
+        
+        if save:
+            self.save()
     
     @classmethod
     def log_request(cls, service_type, endpoint, success=True, error_message=None, **kwargs):
-        """Helper method to create log entries with proper defaults"""
+        """Helper method to create log entries with proper defaults; written through the log buffer"""
+        from .log_buffer import record_log
+        
         try:
             # Determine status based on success parameter
             status = 'success' if success else 'failed'
             
-            return cls.objects.create(
+            entry = cls(
                 service_type=service_type,
                 endpoint=endpoint,
                 status=status,
@@ -105,10 +122,13 @@ class AIServiceLog(models.Model):
                 characters_processed=kwargs.get('characters_processed'),
                 error_code=kwargs.get('error_code', ''),
                 additional_data=kwargs.get('additional_data'),
+                completed_at=timezone.now(),
             )
+            record_log(entry)
+            return entry
         except Exception as e:
-            # If logging fails, print error but don't crash the main operation
-            print(f"Failed to log AI service request: {e}")
+            # If logging fails, report it but don't crash the main operation
+            logger.error(f"Failed to log AI service request: {e}")
             return None
 
 
@@ -137,10 +157,15 @@ class AIServiceUsage(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
+        # The unique constraint also serves per-user lookups by (user, date, service_type)
         unique_together = ['user', 'date', 'service_type']
         ordering = ['-date']
         verbose_name = 'AI Service Usage'
         verbose_name_plural = 'AI Service Usage'
+        indexes = [
+            # Admin dashboards aggregate all users over a date range
+            models.Index(fields=['date', 'service_type'], name='aisvcusage_date_service_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user} - {self.service_type} - {self.date}"
@@ -173,3 +198,106 @@ class ServiceConfiguration(models.Model):
     
     def __str__(self):
         return f"{self.service_name} - {'Active' if self.is_active else 'Inactive'}"
+
+
+class ExtractionCacheEntry(models.Model):
+    """Content-addressed cache of Document Intelligence extraction results"""
+    
+    content_hash = models.CharField(max_length=64, unique=True, help_text="SHA-256 of the source file")
+    result = models.JSONField(help_text="Processed analysis result (text, confidence, tables, page_count)")
+    file_size = models.PositiveBigIntegerField(default=0, help_text="Source file size in bytes")
+    
+    # Usage tracking for LRU eviction
+    hit_count = models.PositiveIntegerField(default=0)
+    last_accessed_at = models.DateTimeField(default=timezone.now)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-last_accessed_at']
+        verbose_name = 'Extraction Cache Entry'
+        verbose_name_plural = 'Extraction Cache Entries'
+        indexes = [
+            # Eviction scans the oldest entries, by access for LRU and by creation for the TTL
+            models.Index(fields=['last_accessed_at'], name='extcache_accessed_idx'),
+            models.Index(fields=['created_at'], name='extcache_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]}... ({self.hit_count} hits)"
+
+
+class ServiceLatencyHistogram(models.Model):
+    """Hourly response-time histogram for one service (see ai_services.latency)"""
+    
+    service_type = models.CharField(max_length=30, choices=AIServiceLog.SERVICE_TYPES)
+    hour = models.DateTimeField(help_text="Start of the hour the requests were made in")
+    
+    # Sparse bucket counts keyed by bucket index
+    buckets = models.JSONField(default=dict)
+    count = models.PositiveIntegerField(default=0)
+    total_time = models.FloatField(default=0.0, help_text="Sum of response times in milliseconds")
+    min_time = models.FloatField(null=True, blank=True)
+    max_time = models.FloatField(null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['service_type', 'hour']
+        ordering = ['-hour']
+        verbose_name = 'Service Latency Histogram'
+        verbose_name_plural = 'Service Latency Histograms'
+    
+    def __str__(self):
+        return f"{self.service_type} - {self.hour} ({self.count} requests)"
+
+
+class ServiceRollup(models.Model):
+    """Hourly or daily aggregate of AIServiceLog for one service (see ai_services.rollups)"""
+    
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+    
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField(help_text="Start of the hour or UTC day")
+    service_type = models.CharField(max_length=30, choices=AIServiceLog.SERVICE_TYPES)
+    
+    # Request counts
+    total_requests = models.PositiveIntegerField(default=0)
+    successful_requests = models.PositiveIntegerField(default=0)
+    failed_requests = models.PositiveIntegerField(default=0)
+    failures_by_error_code = models.JSONField(default=dict, blank=True)
+    
+    # Usage and cost
+    total_tokens = models.PositiveBigIntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['period', 'period_start', 'service_type']
+        ordering = ['-period_start']
+        verbose_name = 'Service Rollup'
+        verbose_name_plural = 'Service Rollups'
+    
+    def __str__(self):
+        return f"{self.service_type} - {self.period} {self.period_start}"
+
+
+class AggregationWatermark(models.Model):
+    """Position up to which source rows have been folded into an aggregate, by id or by time"""
+    
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.PositiveBigIntegerField(default=0)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Aggregation Watermark'
+        verbose_name_plural = 'Aggregation Watermarks'
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
@@ -1,11 +1,14 @@
-import tiktoken
 import time
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
 from openai import AzureOpenAI
 from django.conf import settings
 from django.utils import timezone
 from .base import BaseAIService, RateLimitExceeded, ServiceUnavailable, InvalidInput
 from .models import AIServiceLog
+from .cache import SummaryCache
+from .retrieval import SentenceIndex
+from .registry import get_http_client, get_tokenizer
 
 
 class OpenAIService(BaseAIService):
@@ -18,20 +21,27 @@ class OpenAIService(BaseAIService):
         self.api_version = getattr(settings, 'AZURE_OPENAI_API_VERSION', '2024-02-01')
         self.deployment_name = getattr(settings, 'AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4')
         
+        # Map-reduce summarization settings for long documents
+        self.summary_chunk_tokens = getattr(settings, 'AZURE_OPENAI_SUMMARY_CHUNK_TOKENS', 6000)
+        self.summary_max_workers = getattr(settings, 'AZURE_OPENAI_SUMMARY_MAX_WORKERS', 4)
+        self.summary_max_passes = getattr(settings, 'AZURE_OPENAI_SUMMARY_MAX_PASSES', 4)
+        
+        # Cache of summaries keyed on text hash and prompt parameters
+        self.summary_cache = SummaryCache() if getattr(settings, 'SUMMARY_CACHE_ENABLED', True) else None
+        
         if not self.endpoint or not self.api_key:
             raise ValueError("Azure OpenAI endpoint and key must be configured")
         
+        # Shares the process-wide connection pool
         self.client = AzureOpenAI(
             azure_endpoint=self.endpoint,
             api_key=self.api_key,
-            api_version=self.api_version
+            api_version=self.api_version,
+            http_client=get_http_client()
         )
         
-        # Initialize tokenizer for cost calculation
-        try:
-            self.tokenizer = tiktoken.encoding_for_model("gpt-4")
-        except:
-            self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        # Tokenizer for cost calculation, loaded once per process
+        self.tokenizer = get_tokenizer()
     
     def get_service_type(self) -> str:
         return 'openai_chat'
@@ -43,11 +53,17 @@ class OpenAIService(BaseAIService):
         length: str = 'medium',
         subject_area: str = '',
         difficulty_level: str = 'intermediate',
-        user=None
+        user=None,
+        progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         """
         Generate a teacher-like summary of the provided text
         
+        Texts longer than AZURE_OPENAI_SUMMARY_CHUNK_TOKENS are summarized in
+        map-reduce mode: the text is split on token budgets, the chunks are
+        summarized concurrently and the partial summaries are combined in a
+        final reduce pass.
+        
         Args:
             text: The text to summarize
             style: Style of summary ('teacher', 'academic', 'simple')
@@ -55,6 +71,8 @@ class OpenAIService(BaseAIService):
             subject_area: Subject area context
             difficulty_level: Target difficulty level
             user: User making the request
+            progress_callback: Called as (completed, total, info) after each
+                chunk is summarized in map-reduce mode
             
         Returns:
             Dict containing the generated summary and metadata
@@ -64,6 +82,34 @@ class OpenAIService(BaseAIService):
         if not text or len(text.strip()) < 10:
             raise InvalidInput("Text must be at least 10 characters long")
         
+        # Serve identical requests from the summary cache
+        cache_key = None
+        if self.summary_cache:
+            cache_key = SummaryCache.make_key(
+                text, style, length, subject_area, difficulty_level, self.deployment_name
+            )
+            cached_result = self.summary_cache.get(cache_key)
+            if cached_result is not None:
+                try:
+                    AIServiceLog.log_request(
+                        service_type='openai_chat',
+                        endpoint=f"{self.endpoint}/openai/deployments/{self.deployment_name}/chat/completions",
+                        success=True,
+                        response_time=0.0,
+                        tokens_used=0,
+                        estimated_cost=0,
+                        user=user,
+                        additional_data=self._summary_cache_log_data(cache_hit=True)
+                    )
+                except Exception as log_error:
+                    self.logger.error(f"Logging error: {log_error}")
+                
+                # No tokens were spent on this request, whatever the original generation cost
+                return dict(
+                    cached_result, cache_hit=True, total_tokens=0, prompt_tokens=0, completion_tokens=0,
+                    estimated_cost=0, response_time=0.0
+                )
+        
         # Check rate limits
         if not self.check_rate_limits(user):
             raise RateLimitExceeded("Daily rate limit exceeded for OpenAI")
@@ -71,51 +117,50 @@ class OpenAIService(BaseAIService):
         # Calculate input tokens
         input_tokens = len(self.tokenizer.encode(text))
         
-        # Create log entry
-        log_entry = self.create_log_entry(
-            user=user,
-            endpoint=f"{self.endpoint}/openai/deployments/{self.deployment_name}/chat/completions",
-            request_size=len(text.encode('utf-8'))
-        )
+        start_time = time.time()
         
         try:
-            start_time = time.time()
             # Create the prompt based on parameters
             system_prompt = self._create_summary_prompt(style, length, subject_area, difficulty_level)
             
-            # Prepare messages
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Please summarize the following text:\n\n{text}"}
-            ]
-            
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.deployment_name,
-                messages=messages,
-                max_tokens=self._get_max_tokens_for_length(length),
-                temperature=0.7,
-                top_p=0.9,
-                frequency_penalty=0.0,
-                presence_penalty=0.0
-            )
+            if input_tokens > self.summary_chunk_tokens:
+                # Text does not fit a single request, summarize it in chunks
+                summary, usage, chunk_count = self._generate_map_reduce_summary(
+                    text, system_prompt, style, length, subject_area, difficulty_level,
+                    progress_callback=progress_callback
+                )
+            else:
+                response = self._create_summary_completion(
+                    system_prompt,
+                    f"Please summarize the following text:\n\n{text}",
+                    max_tokens=self._get_max_tokens_for_length(length)
+                )
+                summary = response.choices[0].message.content.strip()
+                usage = {
+                    'total_tokens': response.usage.total_tokens,
+                    'prompt_tokens': response.usage.prompt_tokens,
+                    'completion_tokens': response.usage.completion_tokens,
+                }
+                chunk_count = 1
             
             response_time = time.time() - start_time
             
-            # Extract the summary
-            summary = response.choices[0].message.content.strip()
-            
             result = {
                 'summary': summary,
-                'total_tokens': response.usage.total_tokens,
-                'prompt_tokens': response.usage.prompt_tokens,
-                'completion_tokens': response.usage.completion_tokens,
-                'estimated_cost': self._calculate_cost(response.usage.total_tokens),
+                'total_tokens': usage['total_tokens'],
+                'prompt_tokens': usage['prompt_tokens'],
+                'completion_tokens': usage['completion_tokens'],
+                'estimated_cost': self._calculate_cost(usage['total_tokens']),
                 'response_time': response_time,
                 'style': style,
-                'length': length
+                'length': length,
+                'input_tokens': input_tokens,
+                'chunk_count': chunk_count
             }
             
+            if cache_key:
+                self.summary_cache.set(cache_key, result)
+            
             # Log successful request
             try:
                 AIServiceLog.log_request(
@@ -123,14 +168,17 @@ class OpenAIService(BaseAIService):
                     endpoint=f"{self.endpoint}/openai/deployments/{self.deployment_name}/chat/completions",
                     success=True,
                     response_time=response_time,
-                    tokens_used=response.usage.total_tokens,
-                    estimated_cost=result['estimated_cost']
+                    tokens_used=usage['total_tokens'],
+                    estimated_cost=result['estimated_cost'],
+                    request_size=len(text.encode('utf-8')),
+                    user=user,
+                    additional_data=self._summary_cache_log_data(cache_hit=False)
                 )
             except Exception as log_error:
                 # Don't fail the main operation if logging fails
-                print(f"Logging error: {log_error}")
+                self.logger.error(f"Logging error: {log_error}")
             
-            return result
+            return dict(result, cache_hit=False)
             
         except Exception as e:
             response_time = time.time() - start_time
@@ -142,10 +190,12 @@ class OpenAIService(BaseAIService):
                     endpoint=f"{self.endpoint}/openai/deployments/{self.deployment_name}/chat/completions",
                     success=False,
                     error_message=str(e),
-                    response_time=response_time
+                    response_time=response_time,
+                    request_size=len(text.encode('utf-8')),
+                    user=user
                 )
             except Exception as log_error:
-                print(f"Logging error: {log_error}")
+                self.logger.error(f"Logging error: {log_error}")
             
             raise e
     
@@ -155,7 +205,9 @@ class OpenAIService(BaseAIService):
         context: str,
         summary: str = '',
         audio_timestamp: int = None,
-        user=None
+        user=None,
+        sentence_index=None,
+        source_text: str = None
     ) -> Dict[str, Any]:
         """
         Answer a question based on the document context
@@ -166,6 +218,8 @@ class OpenAIService(BaseAIService):
             summary: Document summary for additional context
             audio_timestamp: Timestamp in audio where question was asked
             user: User making the request
+            sentence_index: Prebuilt SentenceIndex over source_text for the context snippet
+            source_text: Full document text the sentence index was built from
             
         Returns:
             Dict containing the answer and metadata
@@ -190,28 +244,7 @@ class OpenAIService(BaseAIService):
         )
         
         try:
-            # Create the Q&A prompt
-            system_prompt = self._create_qa_prompt()
-            
-            # Prepare context (truncate if too long)
-            max_context_length = 8000  # Leave room for question and response
-            if len(context) > max_context_length:
-                context = context[:max_context_length] + "..."
-            
-            # Build user message
-            user_message = f"""Context from document:
-{context}
-
-{f"Summary: {summary}" if summary else ""}
-
-Question: {question}
-
-Please provide a clear, helpful answer based on the document content."""
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ]
+            messages, context = self._build_qa_messages(question, context, summary)
             
             # Call OpenAI API
             response = self.client.chat.completions.create(
@@ -230,7 +263,12 @@ Please provide a clear, helpful answer based on the document content."""
             estimated_cost = self.estimate_cost(tokens=total_tokens)
             
             # Extract relevant context snippet
-            context_snippet = self._extract_relevant_context(question, context, answer)
+            if sentence_index is not None and source_text is not None:
+                context_snippet, context_offsets = self._extract_relevant_context(
+                    question, source_text, answer, sentence_index=sentence_index
+                )
+            else:
+                context_snippet, context_offsets = self._extract_relevant_context(question, context, answer)
             
             # Calculate confidence based on response quality
             confidence = self._calculate_answer_confidence(answer, context)
@@ -238,12 +276,13 @@ Please provide a clear, helpful answer based on the document content."""
             # Update log entry
             log_entry.mark_completed(
                 status='success',
-                response_size=len(answer.encode('utf-8'))
+                response_size=len(answer.encode('utf-8')),
+                save=False
             )
             log_entry.tokens_used = total_tokens
             log_entry.estimated_cost = estimated_cost
             log_entry.azure_request_id = response.id
-            log_entry.save()
+            self.record_log(log_entry)
             
             # Update usage stats
             self.update_usage_stats(
@@ -256,6 +295,7 @@ Please provide a clear, helpful answer based on the document content."""
             return {
                 'answer': answer,
                 'context_snippet': context_snippet,
+                'context_offsets': context_offsets,
                 'confidence': confidence,
                 'tokens_used': total_tokens,
                 'estimated_cost': estimated_cost,
@@ -269,6 +309,155 @@ Please provide a clear, helpful answer based on the document content."""
                 raise RateLimitExceeded(f"OpenAI rate limit exceeded: {e}")
             raise ServiceUnavailable(f"OpenAI API error: {e}")
     
+    def stream_answer(
+        self,
+        question: str,
+        context: str,
+        summary: str = '',
+        audio_timestamp: int = None,
+        user=None,
+        sentence_index=None,
+        source_text: str = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Answer a question, yielding the answer as it is generated
+        
+        Yields {'type': 'delta', 'text': ...} for every content delta from the
+        streamed chat completion, then one {'type': 'done', ...} event carrying
+        the same fields answer_question returns.
+        """
+        
+        if not question or len(question.strip()) < 3:
+            raise InvalidInput("Question must be at least 3 characters long")
+        
+        if not context:
+            raise InvalidInput("Context is required to answer questions")
+        
+        if not self.check_rate_limits(user):
+            raise RateLimitExceeded("Daily rate limit exceeded for OpenAI")
+        
+        log_entry = self.create_log_entry(
+            user=user,
+            endpoint=f"{self.endpoint}/openai/deployments/{self.deployment_name}/chat/completions",
+            request_size=len(question.encode('utf-8')) + len(context.encode('utf-8'))
+        )
+        
+        try:
+            messages, context = self._build_qa_messages(question, context, summary)
+            
+            stream = self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=messages,
+                max_tokens=500,
+                temperature=0.3,
+                top_p=0.9,
+                stream=True
+            )
+            
+            parts = []
+            request_id = ''
+            try:
+                for chunk in stream:
+                    request_id = request_id or getattr(chunk, 'id', '') or ''
+                    # Azure sends content filter results in chunks without choices
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield {'type': 'delta', 'text': delta}
+            except GeneratorExit:
+                # The caller stopped reading; close the response so generation stops
+                stream.close()
+                log_entry.mark_completed(
+                    status='failed',
+                    response_size=len(''.join(parts).encode('utf-8')),
+                    error_message='Cancelled by client',
+                    save=False
+                )
+                log_entry.error_code = 'cancelled'
+                log_entry.azure_request_id = request_id
+                self.record_log(log_entry)
+                raise
+            
+            answer = ''.join(parts).strip()
+            
+            # Streamed responses carry no usage, so count tokens locally
+            total_tokens = sum(len(self.tokenizer.encode(message['content'])) for message in messages)
+            total_tokens += len(self.tokenizer.encode(answer))
+            estimated_cost = self.estimate_cost(tokens=total_tokens)
+            
+            if sentence_index is not None and source_text is not None:
+                context_snippet, context_offsets = self._extract_relevant_context(
+                    question, source_text, answer, sentence_index=sentence_index
+                )
+            else:
+                context_snippet, context_offsets = self._extract_relevant_context(question, context, answer)
+            
+            log_entry.mark_completed(
+                status='success',
+                response_size=len(answer.encode('utf-8')),
+                save=False
+            )
+            log_entry.tokens_used = total_tokens
+            log_entry.estimated_cost = estimated_cost
+            log_entry.azure_request_id = request_id
+            log_entry.additional_data = {'streamed': True}
+            self.record_log(log_entry)
+            
+            self.update_usage_stats(
+                user=user,
+                tokens=total_tokens,
+                cost=estimated_cost,
+                success=True
+            )
+            
+            yield {
+                'type': 'done',
+                'answer': answer,
+                'context_snippet': context_snippet,
+                'context_offsets': context_offsets,
+                'confidence': self._calculate_answer_confidence(answer, context),
+                'tokens_used': total_tokens,
+                'estimated_cost': estimated_cost,
+                'request_id': request_id,
+                'audio_timestamp': audio_timestamp
+            }
+            
+        except Exception as e:
+            self.handle_error(log_entry, e)
+            if "rate limit" in str(e).lower():
+                raise RateLimitExceeded(f"OpenAI rate limit exceeded: {e}")
+            raise ServiceUnavailable(f"OpenAI API error: {e}")
+    
+    def _build_qa_messages(self, question: str, context: str, summary: str = ''):
+        """Build the chat messages for a question; returns (messages, truncated context)"""
+        
+        # Create the Q&A prompt
+        system_prompt = self._create_qa_prompt()
+        
+        # Prepare context (truncate if too long)
+        max_context_length = 8000  # Leave room for question and response
+        if len(context) > max_context_length:
+            context = context[:max_context_length] + "..."
+        
+        # Build user message
+        user_message = f"""Context from document:
+{context}
+
+{f"Summary: {summary}" if summary else ""}
+
+Question: {question}
+
+Please provide a clear, helpful answer based on the document content."""
+        
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ]
+        
+        return messages, context
+    
     def _create_summary_prompt(self, style: str, length: str, subject_area: str, difficulty_level: str) -> str:
         """Create system prompt for summarization"""
         
@@ -328,22 +517,186 @@ Always base your response on the document content provided."""
             'long': 1200
         }
         return token_limits.get(length, 600)
-    
-    def _extract_relevant_context(self, question: str, context: str, answer: str) -> str:
-        """Extract relevant context snippet for the answer"""
-        # Simple implementation - find sentences containing key words from question
-        words = question.lower().split()
-        sentences = context.split('.')
-        
-        relevant_sentences = []
-        for sentence in sentences:
-            sentence_lower = sentence.lower()
-            if any(word in sentence_lower for word in words if len(word) > 3):
-                relevant_sentences.append(sentence.strip())
-                if len(relevant_sentences) >= 2:  # Limit to 2 sentences
-                    break
-        
-        return '. '.join(relevant_sentences) + '.' if relevant_sentences else context[:200] + '...'
+
+    def _summary_cache_log_data(self, cache_hit: bool) -> Dict[str, Any]:
+        """Cache metadata attached to summary AIServiceLog entries"""
+        if not self.summary_cache:
+            return None
+        return {
+            'cache': 'summary',
+            'cache_hit': cache_hit,
+            'hit_ratio': self.summary_cache.hit_ratio(),
+        }
+
+    def _create_summary_completion(self, system_prompt: str, user_content: str, max_tokens: int):
+        """Run a single summarization chat completion"""
+        return self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content}
+            ],
+            max_tokens=max_tokens,
+            temperature=0.7,
+            top_p=0.9,
+            frequency_penalty=0.0,
+            presence_penalty=0.0
+        )
+
+    def _split_text_by_tokens(self, text: str, max_tokens: int) -> List[str]:
+        """Split text into chunks of at most max_tokens, preferring paragraph boundaries"""
+        chunks = []
+        current_parts = []
+        current_tokens = 0
+
+        for paragraph in text.split('\n'):
+            if not paragraph.strip():
+                continue
+
+            tokens = self.tokenizer.encode(paragraph)
+
+            # A single paragraph larger than the budget is split on raw token windows
+            if len(tokens) > max_tokens:
+                if current_parts:
+                    chunks.append('\n'.join(current_parts))
+                    current_parts, current_tokens = [], 0
+                for start in range(0, len(tokens), max_tokens):
+                    chunks.append(self.tokenizer.decode(tokens[start:start + max_tokens]))
+                continue
+
+            if current_tokens + len(tokens) > max_tokens and current_parts:
+                chunks.append('\n'.join(current_parts))
+                current_parts, current_tokens = [], 0
+
+            current_parts.append(paragraph)
+            current_tokens += len(tokens)
+
+        if current_parts:
+            chunks.append('\n'.join(current_parts))
+
+        return chunks
+
+    def _summarize_chunk(self, chunk: str, index: int, total: int, style: str,
+                         subject_area: str, difficulty_level: str) -> Dict[str, Any]:
+        """Summarize one chunk of a long document (map step)"""
+        system_prompt = " ".join([
+            self._create_summary_prompt(style, 'short', subject_area, difficulty_level),
+            f"You are summarizing section {index + 1} of {total} of a longer document.",
+            "Capture every key concept, definition and example in this section so it can be combined with the other sections later."
+        ])
+        response = self._create_summary_completion(
+            system_prompt,
+            f"Please summarize the following section:\n\n{chunk}",
+            max_tokens=self._get_max_tokens_for_length('medium')
+        )
+        return {
+            'index': index,
+            'summary': response.choices[0].message.content.strip(),
+            'total_tokens': response.usage.total_tokens,
+            'prompt_tokens': response.usage.prompt_tokens,
+            'completion_tokens': response.usage.completion_tokens,
+        }
+
+    def _generate_map_reduce_summary(
+        self,
+        text: str,
+        system_prompt: str,
+        style: str,
+        length: str,
+        subject_area: str,
+        difficulty_level: str,
+        progress_callback=None
+    ):
+        """
+        Summarize a long text by summarizing token-bounded chunks concurrently
+        and combining the partial summaries in a reduce pass
+
+        Fails with ServiceUnavailable when a map pass does not shorten the
+        text or AZURE_OPENAI_SUMMARY_MAX_PASSES passes are not enough.
+
+        Returns:
+            Tuple of (summary, usage dict, number of chunks in the first map pass)
+        """
+        usage = {'total_tokens': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        chunks = self._split_text_by_tokens(text, self.summary_chunk_tokens)
+        chunk_count = len(chunks)
+        combined = text
+        combined_tokens = len(self.tokenizer.encode(text))
+        passes = 0
+
+        # Map passes: repeat until the partial summaries fit a single reduce request
+        while len(chunks) > 1 or combined_tokens > self.summary_chunk_tokens:
+            if passes >= self.summary_max_passes:
+                raise ServiceUnavailable(
+                    f"Partial summaries still exceed {self.summary_chunk_tokens} tokens after {passes} map passes"
+                )
+            passes += 1
+            partial_summaries = [None] * len(chunks)
+
+            with ThreadPoolExecutor(max_workers=min(self.summary_max_workers, len(chunks))) as executor:
+                futures = [
+                    executor.submit(
+                        self._summarize_chunk, chunk, index, len(chunks),
+                        style, subject_area, difficulty_level
+                    )
+                    for index, chunk in enumerate(chunks)
+                ]
+
+                # Callbacks run on this thread so they can safely use the database
+                for completed, future in enumerate(as_completed(futures), start=1):
+                    chunk_result = future.result()
+                    partial_summaries[chunk_result['index']] = chunk_result['summary']
+                    for key in usage:
+                        usage[key] += chunk_result[key]
+
+                    if progress_callback:
+                        progress_callback(completed, len(chunks), chunk_result)
+
+            combined = "\n\n".join(
+                f"Section {index + 1}:\n{summary}" for index, summary in enumerate(partial_summaries)
+            )
+            previous_tokens, combined_tokens = combined_tokens, len(self.tokenizer.encode(combined))
+            # Partial summaries as long as their input would never converge
+            if combined_tokens >= previous_tokens:
+                raise ServiceUnavailable(
+                    f"Map pass did not shorten the text ({previous_tokens} to {combined_tokens} tokens)"
+                )
+            chunks = self._split_text_by_tokens(combined, self.summary_chunk_tokens)
+
+        # Reduce pass: merge the section summaries into the final summary
+        response = self._create_summary_completion(
+            system_prompt,
+            "The following are summaries of consecutive sections of one document. "
+            f"Combine them into a single cohesive summary of the whole document:\n\n{combined}",
+            max_tokens=self._get_max_tokens_for_length(length)
+        )
+        usage['total_tokens'] += response.usage.total_tokens
+        usage['prompt_tokens'] += response.usage.prompt_tokens
+        usage['completion_tokens'] += response.usage.completion_tokens
+
+        return response.choices[0].message.content.strip(), usage, chunk_count
+
+    def _extract_relevant_context(
+        self,
+        question: str,
+        context: str,
+        answer: str,
+        sentence_index: SentenceIndex = None
+    ) -> Tuple[str, List[List[int]]]:
+        """
+        Extract relevant context snippet for the answer
+        
+        Returns:
+            Tuple of (snippet text, [start, end] character offsets into context)
+        """
+        if sentence_index is None:
+            sentence_index = SentenceIndex.build(context)
+        
+        spans = sentence_index.lookup(question, answer, limit=2)
+        if not spans:
+            return context[:200] + '...', [[0, min(200, len(context))]]
+        
+        return ' '.join(context[start:end] for start, end in spans), [[start, end] for start, end in spans]
     
     def _calculate_answer_confidence(self, answer: str, context: str) -> float:
         """Calculate confidence score for the answer"""
@@ -0,0 +1,215 @@
+"""
+Rate limiting for AI service calls
+
+Two limits are enforced on every call:
+
+* a per-service token bucket sized from ServiceConfiguration.requests_per_minute,
+  shared by all users and workers, protecting the Azure quota;
+* a per-user daily request counter whose limit depends on the subscription tier.
+
+Both are checked and consumed atomically, in Redis for deployments with
+several workers or in process memory for development and tests.
+"""
+import logging
+import threading
+import time
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .cache import LocalMemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DAILY_LIMITS = {
+    'free': 50,
+    'pro': 500,
+    'edu': 1000,
+    'enterprise': 10000,
+}
+
+DAILY_KEY_TTL = 2 * 24 * 3600
+
+
+def get_daily_limit(user) -> int:
+    """Daily request limit for a user's subscription tier"""
+    limits = getattr(settings, 'AI_DAILY_REQUEST_LIMITS', DEFAULT_DAILY_LIMITS)
+    return limits.get(getattr(user, 'subscription_tier', 'free'), limits.get('free', 50))
+
+
+# requests_per_minute per service, refreshed every minute
+_service_limits = LocalMemoryCacheBackend(max_entries=32, timeout=60)
+
+
+def get_requests_per_minute(service_type: str):
+    """Per-minute limit from the active ServiceConfiguration, or the settings default"""
+    limit = _service_limits.get(service_type)
+    if limit is None:
+        from .models import ServiceConfiguration
+
+        limit = ServiceConfiguration.objects.filter(
+            service_name=service_type, is_active=True
+        ).values_list('requests_per_minute', flat=True).first()
+        if limit is None:
+            limit = getattr(settings, 'AI_DEFAULT_REQUESTS_PER_MINUTE', 0)
+        _service_limits.set(service_type, limit)
+
+    return limit or None
+
+
+class BaseRateLimiter:
+    """Interface for rate limiter backends"""
+
+    def acquire(self, bucket_key: str, requests_per_minute, daily_key: str = None, daily_limit: int = None) -> bool:
+        """
+        Take one request from the bucket and the daily counter
+
+        Nothing is consumed when either limit would be exceeded.
+
+        Args:
+            bucket_key: Token bucket key, None to skip the per-minute limit
+            requests_per_minute: Bucket capacity and refill rate
+            daily_key: Daily counter key, None to skip the daily limit
+            daily_limit: Maximum requests counted under daily_key
+        """
+        raise NotImplementedError
+
+    def daily_count(self, daily_key: str) -> int:
+        raise NotImplementedError
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """Process-local limiter for development and tests"""
+
+    def __init__(self, **kwargs):
+        self._buckets = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, bucket_key, requests_per_minute, daily_key=None, daily_limit=None) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if daily_key and self._counters.get(daily_key, 0) >= daily_limit:
+                return False
+
+            if bucket_key and requests_per_minute:
+                tokens, updated_at = self._buckets.get(bucket_key, (float(requests_per_minute), now))
+                tokens = min(float(requests_per_minute), tokens + (now - updated_at) * requests_per_minute / 60.0)
+                if tokens < 1:
+                    self._buckets[bucket_key] = (tokens, now)
+                    return False
+                self._buckets[bucket_key] = (tokens - 1, now)
+
+            if daily_key:
+                self._counters[daily_key] = self._counters.get(daily_key, 0) + 1
+
+            return True
+
+    def daily_count(self, daily_key: str) -> int:
+        with self._lock:
+            return self._counters.get(daily_key, 0)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._counters.clear()
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """Limiter shared by all workers, evaluated in one Lua script per call"""
+
+    # KEYS[1] bucket, KEYS[2] daily counter
+    # ARGV: capacity (0 disables), now (seconds), daily limit (0 disables), daily ttl
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local now = tonumber(ARGV[2])
+local daily_limit = tonumber(ARGV[3])
+
+if daily_limit > 0 then
+    local used = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if used >= daily_limit then
+        return 0
+    end
+end
+
+if capacity > 0 then
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(bucket[1]) or capacity
+    local updated_at = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * capacity / 60.0)
+    if tokens < 1 then
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+        redis.call('EXPIRE', KEYS[1], 120)
+        return 0
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated_at', now)
+    redis.call('EXPIRE', KEYS[1], 120)
+end
+
+if daily_limit > 0 then
+    redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], tonumber(ARGV[4]))
+end
+
+return 1
+"""
+
+    def __init__(self, url: str = None, **kwargs):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def acquire(self, bucket_key, requests_per_minute, daily_key=None, daily_limit=None) -> bool:
+        allowed = self.script(
+            keys=[bucket_key or 'ratelimit:unused', daily_key or 'ratelimit:unused'],
+            args=[
+                requests_per_minute if bucket_key and requests_per_minute else 0,
+                time.time(),
+                daily_limit if daily_key else 0,
+                DAILY_KEY_TTL,
+            ]
+        )
+        return bool(allowed)
+
+    def daily_count(self, daily_key: str) -> int:
+        return int(self.client.get(daily_key) or 0)
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> BaseRateLimiter:
+    """Configured rate limiter, created once per process"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            backend = import_string(getattr(settings, 'AI_RATE_LIMITER_BACKEND', 'ai_services.rate_limit.RedisRateLimiter'))
+            _limiter = backend(**getattr(settings, 'AI_RATE_LIMITER_OPTIONS', {}))
+        return _limiter
+
+
+def check_rate_limit(service_type: str, user=None) -> bool:
+    """
+    Consume one request for service_type on behalf of user
+
+    Returns False when the service's per-minute limit or the user's daily
+    limit is exhausted. Errors reaching the limiter backend are logged and
+    the request is allowed.
+    """
+    daily_key = None
+    daily_limit = None
+    if user is not None:
+        daily_key = f"ratelimit:daily:{service_type}:{user.pk}:{timezone.now().date().isoformat()}"
+        daily_limit = get_daily_limit(user)
+
+    try:
+        return get_rate_limiter().acquire(
+            bucket_key=f"ratelimit:bucket:{service_type}",
+            requests_per_minute=get_requests_per_minute(service_type),
+            daily_key=daily_key,
+            daily_limit=daily_limit
+        )
+    except Exception as e:
+        logger.warning(f"Rate limiter unavailable, allowing {service_type} request: {str(e)}")
+        return True
@@ -0,0 +1,123 @@
+"""
+Per-process registry of shared AI service clients
+
+Services, the pooled HTTP client and the tokenizer are created lazily on
+first use and reused by every task running in the process. The registry
+is cleared in a forked child (prefork Celery workers) so connections are
+never shared across processes.
+"""
+import logging
+import os
+import threading
+import httpx
+import tiktoken
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_services = {}
+_http_client = None
+_tokenizer = None
+_owner_pid = os.getpid()
+
+
+def _ensure_process():
+    """Drop state inherited from a parent process"""
+    global _lock, _http_client, _tokenizer, _owner_pid
+    if _owner_pid != os.getpid():
+        # The parent's lock may have been held by another thread at fork time
+        _lock = threading.RLock()
+        _services.clear()
+        _http_client = None
+        _tokenizer = None
+        _owner_pid = os.getpid()
+
+
+def _clear(close: bool):
+    global _http_client, _tokenizer
+    with _lock:
+        if close and _http_client is not None:
+            try:
+                _http_client.close()
+            except Exception as e:
+                logger.warning(f"Failed to close shared HTTP client: {str(e)}")
+        _services.clear()
+        _http_client = None
+        _tokenizer = None
+
+
+def reset(close: bool = True):
+    """Discard all shared clients; they are recreated on next use"""
+    _clear(close)
+
+
+def get_http_client() -> httpx.Client:
+    """Shared keep-alive HTTP client for Azure OpenAI"""
+    global _http_client
+    _ensure_process()
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=getattr(settings, 'AZURE_HTTP_MAX_CONNECTIONS', 20),
+                    max_keepalive_connections=getattr(settings, 'AZURE_HTTP_MAX_KEEPALIVE_CONNECTIONS', 10)
+                ),
+                timeout=getattr(settings, 'AZURE_HTTP_TIMEOUT', 120)
+            )
+        return _http_client
+
+
+def get_tokenizer():
+    """tiktoken encoding used for token counting, loaded once per process"""
+    global _tokenizer
+    _ensure_process()
+    with _lock:
+        if _tokenizer is None:
+            try:
+                _tokenizer = tiktoken.encoding_for_model("gpt-4")
+            except Exception:
+                _tokenizer = tiktoken.get_encoding("cl100k_base")
+        return _tokenizer
+
+
+def get_service(service_class):
+    """Shared instance of service_class for this process"""
+    _ensure_process()
+    with _lock:
+        service = _services.get(service_class)
+        if service is None:
+            service = service_class()
+            _services[service_class] = service
+        return service
+
+
+def get_openai_service():
+    from .openai_service import OpenAIService
+    return get_service(OpenAIService)
+
+
+def get_speech_service():
+    from .speech_service import SpeechService
+    return get_service(SpeechService)
+
+
+def get_document_intelligence_service():
+    from .document_intelligence import DocumentIntelligenceService
+    return get_service(DocumentIntelligenceService)
+
+
+# Children must not reuse sockets opened by the parent
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_ensure_process)
+
+
+@worker_process_init.connect
+def _reset_on_worker_init(**kwargs):
+    reset(close=False)
+
+
+@worker_process_shutdown.connect
+def _close_on_worker_shutdown(**kwargs):
+    reset(close=True)
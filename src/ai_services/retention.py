@@ -0,0 +1,142 @@
+"""
+Retention for the log tables
+
+Each model in LOG_RETENTION keeps its rows for a number of days that
+depends on the row's level, so errors can outlive routine entries. Expired
+rows are read in id order, LOG_RETENTION_BATCH_SIZE at a time. Every batch
+is written to gzipped JSONL files partitioned by day under
+MEDIA_ROOT/LOG_ARCHIVE_DIR/<model>/<yyyy>/<mm>/<dd>/ and then deleted with
+one DELETE, so the hot tables stay small without one huge delete.
+
+A policy may name an AggregationWatermark; rows past it have not been
+folded into their aggregates yet and are never removed.
+"""
+import gzip
+import json
+import logging
+import time
+from datetime import timedelta, timezone as dt_timezone
+from typing import Dict, List
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def get_policies() -> Dict[str, dict]:
+    """Retention policies keyed by lower-case model label"""
+    return getattr(settings, 'LOG_RETENTION', {})
+
+
+def expired_rows(label: str, policy: dict, now=None, days: int = None):
+    """Queryset of the rows of one model past their retention window, or older than days if given"""
+    from .models import AggregationWatermark
+
+    model = apps.get_model(label)
+    now = now or timezone.now()
+    time_field = policy['time_field']
+    level_field = policy['level_field']
+    windows = policy['days']
+
+    if days is not None:
+        condition = Q(**{f'{time_field}__lt': now - timedelta(days=days)})
+    else:
+        # One window per listed level; unlisted levels get the longest one
+        condition = ~Q(**{f'{level_field}__in': list(windows)}) & Q(**{
+            f'{time_field}__lt': now - timedelta(days=max(windows.values()))
+        })
+        for level, level_days in windows.items():
+            condition |= Q(**{level_field: level, f'{time_field}__lt': now - timedelta(days=level_days)})
+
+    rows = model.objects.filter(condition)
+
+    watermark_name = policy.get('watermark')
+    if watermark_name:
+        last_id = AggregationWatermark.objects.filter(name=watermark_name).values_list('last_id', flat=True).first()
+        rows = rows.filter(id__lte=last_id or 0)
+
+    return rows.order_by('id')
+
+
+def _archive_name(label: str, day, first_id: int, last_id: int) -> str:
+    archive_dir = getattr(settings, 'LOG_ARCHIVE_DIR', 'archives/logs')
+    return f"{archive_dir}/{label}/{day:%Y/%m/%d}/{label.split('.')[-1]}-{first_id}-{last_id}.jsonl.gz"
+
+
+def write_archive(label: str, time_field: str, rows: List[dict], storage=default_storage) -> List[str]:
+    """Write rows to one gzipped JSONL file per UTC day; returns the storage names"""
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row[time_field].astimezone(dt_timezone.utc).date(), []).append(row)
+
+    names = []
+    for day, day_rows in sorted(partitions.items()):
+        lines = ''.join(json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in day_rows)
+        name = _archive_name(label, day, day_rows[0]['id'], day_rows[-1]['id'])
+        # A batch archived before an interrupted delete is written again under the same name
+        if storage.exists(name):
+            storage.delete(name)
+        names.append(storage.save(name, ContentFile(gzip.compress(lines.encode('utf-8')))))
+    return names
+
+
+def archive_expired_logs(label: str, dry_run: bool = False, batch_size: int = None, days: int = None) -> Dict:
+    """
+    Archive and delete the expired rows of one model
+
+    days overrides the per-level windows with a single one.
+
+    Returns:
+        Report with rows archived, files written, elapsed time and rows per second
+    """
+    policy = get_policies()[label]
+    batch_size = batch_size or getattr(settings, 'LOG_RETENTION_BATCH_SIZE', 2000)
+    model = apps.get_model(label)
+    fields = [field.attname for field in model._meta.concrete_fields]
+    started = time.monotonic()
+    report = {'dry_run': dry_run, 'rows': 0, 'files': 0}
+
+    rows = expired_rows(label, policy, days=days)
+    if dry_run:
+        report['rows'] = rows.count()
+    else:
+        last_id = 0
+        while True:
+            batch = list(rows.filter(id__gt=last_id).values(*fields)[:batch_size])
+            if not batch:
+                break
+
+            last_id = batch[-1]['id']
+            report['files'] += len(write_archive(label, policy['time_field'], batch))
+            with transaction.atomic():
+                model.objects.filter(id__in=[row['id'] for row in batch]).delete()
+            report['rows'] += len(batch)
+
+            if len(batch) < batch_size:
+                break
+
+    elapsed = time.monotonic() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['rows'] / elapsed, 1) if elapsed > 0 else float(report['rows'])
+    logger.info(
+        f"Log retention {'dry run ' if dry_run else ''}for {label}: {report['rows']} rows, "
+        f"{report['files']} archive files ({report['rows_per_second']} rows/s)."
+    )
+    return report
+
+
+def archive_all_expired_logs(dry_run: bool = False) -> Dict[str, Dict]:
+    """Apply every configured retention policy; returns the report per model"""
+    reports = {}
+    for label in get_policies():
+        try:
+            reports[label] = archive_expired_logs(label, dry_run=dry_run)
+        except Exception as e:
+            logger.error(f"Log retention failed for {label}: {str(e)}")
+    return reports
@@ -0,0 +1,282 @@
+import heapq
+import json
+import math
+import re
+import sys
+import zlib
+from array import array
+from collections import Counter
+from typing import List, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+WORD_PATTERN = re.compile(r"\S+")
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'can', 'do', 'does', 'for',
+    'from', 'how', 'in', 'into', 'is', 'it', 'its', 'of', 'on', 'or', 'that', 'the',
+    'their', 'then', 'there', 'these', 'this', 'to', 'was', 'were', 'what', 'when',
+    'where', 'which', 'who', 'why', 'will', 'with',
+])
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stop words"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def split_passages(text: str, passage_words: int = 120, overlap_words: int = 20) -> List[Tuple[int, int]]:
+    """
+    Split text into overlapping passages of roughly passage_words words
+
+    Returns:
+        List of (start, end) character offsets into text
+    """
+    words = [(match.start(), match.end()) for match in WORD_PATTERN.finditer(text)]
+    if not words:
+        return []
+
+    step = max(passage_words - overlap_words, 1)
+    passages = []
+    for first in range(0, len(words), step):
+        last = min(first + passage_words, len(words)) - 1
+        passages.append((words[first][0], words[last][1]))
+        if last == len(words) - 1:
+            break
+
+    return passages
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def _pack(terms: List[str], arrays: dict) -> bytes:
+    """Serialize a term list and named arrays into one zlib-compressed blob"""
+    header = {
+        'version': 1,
+        'terms': terms,
+        'lengths': {name: len(values) for name, values in arrays.items()},
+    }
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    payload = b''.join(_to_little_endian(values) for values in arrays.values())
+    return zlib.compress(len(header_bytes).to_bytes(4, 'little') + header_bytes + payload)
+
+
+def _unpack(blob: bytes, array_types: dict):
+    """Inverse of _pack; returns (terms, arrays)"""
+    raw = zlib.decompress(blob)
+    header_size = int.from_bytes(raw[:4], 'little')
+    header = json.loads(raw[4:4 + header_size].decode('utf-8'))
+
+    position = 4 + header_size
+    arrays = {}
+    for name, typecode in array_types.items():
+        size = header['lengths'][name] * array(typecode).itemsize
+        arrays[name] = _from_little_endian(typecode, raw[position:position + size])
+        position += size
+
+    return header['terms'], arrays
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over the passages of one document
+
+    Postings are stored as a term-major sparse matrix in CSR layout:
+    indptr[t]:indptr[t + 1] slices indices (passage ids) and data (term
+    frequencies) for term id t. Passages are kept as character offsets
+    into the source text rather than copies of it.
+    """
+
+    K1 = 1.5
+    B = 0.75
+
+    ARRAY_TYPES = {
+        'indptr': 'I',
+        'indices': 'I',
+        'data': 'H',
+        'passage_lengths': 'I',
+        'passage_offsets': 'I',
+    }
+
+    def __init__(self, terms, indptr, indices, data, passage_lengths, passage_offsets):
+        self.terms = terms
+        self.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.passage_lengths = passage_lengths
+        self.passage_offsets = passage_offsets
+        self.passage_count = len(passage_lengths)
+        self.avg_passage_length = (sum(passage_lengths) / self.passage_count) if self.passage_count else 0.0
+
+    @classmethod
+    def build(cls, text: str, passage_words: int = 120, overlap_words: int = 20) -> 'BM25Index':
+        """Build an index over the passages of text"""
+        postings = {}
+        passage_lengths = array('I')
+        passage_offsets = array('I')
+
+        for passage_id, (start, end) in enumerate(split_passages(text, passage_words, overlap_words)):
+            tokens = tokenize(text[start:end])
+            passage_lengths.append(len(tokens))
+            passage_offsets.extend((start, end))
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append((passage_id, min(frequency, 65535)))
+
+        terms = sorted(postings)
+        indptr = array('I', [0])
+        indices = array('I')
+        data = array('H')
+        for term in terms:
+            for passage_id, frequency in postings[term]:
+                indices.append(passage_id)
+                data.append(frequency)
+            indptr.append(len(indices))
+
+        return cls(terms, indptr, indices, data, passage_lengths, passage_offsets)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """Return the top_k (passage id, score) pairs for query"""
+        scores = {}
+
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            document_frequency = end - start
+            idf = math.log(1 + (self.passage_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+            for position in range(start, end):
+                passage_id = self.indices[position]
+                frequency = self.data[position]
+                length_norm = 1 - self.B + self.B * self.passage_lengths[passage_id] / (self.avg_passage_length or 1)
+                scores[passage_id] = scores.get(passage_id, 0.0) + (
+                    idf * frequency * (self.K1 + 1) / (frequency + self.K1 * length_norm)
+                )
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def passage_span(self, passage_id: int) -> Tuple[int, int]:
+        """Character offsets of a passage in the source text"""
+        return self.passage_offsets[2 * passage_id], self.passage_offsets[2 * passage_id + 1]
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index into a compact zlib-compressed blob"""
+        return _pack(self.terms, {name: getattr(self, name) for name in self.ARRAY_TYPES})
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'BM25Index':
+        """Load an index serialized with to_bytes"""
+        terms, arrays = _unpack(blob, cls.ARRAY_TYPES)
+        return cls(terms, **arrays)
+
+
+class SentenceIndex:
+    """
+    Sentence offsets plus an inverted term index over one document
+
+    Used to pick the context snippet shown with an answer: candidate
+    sentences come from the postings of the question (and answer) terms,
+    so a lookup never scans the document text.
+    """
+
+    ANSWER_TERM_WEIGHT = 0.5
+
+    ARRAY_TYPES = {
+        'indptr': 'I',
+        'indices': 'I',
+        'sentence_offsets': 'I',
+    }
+
+    def __init__(self, terms, indptr, indices, sentence_offsets):
+        self.terms = terms
+        self.term_ids = {term: term_id for term_id, term in enumerate(terms)}
+        self.indptr = indptr
+        self.indices = indices
+        self.sentence_offsets = sentence_offsets
+        self.sentence_count = len(sentence_offsets) // 2
+
+    @classmethod
+    def build(cls, text: str) -> 'SentenceIndex':
+        """Build an index over the sentences of text"""
+        postings = {}
+        sentence_offsets = array('I')
+
+        for match in SENTENCE_PATTERN.finditer(text):
+            sentence = match.group()
+            stripped = sentence.strip()
+            if not stripped:
+                continue
+
+            start = match.start() + (len(sentence) - len(sentence.lstrip()))
+            sentence_id = len(sentence_offsets) // 2
+            sentence_offsets.extend((start, start + len(stripped)))
+            for term in set(tokenize(stripped)):
+                postings.setdefault(term, []).append(sentence_id)
+
+        terms = sorted(postings)
+        indptr = array('I', [0])
+        indices = array('I')
+        for term in terms:
+            indices.extend(postings[term])
+            indptr.append(len(indices))
+
+        return cls(terms, indptr, indices, sentence_offsets)
+
+    def _add_term_scores(self, scores: dict, terms, weight: float) -> None:
+        for term in set(terms):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            idf = weight * math.log(1 + self.sentence_count / (end - start))
+            for sentence_id in self.indices[start:end]:
+                scores[sentence_id] = scores.get(sentence_id, 0.0) + idf
+
+    def lookup(self, question: str, answer: str = '', limit: int = 2) -> List[Tuple[int, int]]:
+        """
+        Find the sentences best matching a question
+
+        Question terms are weighted fully and answer terms partially, each
+        by inverse sentence frequency.
+
+        Returns:
+            Up to limit (start, end) character offsets, in document order
+        """
+        scores = {}
+        self._add_term_scores(scores, tokenize(question), 1.0)
+        if answer:
+            self._add_term_scores(scores, tokenize(answer), self.ANSWER_TERM_WEIGHT)
+
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [self.sentence_span(sentence_id) for sentence_id in sorted(sentence_id for sentence_id, _ in best)]
+
+    def sentence_span(self, sentence_id: int) -> Tuple[int, int]:
+        """Character offsets of a sentence in the source text"""
+        return self.sentence_offsets[2 * sentence_id], self.sentence_offsets[2 * sentence_id + 1]
+
+    def to_bytes(self) -> bytes:
+        """Serialize the index into a compact zlib-compressed blob"""
+        return _pack(self.terms, {name: getattr(self, name) for name in self.ARRAY_TYPES})
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'SentenceIndex':
+        """Load an index serialized with to_bytes"""
+        terms, arrays = _unpack(blob, cls.ARRAY_TYPES)
+        return cls(terms, **arrays)
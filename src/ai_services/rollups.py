@@ -0,0 +1,152 @@
+"""
+Hourly and daily rollups of AIServiceLog
+
+fold_new_logs() reads logs past the 'service_rollups' watermark in id
+order and adds them to the ServiceRollup rows of their hour and UTC day.
+Each batch is folded and the watermark advanced in one transaction, so a
+log is counted exactly once. Dashboards and health checks read the
+rollups, whose size depends on the time range rather than the log volume.
+Response times are kept only in the hourly latency histograms (see
+ai_services.latency).
+"""
+import logging
+from collections import Counter
+from datetime import datetime, time as datetime_time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import AIServiceLog, AggregationWatermark, ServiceRollup
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'service_rollups'
+
+LOG_FIELDS = ('id', 'service_type', 'created_at', 'status', 'error_code', 'tokens_used', 'estimated_cost')
+
+
+class RollupTotals:
+    """In-memory aggregate for one rollup row"""
+
+    def __init__(self):
+        self.total_requests = 0
+        self.successful_requests = 0
+        self.failed_requests = 0
+        self.failures_by_error_code = Counter()
+        self.total_tokens = 0
+        self.total_cost = Decimal('0')
+
+    def add_log(self, status, error_code, tokens_used, estimated_cost):
+        self.total_requests += 1
+        if status == 'success':
+            self.successful_requests += 1
+        elif status == 'failed':
+            self.failed_requests += 1
+            self.failures_by_error_code[error_code or ''] += 1
+        self.total_tokens += tokens_used or 0
+        self.total_cost += estimated_cost or 0
+
+    def add_row(self, row: ServiceRollup):
+        self.total_requests += row.total_requests
+        self.successful_requests += row.successful_requests
+        self.failed_requests += row.failed_requests
+        self.failures_by_error_code.update(row.failures_by_error_code)
+        self.total_tokens += row.total_tokens
+        self.total_cost += row.total_cost
+
+    def apply_to(self, row: ServiceRollup):
+        row.total_requests += self.total_requests
+        row.successful_requests += self.successful_requests
+        row.failed_requests += self.failed_requests
+        errors = Counter(row.failures_by_error_code)
+        errors.update(self.failures_by_error_code)
+        row.failures_by_error_code = dict(errors)
+        row.total_tokens += self.total_tokens
+        row.total_cost += self.total_cost
+
+    @property
+    def error_rate(self) -> float:
+        return (self.failed_requests / self.total_requests) * 100 if self.total_requests else 0.0
+
+    @property
+    def success_rate(self) -> float:
+        return (self.successful_requests / self.total_requests) * 100 if self.total_requests else 0.0
+
+
+def period_starts(created_at) -> Dict[str, datetime]:
+    """Start of the hour and of the UTC day containing created_at"""
+    created_at = created_at.astimezone(dt_timezone.utc)
+    return {
+        'hour': created_at.replace(minute=0, second=0, microsecond=0),
+        'day': datetime.combine(created_at.date(), datetime_time.min, tzinfo=dt_timezone.utc),
+    }
+
+
+def _fold_batch(logs: List[tuple]) -> None:
+    totals = {}
+    for _, service_type, created_at, status, error_code, tokens_used, estimated_cost in logs:
+        for period, period_start in period_starts(created_at).items():
+            totals.setdefault((period, period_start, service_type), RollupTotals()).add_log(
+                status, error_code, tokens_used, estimated_cost
+            )
+
+    for (period, period_start, service_type), batch_totals in totals.items():
+        row, _ = ServiceRollup.objects.select_for_update().get_or_create(
+            period=period, period_start=period_start, service_type=service_type
+        )
+        batch_totals.apply_to(row)
+        row.save()
+
+
+def fold_new_logs(batch_size: int = None) -> int:
+    """Fold logs written since the last run into the rollups; returns the number folded"""
+    batch_size = batch_size or getattr(settings, 'AI_ROLLUP_BATCH_SIZE', 5000)
+
+    # Leave recently inserted ids alone so transactions still in flight can commit
+    settle = timedelta(seconds=getattr(settings, 'AI_ROLLUP_SETTLE_SECONDS', 60))
+    upper_id = AIServiceLog.objects.filter(
+        created_at__lt=timezone.now() - settle
+    ).aggregate(upper_id=Max('id'))['upper_id']
+    if upper_id is None:
+        return 0
+
+    AggregationWatermark.objects.get_or_create(name=WATERMARK_NAME)
+
+    folded = 0
+    while True:
+        with transaction.atomic():
+            watermark = AggregationWatermark.objects.select_for_update().get(name=WATERMARK_NAME)
+            logs = list(
+                AIServiceLog.objects.filter(id__gt=watermark.last_id, id__lte=upper_id)
+                .order_by('id').values_list(*LOG_FIELDS)[:batch_size]
+            )
+            if not logs:
+                break
+
+            _fold_batch(logs)
+            watermark.last_id = logs[-1][0]
+            watermark.save(update_fields=['last_id', 'updated_at'])
+
+        folded += len(logs)
+        if len(logs) < batch_size:
+            break
+
+    return folded
+
+
+def get_rollups(period: str, start, service_type: str = None):
+    """Rollup rows of one period granularity from start onwards"""
+    rows = ServiceRollup.objects.filter(period=period, period_start__gte=period_starts(start)[period])
+    if service_type:
+        rows = rows.filter(service_type=service_type)
+    return rows
+
+
+def summarize(rows: Iterable[ServiceRollup]) -> RollupTotals:
+    """Merge rollup rows into one RollupTotals"""
+    totals = RollupTotals()
+    for row in rows:
+        totals.add_row(row)
+    return totals
@@ -1,4 +1,6 @@
-from typing import Dict, Any, BinaryIO, List
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, BinaryIO, List, Tuple
 import azure.cognitiveservices.speech as speechsdk
 from django.conf import settings
 from .base import BaseAIService, RateLimitExceeded, ServiceUnavailable, InvalidInput
@@ -10,10 +12,16 @@ import io
 class SpeechService(BaseAIService):
     """Azure Speech Service for text-to-speech and speech-to-text"""
     
+    # Output format is Audio16Khz32KBitRateMonoMp3
+    BIT_RATE = 32000
+    SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+    
     def __init__(self):
         super().__init__()
         self.speech_key = getattr(settings, 'AZURE_SPEECH_KEY', '')
         self.speech_region = getattr(settings, 'AZURE_SPEECH_REGION', '')
+        self.segment_max_chars = getattr(settings, 'AZURE_SPEECH_SEGMENT_CHARS', 3000)
+        self.max_workers = getattr(settings, 'AZURE_SPEECH_MAX_WORKERS', 4)
         
         if not self.speech_key or not self.speech_region:
             raise ValueError("Azure Speech key and region must be configured")
@@ -42,15 +50,18 @@ class SpeechService(BaseAIService):
     ) -> Dict[str, Any]:
         """
         Convert text to speech using Azure Speech Service
+        
+        The text is split on sentence boundaries into segments of at most
+        AZURE_SPEECH_SEGMENT_CHARS characters. Segments are synthesized
+        concurrently and their MP3 frames are concatenated into one file.
+        The returned 'segments' manifest records where each segment starts
+        in the text, in the audio bytes and on the timeline.
         """
         
         # Validate input
         if not text or len(text.strip()) < 1:
             raise InvalidInput("Text cannot be empty")
         
-        if len(text) > 10000:
-            raise InvalidInput("Text is too long. Maximum 10,000 characters allowed.")
-        
         # Check rate limits
         if not self.check_rate_limits(user):
             raise RateLimitExceeded("Daily rate limit exceeded for Speech Service")
@@ -65,91 +76,84 @@ class SpeechService(BaseAIService):
         start_time = time.time()
         
         try:
-            # Configure voice and speech parameters
-            self.speech_config.speech_synthesis_voice_name = voice_name
-            
-            # Create SSML with rate and pitch adjustments
-            ssml_text = self._create_ssml(text, voice_name, speech_rate, speech_pitch)
-
-            # Create synthesizer with default audio output
-            synthesizer = speechsdk.SpeechSynthesizer(
-                speech_config=self.speech_config,
-                audio_config=None
-            )
+            # Voice, rate and pitch are applied through SSML; the shared
+            # speech config is never mutated per request
+            segments = self._split_into_segments(text, self.segment_max_chars)
+            results = [None] * len(segments)
             
-            # Synthesize speech
-            result = synthesizer.speak_ssml_async(ssml_text).get()
+            # Synthesize segments concurrently over a bounded worker pool
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(segments))) as executor:
+                futures = {
+                    executor.submit(
+                        self._synthesize_segment, segment, voice_name, speech_rate, speech_pitch
+                    ): index
+                    for index, (_, segment) in enumerate(segments)
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
             
             response_time = (time.time() - start_time) * 1000  # Convert to milliseconds
             
-            # Check result
-            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                # Get audio data directly from result
-                audio_data = result.audio_data
-                
-                # Calculate audio duration (approximate)
-                duration = self._calculate_audio_duration(audio_data, text)
-                
-                # Calculate cost
-                character_count = len(text)
-                estimated_cost = self.estimate_cost(characters=character_count)
-                
-                # Update log entry
-                log_entry.mark_completed(
-                    status='success',
-                    response_size=len(audio_data)
-                )
-                log_entry.characters_processed = character_count
-                log_entry.estimated_cost = estimated_cost
-                log_entry.response_time = response_time
-                log_entry.save()
-                
-                # Update usage stats
-                self.update_usage_stats(
-                    user=user,
-                    characters=character_count,
-                    cost=estimated_cost,
-                    success=True
-                )
-                
-                return {
-                    'audio_data': audio_data,
-                    'duration': duration,
-                    'character_count': character_count,
-                    'voice_name': voice_name,
-                    'speech_rate': speech_rate,
-                    'speech_pitch': speech_pitch,
-                    'estimated_cost': estimated_cost,
-                    'format': 'mp3',
-                    'sample_rate': 16000,
-                    'bit_rate': 32000
-                }
-                
-            elif result.reason == speechsdk.ResultReason.Canceled:
-                cancellation_details = result.cancellation_details
-                error_msg = f"Speech synthesis canceled: {cancellation_details.reason}"
-                if cancellation_details.error_details:
-                    error_msg += f" - {cancellation_details.error_details}"
-                
-                log_entry.mark_completed(
-                    status='failed',
-                    error_message=error_msg
-                )
-                log_entry.response_time = response_time
-                log_entry.save()
-                
-                raise ServiceUnavailable(error_msg)
-        
-            else:
-                error_msg = f"Speech synthesis failed with reason: {result.reason}"
-                log_entry.mark_completed(
-                    status='failed',
-                    error_message=error_msg
-                )
-                log_entry.response_time = response_time
-                log_entry.save()
-                
-                raise ServiceUnavailable(error_msg)
+            # Stitch the MP3 frames together and build the segment manifest
+            audio_buffer = io.BytesIO()
+            manifest = []
+            timeline = 0.0
+            for index, ((text_offset, segment), segment_audio) in enumerate(zip(segments, results)):
+                segment_duration = self._mp3_duration_seconds(segment_audio)
+                manifest.append({
+                    'index': index,
+                    'characters': len(segment),
+                    'text_offset': text_offset,
+                    'byte_offset': audio_buffer.tell(),
+                    'byte_length': len(segment_audio),
+                    'start_time': round(timeline, 3),
+                    'duration': round(segment_duration, 3),
+                })
+                audio_buffer.write(segment_audio)
+                timeline += segment_duration
+            
+            audio_data = audio_buffer.getvalue()
+            
+            # Calculate audio duration (approximate)
+            duration = self._calculate_audio_duration(audio_data, text)
+            
+            # Calculate cost
+            character_count = len(text)
+            estimated_cost = self.estimate_cost(characters=character_count)
+            
+            # Update log entry
+            log_entry.mark_completed(
+                status='success',
+                response_size=len(audio_data),
+                save=False
+            )
+            log_entry.characters_processed = character_count
+            log_entry.estimated_cost = estimated_cost
+            log_entry.response_time = response_time
+            log_entry.additional_data = {'segment_count': len(segments)}
+            self.record_log(log_entry)
+            
+            # Update usage stats
+            self.update_usage_stats(
+                user=user,
+                characters=character_count,
+                cost=estimated_cost,
+                success=True
+            )
+            
+            return {
+                'audio_data': audio_data,
+                'duration': duration,
+                'character_count': character_count,
+                'voice_name': voice_name,
+                'speech_rate': speech_rate,
+                'speech_pitch': speech_pitch,
+                'estimated_cost': estimated_cost,
+                'format': 'mp3',
+                'sample_rate': 16000,
+                'bit_rate': self.BIT_RATE,
+                'segments': manifest
+            }
             
         except Exception as e:
             response_time = (time.time() - start_time) * 1000
@@ -157,15 +161,95 @@ class SpeechService(BaseAIService):
             if log_entry.status == 'pending':
                 log_entry.mark_completed(
                     status='failed',
-                    error_message=str(e)
+                    error_message=str(e),
+                    save=False
                 )
                 log_entry.response_time = response_time
-                log_entry.save()
+                self.record_log(log_entry)
         
             if "rate limit" in str(e).lower() or "quota" in str(e).lower():
                 raise RateLimitExceeded(f"Speech Service rate limit exceeded: {e}")
             raise ServiceUnavailable(f"Speech Service error: {e}")
     
+    def _synthesize_segment(self, text: str, voice_name: str, speech_rate: str, speech_pitch: str) -> bytes:
+        """Synthesize a single text segment and return its MP3 bytes"""
+        
+        # Create SSML with rate and pitch adjustments
+        ssml_text = self._create_ssml(text, voice_name, speech_rate, speech_pitch)
+        
+        # Synthesizers are not thread-safe, so every segment gets its own
+        synthesizer = speechsdk.SpeechSynthesizer(
+            speech_config=self.speech_config,
+            audio_config=None
+        )
+        
+        result = synthesizer.speak_ssml_async(ssml_text).get()
+        
+        if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+            return result.audio_data
+        
+        if result.reason == speechsdk.ResultReason.Canceled:
+            cancellation_details = result.cancellation_details
+            error_msg = f"Speech synthesis canceled: {cancellation_details.reason}"
+            if cancellation_details.error_details:
+                error_msg += f" - {cancellation_details.error_details}"
+            raise ServiceUnavailable(error_msg)
+        
+        raise ServiceUnavailable(f"Speech synthesis failed with reason: {result.reason}")
+    
+    def _split_into_segments(self, text: str, max_chars: int) -> List[Tuple[int, str]]:
+        """
+        Split text on sentence boundaries into segments of at most max_chars
+        
+        Returns:
+            List of (character offset in text, segment text) tuples
+        """
+        # Sentence spans as (start, end) offsets into the original text
+        sentences = []
+        position = 0
+        for match in self.SENTENCE_BOUNDARY.finditer(text):
+            sentences.append((position, match.start()))
+            position = match.end()
+        sentences.append((position, len(text)))
+        
+        spans = []
+        segment_start = segment_end = None
+        
+        for start, end in sentences:
+            # Sentences longer than a segment are split on word boundaries
+            while end - start > max_chars:
+                cut = text.rfind(' ', start, start + max_chars)
+                if cut <= start:
+                    cut = start + max_chars
+                if segment_start is not None:
+                    spans.append((segment_start, segment_end))
+                    segment_start = None
+                spans.append((start, cut))
+                start = cut
+            
+            if segment_start is not None and end - segment_start > max_chars:
+                spans.append((segment_start, segment_end))
+                segment_start = None
+            
+            if segment_start is None:
+                segment_start = start
+            segment_end = end
+        
+        if segment_start is not None:
+            spans.append((segment_start, segment_end))
+        
+        segments = []
+        for start, end in spans:
+            segment = text[start:end]
+            if segment.strip():
+                segments.append((start + len(segment) - len(segment.lstrip()), segment.strip()))
+        
+        return segments
+    
+    def _mp3_duration_seconds(self, audio_data: bytes) -> float:
+        """Duration of constant bit rate MP3 audio in seconds"""
+        return len(audio_data) * 8 / self.BIT_RATE
+    
     def speech_to_text(
         self, 
         audio_file: BinaryIO,
@@ -202,9 +286,6 @@ class SpeechService(BaseAIService):
         )
         
         try:
-            # Configure speech recognition
-            self.speech_config.speech_recognition_language = language
-            
             # Create audio stream from file
             audio_stream = speechsdk.audio.PushAudioInputStream()
             audio_config = speechsdk.audio.AudioConfig(stream=audio_stream)
@@ -212,7 +293,8 @@ class SpeechService(BaseAIService):
             # Create recognizer
             speech_recognizer = speechsdk.SpeechRecognizer(
                 speech_config=self.speech_config,
-                audio_config=audio_config
+                audio_config=audio_config,
+                language=language
             )
             
             # Push audio data
@@ -234,11 +316,12 @@ class SpeechService(BaseAIService):
                 # Update log entry
                 log_entry.mark_completed(
                     status='success',
-                    response_size=len(recognized_text.encode('utf-8'))
+                    response_size=len(recognized_text.encode('utf-8')),
+                    save=False
                 )
                 log_entry.characters_processed = len(recognized_text)
                 log_entry.estimated_cost = estimated_cost
-                log_entry.save()
+                self.record_log(log_entry)
                 
                 # Update usage stats
                 self.update_usage_stats(
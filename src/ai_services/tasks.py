@@ -0,0 +1,28 @@
+import logging
+from celery import shared_task
+from .cache import ExtractionCache
+from .retention import archive_all_expired_logs
+from .rollups import fold_new_logs
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def rollup_service_logs():
+    """Periodic task folding new AI service logs into the hourly and daily rollups"""
+    folded = fold_new_logs()
+    if folded:
+        logger.info(f"Folded {folded} AI service logs into rollups.")
+    return folded
+
+
+@shared_task
+def archive_expired_logs():
+    """Periodic task archiving and deleting log rows past their retention window"""
+    return archive_all_expired_logs()
+
+
+@shared_task
+def evict_extraction_cache():
+    """Periodic task removing expired and least recently used extraction cache entries"""
+    return ExtractionCache().evict()
@@ -1,3 +1,742 @@
-from django.test import TestCase
+import gzip
+import json
+import random
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from celery.signals import worker_shutdown
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.test_utils import FakeClock, IndexUsageTestMixin
+from .cache import ExtractionCache, SummaryCache
+from .latency import RELATIVE_ACCURACY, LatencyHistogram, get_latency_histogram, save_histograms
+from .log_buffer import LogBuffer, flush_logs
+from .base import ServiceUnavailable
+from .models import (
+    AIServiceLog, AIServiceUsage, AggregationWatermark, ExtractionCacheEntry, ServiceLatencyHistogram
+)
+from .openai_service import OpenAIService
+from .speech_service import SpeechService
+from .retention import archive_expired_logs, write_archive
+from .rate_limit import LocalRateLimiter, RedisRateLimiter
+from .retrieval import BM25Index, SentenceIndex, split_passages
+from .rollups import fold_new_logs, get_rollups, summarize
+from .tasks import evict_extraction_cache
+
+try:
+    import fakeredis
+    fakeredis.FakeRedis().eval('return 1', 0)
+except Exception:
+    # fakeredis with Lua support is optional; the Redis limiter tests are skipped without it
+    fakeredis = None
+
+
+class AIServiceIndexUsageTests(IndexUsageTestMixin, TestCase):
+    """Monitoring queries over the log tables are served by the Meta.indexes"""
+
+    def setUp(self):
+        self.week_ago = timezone.now() - timedelta(days=7)
+
+    def test_service_window_uses_service_time_index(self):
+        queryset = AIServiceLog.objects.filter(service_type='openai_chat', created_at__gte=self.week_ago)
+        self.assertUsesIndex(queryset, 'aisvclog_service_time_idx')
+
+    def test_extraction_cache_lru_scan_uses_access_index(self):
+        queryset = ExtractionCacheEntry.objects.order_by('last_accessed_at').values_list('id', flat=True)[:10]
+        self.assertUsesIndex(queryset, 'extcache_accessed_idx')
+
+    def test_failed_requests_use_partial_index(self):
+        queryset = AIServiceLog.objects.filter(
+            service_type='openai_chat', created_at__gte=self.week_ago, status='failed'
+        )
+        self.assertUsesIndex(queryset, 'aisvclog_failed_idx')
+
+    def test_usage_date_range_uses_date_service_index(self):
+        queryset = AIServiceUsage.objects.filter(date__gte=self.week_ago.date()).values('service_type')
+        self.assertUsesIndex(queryset, 'aisvcusage_date_service_idx')
+
+
+class BM25IndexTests(SimpleTestCase):
+    """Passage retrieval scores, offsets and serialization"""
+
+    TEXT = (
+        "Photosynthesis converts light energy into chemical energy in plants. "
+        "Chlorophyll absorbs red and blue light. "
+        "The mitochondria is the powerhouse of the cell and produces ATP. "
+        "Cellular respiration releases energy stored in glucose."
+    )
+
+    def build(self, text=TEXT):
+        return BM25Index.build(text, passage_words=10, overlap_words=2)
+
+    def test_passage_offsets_cover_source_words(self):
+        index = self.build()
+        spans = [index.passage_span(passage_id) for passage_id in range(index.passage_count)]
+
+        self.assertEqual(spans, split_passages(self.TEXT, 10, 2))
+        self.assertEqual(spans[0][0], 0)
+        self.assertEqual(spans[-1][1], len(self.TEXT))
+        for start, end in spans:
+            self.assertEqual(self.TEXT[start:end], self.TEXT[start:end].strip())
+
+    def test_best_passage_contains_rare_query_terms(self):
+        index = self.build()
+        results = index.search('What produces ATP in the cell?', top_k=2)
+
+        self.assertTrue(results)
+        start, end = index.passage_span(results[0][0])
+        self.assertIn('ATP', self.TEXT[start:end])
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_repeated_term_scores_higher(self):
+        index = BM25Index.build('glucose glucose glucose energy. other words here', passage_words=3, overlap_words=0)
+        (best, _), *_ = index.search('glucose')
+        self.assertEqual(best, 0)
+
+    def test_no_match_and_stop_word_queries_return_nothing(self):
+        index = self.build()
+        self.assertEqual(index.search('quantum entanglement'), [])
+        self.assertEqual(index.search('what is the'), [])
+
+    def test_empty_text(self):
+        index = self.build('')
+        self.assertEqual(index.passage_count, 0)
+        self.assertEqual(index.search('energy'), [])
+        self.assertEqual(BM25Index.from_bytes(index.to_bytes()).passage_count, 0)
+
+    def test_bytes_round_trip(self):
+        index = self.build()
+        loaded = BM25Index.from_bytes(index.to_bytes())
+
+        self.assertEqual(loaded.terms, index.terms)
+        for name in BM25Index.ARRAY_TYPES:
+            self.assertEqual(list(getattr(loaded, name)), list(getattr(index, name)))
+        self.assertEqual(loaded.search('light energy'), index.search('light energy'))
+
+
+class SentenceIndexTests(SimpleTestCase):
+    """Answer context snippets come from the best matching sentences"""
+
+    TEXT = "  Plants need light.\nChlorophyll is green! Roots absorb water from soil. Leaves lose water?"
+
+    def test_sentence_offsets_are_stripped(self):
+        index = SentenceIndex.build(self.TEXT)
+        sentences = [self.TEXT[slice(*index.sentence_span(i))] for i in range(index.sentence_count)]
+        self.assertEqual(sentences, [
+            'Plants need light.', 'Chlorophyll is green!', 'Roots absorb water from soil.', 'Leaves lose water?'
+        ])
+
+    def test_lookup_returns_best_sentences_in_document_order(self):
+        index = SentenceIndex.build(self.TEXT)
+        spans = index.lookup('How do roots get water from the soil?', limit=2)
+
+        self.assertEqual(len(spans), 2)
+        self.assertEqual(spans, sorted(spans))
+        self.assertIn('Roots absorb water from soil.', [self.TEXT[start:end] for start, end in spans])
+
+    def test_answer_terms_break_ties(self):
+        index = SentenceIndex.build(self.TEXT)
+        (span,) = index.lookup('water', answer='leaves', limit=1)
+        self.assertEqual(self.TEXT[slice(*span)], 'Leaves lose water?')
+
+    def test_no_match_and_empty_text(self):
+        self.assertEqual(SentenceIndex.build(self.TEXT).lookup('volcano'), [])
+        empty = SentenceIndex.build('')
+        self.assertEqual(empty.sentence_count, 0)
+        self.assertEqual(empty.lookup('water'), [])
+
+    def test_bytes_round_trip(self):
+        index = SentenceIndex.build(self.TEXT)
+        loaded = SentenceIndex.from_bytes(index.to_bytes())
+
+        self.assertEqual(loaded.terms, index.terms)
+        self.assertEqual(list(loaded.sentence_offsets), list(index.sentence_offsets))
+        self.assertEqual(loaded.lookup('water soil'), index.lookup('water soil'))
+
+
+class RateLimiterTestsMixin:
+    """Token bucket and daily counter behaviour shared by the limiter backends"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('ai_services.rate_limit.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.limiter = self.make_limiter()
+
+    def acquire(self, requests_per_minute=6, daily_key=None, daily_limit=None):
+        return self.limiter.acquire('ratelimit:bucket:test', requests_per_minute, daily_key, daily_limit)
+
+    def test_burst_up_to_capacity_then_deny(self):
+        self.assertEqual([self.acquire() for _ in range(6)], [True] * 6)
+        self.assertFalse(self.acquire())
+
+    def test_tokens_refill_at_the_per_minute_rate(self):
+        for _ in range(6):
+            self.acquire()
+        self.assertFalse(self.acquire())
+
+        # 6 per minute is one token every 10 seconds
+        self.clock.now += 9
+        self.assertFalse(self.acquire())
+        self.clock.now += 1
+        self.assertTrue(self.acquire())
+        self.assertFalse(self.acquire())
+
+    def test_refill_is_capped_at_capacity(self):
+        self.acquire()
+        self.clock.now += 3600
+        self.assertEqual([self.acquire() for _ in range(7)], [True] * 6 + [False])
+
+    def test_daily_limit_denies_without_consuming_tokens(self):
+        self.assertTrue(self.acquire(daily_key='ratelimit:daily:test', daily_limit=2))
+        self.assertTrue(self.acquire(daily_key='ratelimit:daily:test', daily_limit=2))
+        self.assertFalse(self.acquire(daily_key='ratelimit:daily:test', daily_limit=2))
+        self.assertEqual(self.limiter.daily_count('ratelimit:daily:test'), 2)
+
+        # The denied call left the remaining four tokens in the bucket
+        self.assertEqual([self.acquire() for _ in range(5)], [True] * 4 + [False])
+
+    def test_empty_bucket_does_not_count_against_daily_limit(self):
+        for _ in range(6):
+            self.acquire()
+        self.assertFalse(self.acquire(daily_key='ratelimit:daily:test', daily_limit=10))
+        self.assertEqual(self.limiter.daily_count('ratelimit:daily:test'), 0)
+
+    def test_unlimited_service(self):
+        self.assertTrue(all(self.acquire(requests_per_minute=None) for _ in range(100)))
+
+
+class LocalRateLimiterTests(RateLimiterTestsMixin, SimpleTestCase):
+
+    def make_limiter(self):
+        return LocalRateLimiter()
+
+
+@skipUnless(fakeredis, 'fakeredis with Lua support is not installed')
+class RedisRateLimiterTests(RateLimiterTestsMixin, SimpleTestCase):
+
+    def make_limiter(self):
+        with mock.patch('redis.Redis.from_url', return_value=fakeredis.FakeRedis()):
+            return RedisRateLimiter()
+
+
+class LogBufferTests(TransactionTestCase):
+    """AIServiceLog entries are written in bulk by size, by age and at shutdown"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        for target, value in [
+            ('ai_services.log_buffer.time', self.clock),
+            # The background flusher thread is exercised directly in test_background_flusher_writes_stale_entries
+            ('ai_services.log_buffer.LogBuffer._ensure_flusher', lambda buffer: None),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.buffer = LogBuffer(max_size=3, max_age=5.0)
+
+    def entry(self, **kwargs):
+        fields = dict(service_type='openai_chat', endpoint='chat', request_size=10, status='success', response_time=120.0)
+        fields.update(kwargs)
+        return AIServiceLog(**fields)
+
+    def test_flushes_when_full(self):
+        self.buffer.add(self.entry())
+        self.buffer.add(self.entry())
+        self.assertEqual(AIServiceLog.objects.count(), 0)
+        self.assertEqual(len(self.buffer), 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.buffer.add(self.entry())
+        log_inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT') and '"ai_services_aiservicelog"' in query['sql']
+        ]
+        self.assertEqual(len(log_inserts), 1)
+        self.assertEqual(AIServiceLog.objects.count(), 3)
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(ServiceLatencyHistogram.objects.get().count, 3)
+
+    def test_flushes_when_oldest_entry_is_stale(self):
+        self.buffer.add(self.entry())
+        self.clock.now += 4.9
+        self.buffer.add(self.entry())
+        self.assertEqual(AIServiceLog.objects.count(), 0)
+
+        self.clock.now += 0.1
+        self.buffer.add(self.entry(status='failed'))
+        self.assertEqual(AIServiceLog.objects.count(), 3)
+
+    def test_background_flusher_writes_stale_entries(self):
+        self.buffer.add(self.entry())
+
+        class Stop(Exception):
+            pass
+
+        def sleep(seconds):
+            if self.clock.now > 1000.0:
+                raise Stop
+            self.clock.now += seconds
+
+        self.clock.sleep = sleep
+        with mock.patch('ai_services.log_buffer.close_old_connections'), self.assertRaises(Stop):
+            self.buffer._run_flusher()
+        self.assertEqual(AIServiceLog.objects.count(), 1)
+
+    def test_flushes_on_worker_shutdown(self):
+        with mock.patch('ai_services.log_buffer.log_buffer', self.buffer):
+            self.buffer.add(self.entry())
+            worker_shutdown.send(sender=None)
+            self.assertEqual(AIServiceLog.objects.count(), 1)
+            self.assertEqual(flush_logs(), 0)
+
+    def test_entries_are_not_flushed_inside_the_callers_transaction(self):
+        self.buffer.add(self.entry())
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.buffer.add(self.entry())
+                self.buffer.add(self.entry())
+                raise RuntimeError('rolled back')
+
+        self.assertEqual(len(self.buffer), 3)
+        self.assertEqual(self.buffer.flush(), 3)
+        self.assertEqual(AIServiceLog.objects.count(), 3)
+
+    def test_failed_flush_keeps_entries_and_duplicates_are_stored_once(self):
+        entry = self.entry()
+        self.buffer.add(entry)
+        with mock.patch.object(AIServiceLog.objects, 'bulk_create', side_effect=RuntimeError('database down')), \
+                self.assertLogs('ai_services.log_buffer', 'ERROR'):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer), 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.buffer.add(entry)
+        self.buffer.add(entry)
+        self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(AIServiceLog.objects.filter(request_id=entry.request_id).count(), 1)
+        # Its response time is counted once too
+        self.assertEqual(ServiceLatencyHistogram.objects.get().count, 1)
+
+
+class LatencyHistogramTests(TestCase):
+    """Quantiles stay within the histogram's relative accuracy, and hourly histograms merge losslessly"""
+
+    def samples(self, seed, count=2000):
+        rng = random.Random(seed)
+        return [rng.lognormvariate(6, 0.8) for _ in range(count)]
+
+    def histogram(self, samples):
+        histogram = LatencyHistogram()
+        for value in samples:
+            histogram.add(value)
+        return histogram
+
+    def test_quantiles_are_within_relative_accuracy(self):
+        samples = self.samples(seed=1)
+        histogram = self.histogram(samples)
+        ordered = sorted(samples)
+
+        for q in (0.5, 0.95, 0.99):
+            exact = ordered[int(q * (len(ordered) - 1))]
+            self.assertLessEqual(abs(histogram.quantile(q) - exact), RELATIVE_ACCURACY * exact, q)
+        self.assertEqual(histogram.quantile(1), max(samples))
+        self.assertEqual(LatencyHistogram().quantile(0.5), 0.0)
+
+    def test_merged_hours_equal_one_histogram_of_all_samples(self):
+        first, second = self.samples(seed=2), self.samples(seed=3)
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        save_histograms({
+            ('openai_chat', hour): self.histogram(first),
+            ('openai_chat', hour + timedelta(hours=1)): self.histogram(second),
+        })
+
+        merged = get_latency_histogram('openai_chat', hour)
+        combined = self.histogram(first + second)
+
+        self.assertEqual(ServiceLatencyHistogram.objects.count(), 2)
+        self.assertEqual(dict(merged.buckets), dict(combined.buckets))
+        self.assertEqual((merged.count, merged.minimum, merged.maximum), (combined.count, combined.minimum, combined.maximum))
+        self.assertAlmostEqual(merged.total, combined.total, places=6)
+        for q in (0.5, 0.95):
+            self.assertEqual(merged.quantile(q), combined.quantile(q))
+
+
+class ServiceRollupTests(TestCase):
+    """Logs are folded into the rollups once, however often the rollup runs"""
+
+    def create_logs(self, count, **kwargs):
+        fields = dict(service_type='openai_chat', endpoint='chat', request_size=10, status='success',
+                      tokens_used=100, response_time=120.0)
+        fields.update(kwargs)
+        logs = AIServiceLog.objects.bulk_create([AIServiceLog(**fields) for _ in range(count)])
+        # Past AI_ROLLUP_SETTLE_SECONDS, so the rollup picks them up
+        AIServiceLog.objects.filter(pk__in=[log.pk for log in logs]).update(
+            created_at=timezone.now() - timedelta(hours=1)
+        )
+
+    def totals(self):
+        return summarize(get_rollups('day', timezone.now() - timedelta(days=1)))
+
+    def test_rerunning_does_not_double_count(self):
+        self.create_logs(3)
+        self.create_logs(1, status='failed', error_code='rate_limited')
+
+        self.assertEqual(fold_new_logs(batch_size=2), 4)
+        self.assertEqual(fold_new_logs(batch_size=2), 0)
+
+        totals = self.totals()
+        self.assertEqual((totals.total_requests, totals.failed_requests, totals.total_tokens), (4, 1, 400))
+        self.assertEqual(dict(totals.failures_by_error_code), {'rate_limited': 1})
+
+        self.create_logs(1)
+        self.assertEqual(fold_new_logs(), 1)
+        self.assertEqual(self.totals().total_requests, 5)
+        self.assertEqual(summarize(get_rollups('hour', timezone.now() - timedelta(hours=2))).total_requests, 5)
+
+
+class LogRetentionTests(TestCase):
+    """Expired log rows are archived to JSONL before they are deleted"""
+
+    label = 'ai_services.aiservicelog'
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_log(self, days_ago, **kwargs):
+        fields = dict(service_type='openai_chat', endpoint='chat', request_size=10, status='success')
+        fields.update(kwargs)
+        log = AIServiceLog.objects.create(**fields)
+        AIServiceLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return log.pk
+
+    def read_archive(self, name):
+        with default_storage.open(name) as archive:
+            return [json.loads(line) for line in gzip.decompress(archive.read()).decode('utf-8').splitlines()]
+
+    def test_rows_are_archived_before_they_are_deleted(self):
+        expired = [self.create_log(40), self.create_log(40, endpoint='summarize')]
+        kept = [self.create_log(40, status='failed'), self.create_log(1)]
+        AggregationWatermark.objects.create(name='service_rollups', last_id=max(expired + kept))
+        # Not folded into the rollups yet
+        unfolded = self.create_log(40)
+
+        archived = []
+
+        def archive_batch(label, time_field, rows):
+            # Every row of the batch is still in the table while it is archived
+            self.assertEqual(AIServiceLog.objects.filter(pk__in=[row['id'] for row in rows]).count(), len(rows))
+            names = write_archive(label, time_field, rows)
+            archived.extend(names)
+            return names
+
+        with mock.patch('ai_services.retention.write_archive', side_effect=archive_batch):
+            report = archive_expired_logs(self.label, batch_size=1)
+
+        self.assertEqual((report['rows'], report['files']), (2, 2))
+        self.assertEqual(set(AIServiceLog.objects.values_list('pk', flat=True)), set(kept + [unfolded]))
+        rows = [row for name in archived for row in self.read_archive(name)]
+        self.assertEqual([row['id'] for row in rows], expired)
+        self.assertEqual(rows[1]['endpoint'], 'summarize')
+
+    def test_rows_are_kept_when_archiving_fails(self):
+        expired = self.create_log(40)
+        AggregationWatermark.objects.create(name='service_rollups', last_id=expired)
+
+        with mock.patch('ai_services.retention.write_archive', side_effect=OSError('disk full')), \
+                self.assertRaises(OSError):
+            archive_expired_logs(self.label)
+
+        self.assertTrue(AIServiceLog.objects.filter(pk=expired).exists())
+
+
+class WordTokenizer:
+    """Stands in for tiktoken, with one token per space-separated word"""
+
+    def encode(self, text):
+        return text.split(' ') if text else []
+
+    def decode(self, tokens):
+        return ' '.join(tokens)
+
+
+def make_openai_service(**settings_overrides):
+    """OpenAIService with test credentials and WordTokenizer; the client is never called"""
+    overrides = dict(AZURE_OPENAI_ENDPOINT='https://example.openai.azure.com', AZURE_OPENAI_KEY='key')
+    overrides.update(settings_overrides)
+    with override_settings(**overrides), \
+            mock.patch('ai_services.openai_service.get_tokenizer', return_value=WordTokenizer()):
+        return OpenAIService()
+
+
+class MapReduceSummaryTests(SimpleTestCase):
+    """Long texts are split on paragraphs and summarized in a bounded number of passes"""
+
+    def setUp(self):
+        self.service = make_openai_service(
+            AZURE_OPENAI_SUMMARY_CHUNK_TOKENS=10, AZURE_OPENAI_SUMMARY_MAX_WORKERS=2,
+            AZURE_OPENAI_SUMMARY_MAX_PASSES=3, SUMMARY_CACHE_ENABLED=False
+        )
+
+    def words(self, count, word='word'):
+        return ' '.join([word] * count)
+
+    def test_paragraphs_are_packed_up_to_the_budget(self):
+        text = '\n'.join([self.words(4, 'a'), self.words(5, 'b'), '', self.words(3, 'c'), self.words(6, 'd')])
+
+        self.assertEqual(
+            self.service._split_text_by_tokens(text, 10),
+            [self.words(4, 'a') + '\n' + self.words(5, 'b'), self.words(3, 'c') + '\n' + self.words(6, 'd')]
+        )
+
+    def test_oversized_paragraph_is_split_into_token_windows(self):
+        text = '\n'.join([self.words(2, 'a'), self.words(25, 'b'), self.words(2, 'c')])
+
+        self.assertEqual(
+            self.service._split_text_by_tokens(text, 10),
+            [self.words(2, 'a'), self.words(10, 'b'), self.words(10, 'b'), self.words(5, 'b'), self.words(2, 'c')]
+        )
+        self.assertEqual(self.service._split_text_by_tokens('\n\n', 10), [])
+
+    def completion(self, text, tokens=5):
+        usage = mock.Mock(total_tokens=tokens, prompt_tokens=tokens - 1, completion_tokens=1)
+        return mock.Mock(choices=[mock.Mock(message=mock.Mock(content=text))], usage=usage)
+
+    def summarize(self, text):
+        return self.service._generate_map_reduce_summary(text, 'system', 'academic', 'short', '', 'intermediate')
+
+    def test_shrinking_partial_summaries_are_reduced(self):
+        text = '\n'.join(self.words(8, f'p{index}') for index in range(4))
+
+        with mock.patch.object(self.service, '_create_summary_completion', return_value=self.completion('short')) as create:
+            summary, usage, chunk_count = self.summarize(text)
+
+        self.assertEqual((summary, chunk_count), ('short', 4))
+        # The section headers need a second, shorter map pass before the reduce call
+        self.assertEqual(create.call_count, 7)
+        self.assertEqual(usage['total_tokens'], 5 * create.call_count)
+
+    def test_partial_summaries_that_do_not_shrink_fail(self):
+        text = '\n'.join(self.words(8, f'p{index}') for index in range(4))
+
+        with mock.patch.object(self.service, '_create_summary_completion', return_value=self.completion(self.words(9))), \
+                self.assertRaises(ServiceUnavailable):
+            self.summarize(text)
+
+    def test_map_passes_are_capped(self):
+        text = '\n'.join(self.words(8, f'p{index}') for index in range(16))
+        # Each pass shortens the text a little, but never enough to fit one request
+        replies = iter([self.completion(self.words(words)) for words in [6] * 16 + [5] * 20 + [4] * 20 + [3] * 20])
+        lock = threading.Lock()
+
+        def reply(*args, **kwargs):
+            # Chunks are summarized on worker threads
+            with lock:
+                return next(replies)
+
+        with mock.patch.object(self.service, '_create_summary_completion', side_effect=reply), \
+                self.assertRaisesMessage(ServiceUnavailable, 'after 3 map passes'):
+            self.summarize(text)
+
+
+class ExtractionCacheTests(TestCase):
+    """Extraction results are served until they expire, and eviction keeps the most recently used"""
+
+    def setUp(self):
+        self.cache = ExtractionCache(max_entries=2, ttl=3600)
+
+    def store(self, content_hash, accessed_minutes_ago=0, created_minutes_ago=0):
+        self.cache.set(content_hash, {'text': content_hash})
+        now = timezone.now()
+        ExtractionCacheEntry.objects.filter(content_hash=content_hash).update(
+            last_accessed_at=now - timedelta(minutes=accessed_minutes_ago),
+            created_at=now - timedelta(minutes=created_minutes_ago)
+        )
+
+    def test_hit_returns_result_and_records_access(self):
+        self.store('a' * 64, accessed_minutes_ago=30)
+
+        self.assertEqual(self.cache.get('a' * 64), {'text': 'a' * 64})
+        self.assertIsNone(self.cache.get('b' * 64))
+
+        entry = ExtractionCacheEntry.objects.get()
+        self.assertEqual(entry.hit_count, 1)
+        self.assertGreater(entry.last_accessed_at, timezone.now() - timedelta(minutes=1))
+
+    def test_expired_entry_is_a_miss(self):
+        self.store('a' * 64, created_minutes_ago=61)
+
+        self.assertIsNone(self.cache.get('a' * 64))
+        self.assertFalse(ExtractionCacheEntry.objects.exists())
+
+    def test_set_does_not_evict(self):
+        for index, content_hash in enumerate(['a' * 64, 'b' * 64]):
+            self.store(content_hash, accessed_minutes_ago=index)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.cache.set('c' * 64, {'text': 'c'})
+
+        self.assertEqual(ExtractionCacheEntry.objects.count(), 3)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_evict_removes_expired_then_least_recently_used(self):
+        self.store('a' * 64, accessed_minutes_ago=5)
+        self.store('b' * 64, accessed_minutes_ago=20)
+        self.store('c' * 64, accessed_minutes_ago=1)
+        self.store('d' * 64, accessed_minutes_ago=10)
+        self.store('e' * 64, created_minutes_ago=90)
+
+        self.assertEqual(self.cache.evict(), 3)
+        self.assertEqual(
+            set(ExtractionCacheEntry.objects.values_list('content_hash', flat=True)), {'a' * 64, 'c' * 64}
+        )
+
+    def test_periodic_task_evicts_with_configured_limits(self):
+        for index in range(3):
+            self.store(str(index) * 64, accessed_minutes_ago=index)
+
+        with self.settings(EXTRACTION_CACHE_MAX_ENTRIES=1):
+            self.assertEqual(evict_extraction_cache(), 2)
+
+        self.assertEqual(ExtractionCacheEntry.objects.get().content_hash, '0' * 64)
+
+
+class SummaryCacheTests(TestCase):
+    """Identical summary requests are served from the cache without an API call or token charge"""
+
+    KEY_ARGS = {
+        'text': 'Energy is conserved.', 'style': 'teacher', 'length': 'medium',
+        'subject_area': 'physics', 'difficulty_level': 'intermediate', 'deployment_name': 'gpt',
+    }
+
+    def setUp(self):
+        self.service = make_openai_service(
+            SUMMARY_CACHE_BACKEND='ai_services.cache.LocalMemoryCacheBackend', SUMMARY_CACHE_OPTIONS={}
+        )
+        patcher = mock.patch.object(self.service, 'check_rate_limits', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Request logs are buffered; write them before the test database goes away
+        self.addCleanup(flush_logs)
+
+    def test_key_depends_on_every_prompt_parameter(self):
+        key = SummaryCache.make_key(**self.KEY_ARGS)
+        self.assertEqual(SummaryCache.make_key(**self.KEY_ARGS), key)
+
+        for name in self.KEY_ARGS:
+            with self.subTest(name):
+                self.assertNotEqual(SummaryCache.make_key(**dict(self.KEY_ARGS, **{name: 'other'})), key)
+
+    def completion(self):
+        usage = mock.Mock(total_tokens=120, prompt_tokens=100, completion_tokens=20)
+        return mock.Mock(choices=[mock.Mock(message=mock.Mock(content='Energy is conserved.'))], usage=usage)
+
+    def test_hit_skips_the_api_call_and_reports_no_usage(self):
+        text = 'Energy is conserved in a closed system.'
+
+        with mock.patch.object(self.service, '_create_summary_completion', return_value=self.completion()) as create:
+            first = self.service.generate_summary(text, subject_area='physics')
+            second = self.service.generate_summary(text, subject_area='physics')
+            other_length = self.service.generate_summary(text, length='short', subject_area='physics')
+
+        self.assertEqual(create.call_count, 2)
+        self.assertFalse(first['cache_hit'])
+        self.assertEqual(first['total_tokens'], 120)
+        self.assertGreater(first['estimated_cost'], 0)
+        self.assertFalse(other_length['cache_hit'])
+
+        self.assertTrue(second['cache_hit'])
+        self.assertEqual(second['summary'], first['summary'])
+        self.assertEqual((second['total_tokens'], second['estimated_cost']), (0, 0))
+
+    def test_disabled_cache_always_calls_the_api(self):
+        service = make_openai_service(SUMMARY_CACHE_ENABLED=False)
+        text = 'Energy is conserved in a closed system.'
+
+        with mock.patch.object(service, 'check_rate_limits', return_value=True), \
+                mock.patch.object(service, '_create_summary_completion', return_value=self.completion()) as create:
+            service.generate_summary(text)
+            result = service.generate_summary(text)
+
+        self.assertEqual(create.call_count, 2)
+        self.assertFalse(result['cache_hit'])
+
+
+class SpeechSegmentTests(TestCase):
+    """Long texts are synthesized in sentence-aligned segments and stitched into one MP3"""
+
+    def setUp(self):
+        with override_settings(
+            AZURE_SPEECH_KEY='key', AZURE_SPEECH_REGION='eastus',
+            AZURE_SPEECH_SEGMENT_CHARS=25, AZURE_SPEECH_MAX_WORKERS=3
+        ):
+            self.service = SpeechService()
+        patcher = mock.patch.object(self.service, 'check_rate_limits', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(flush_logs)
+
+    def test_sentences_are_packed_into_segments(self):
+        text = 'One two. Three four five six seven. Eight!  Nine ten.'
+
+        self.assertEqual(self.service._split_into_segments(text, 12), [
+            (0, 'One two.'), (9, 'Three four'), (20, 'five six'), (29, 'seven.'), (36, 'Eight!'), (44, 'Nine ten.'),
+        ])
+        self.assertEqual(self.service._split_into_segments(text, 100), [(0, text)])
+
+    def test_segments_point_back_into_the_text(self):
+        text = ' '.join(f'Sentence {index} has a few more words in it.' for index in range(40)) + ' ' + 'x' * 75
+        segments = self.service._split_into_segments(text, 60)
+
+        for offset, segment in segments:
+            self.assertLessEqual(len(segment), 60)
+            self.assertEqual(text[offset:offset + len(segment)], segment)
+        # Only whitespace is dropped; the unbroken word is cut at the segment limit
+        self.assertEqual(''.join(''.join(segment.split()) for _, segment in segments), ''.join(text.split()))
+        self.assertEqual(segments[-2][1], 'x' * 60)
+
+    def synthesize(self, text, voice_name, speech_rate, speech_pitch):
+        # 40 bytes per character is 10ms of 32 kbit/s audio
+        return text.encode('ascii') * 40
+
+    def test_segments_are_stitched_in_text_order(self):
+        text = 'First sentence here. Second one. Third sentence is longer.'
+
+        with mock.patch.object(self.service, '_synthesize_segment', side_effect=self.synthesize) as synthesize:
+            result = self.service.text_to_speech(text)
+
+        segments = ['First sentence here.', 'Second one.', 'Third sentence is longer.']
+        self.assertEqual(synthesize.call_count, 3)
+        self.assertEqual(result['audio_data'], b''.join(segment.encode('ascii') * 40 for segment in segments))
+
+        manifest = result['segments']
+        self.assertEqual([entry['text_offset'] for entry in manifest], [0, 21, 33])
+        self.assertEqual([entry['byte_length'] for entry in manifest], [800, 440, 1000])
+        self.assertEqual([entry['byte_offset'] for entry in manifest], [0, 800, 1240])
+        self.assertEqual([entry['start_time'] for entry in manifest], [0.0, 0.2, 0.31])
+        self.assertEqual([entry['duration'] for entry in manifest], [0.2, 0.11, 0.25])
+        for entry, segment in zip(manifest, segments):
+            audio = result['audio_data'][entry['byte_offset']:entry['byte_offset'] + entry['byte_length']]
+            self.assertEqual(audio, segment.encode('ascii') * 40)
+
+    def test_failed_segment_fails_the_request(self):
+        def synthesize(text, *args):
+            if text.startswith('Second'):
+                raise ServiceUnavailable('Speech synthesis canceled')
+            return self.synthesize(text, *args)
+
+        with mock.patch.object(self.service, '_synthesize_segment', side_effect=synthesize), \
+                self.assertRaisesMessage(ServiceUnavailable, 'Speech synthesis canceled'):
+            self.service.text_to_speech('First sentence here. Second one. Third sentence is longer.')
@@ -4,7 +4,9 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
+from .latency import get_latency_histogram
 from .models import AIServiceUsage, AIServiceLog
+from .rollups import get_rollups, summarize
 from django.db import models
 
 User = get_user_model()
@@ -83,19 +85,13 @@ def get_service_health_status() -> Dict[str, Any]:
         # Check configuration
         is_configured = check_service_availability(service)
         
-        # Check recent error rate
+        # Check recent error rate from the hourly rollups
         week_ago = timezone.now() - timedelta(days=7)
-        recent_logs = AIServiceLog.objects.filter(
-            service_type=service,
-            created_at__gte=week_ago
-        )
+        recent = summarize(get_rollups('hour', week_ago, service))
         
-        total_requests = recent_logs.count()
-        failed_requests = recent_logs.filter(status='failed').count()
-        
-        error_rate = 0
-        if total_requests > 0:
-            error_rate = (failed_requests / total_requests) * 100
+        total_requests = recent.total_requests
+        failed_requests = recent.failed_requests
+        error_rate = recent.error_rate
         
         # Determine status
         if not is_configured:
@@ -212,29 +208,12 @@ def get_service_performance_metrics(service_type: str, days: int = 7) -> Dict[st
     successful_requests = logs.filter(status='success').count()
     failed_requests = logs.filter(status='failed').count()
     
-    # Calculate response times
-    completed_logs = logs.filter(response_time__isnull=False)
-    if completed_logs.exists():
-        avg_response_time = completed_logs.aggregate(
-            avg_time=models.Avg('response_time')
-        )['avg_time']
-        
-        response_times = list(completed_logs.values_list('response_time', flat=True))
-        response_times.sort()
-        
-        # Calculate percentiles
-        p50_index = int(len(response_times) * 0.5)
-        p95_index = int(len(response_times) * 0.95)
-        p99_index = int(len(response_times) * 0.99)
-        
-        p50_response_time = response_times[p50_index] if response_times else 0
-        p95_response_time = response_times[p95_index] if response_times else 0
-        p99_response_time = response_times[p99_index] if response_times else 0
-    else:
-        avg_response_time = 0
-        p50_response_time = 0
-        p95_response_time = 0
-        p99_response_time = 0
+    # Response times from the hourly histograms (the window is widened to whole hours)
+    latency = get_latency_histogram(service_type, start_date)
+    avg_response_time = latency.mean
+    p50_response_time = round(latency.quantile(0.5), 2)
+    p95_response_time = round(latency.quantile(0.95), 2)
+    p99_response_time = round(latency.quantile(0.99), 2)
     
     # Calculate success rate
     success_rate = 0
@@ -266,6 +245,34 @@ def get_service_performance_metrics(service_type: str, days: int = 7) -> Dict[st
     }
 
 
+def get_cache_hit_ratio(cache_name: str = 'summary', days: int = 7) -> Dict[str, Any]:
+    """Get the hit ratio of a result cache from its AIServiceLog entries"""
+    
+    start_date = timezone.now() - timedelta(days=days)
+    
+    logs = AIServiceLog.objects.filter(
+        created_at__gte=start_date,
+        additional_data__cache=cache_name
+    )
+    
+    stats = logs.aggregate(
+        lookups=models.Count('id'),
+        hits=models.Count('id', filter=models.Q(additional_data__cache_hit=True))
+    )
+    
+    lookups = stats['lookups'] or 0
+    hits = stats['hits'] or 0
+    
+    return {
+        'cache': cache_name,
+        'period_days': days,
+        'lookups': lookups,
+        'hits': hits,
+        'misses': lookups - hits,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0.0
+    }
+
+
 def cleanup_old_logs(days_to_keep: int = 90):
     """Clean up old AI service logs to manage database size"""
     
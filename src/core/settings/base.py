@@ -145,11 +145,92 @@ AZURE_OPENAI_KEY = config('AZURE_OPENAI_KEY', default='')
 AZURE_OPENAI_API_VERSION = config('AZURE_OPENAI_API_VERSION', default='2024-02-15-preview')
 AZURE_SPEECH_KEY = config('AZURE_SPEECH_KEY', default='')
 AZURE_SPEECH_REGION = config('AZURE_SPEECH_REGION', default='')
+AZURE_SPEECH_SEGMENT_CHARS = config('AZURE_SPEECH_SEGMENT_CHARS', default=3000, cast=int)
+AZURE_SPEECH_MAX_WORKERS = config('AZURE_SPEECH_MAX_WORKERS', default=4, cast=int)
 AZURE_OPENAI_DEPLOYMENT_NAME = config('AZURE_OPENAI_DEPLOYMENT_NAME')
+AZURE_OPENAI_SUMMARY_CHUNK_TOKENS = config('AZURE_OPENAI_SUMMARY_CHUNK_TOKENS', default=6000, cast=int)
+AZURE_OPENAI_SUMMARY_MAX_WORKERS = config('AZURE_OPENAI_SUMMARY_MAX_WORKERS', default=4, cast=int)
+AZURE_OPENAI_SUMMARY_MAX_PASSES = config('AZURE_OPENAI_SUMMARY_MAX_PASSES', default=4, cast=int)
+
+# Shared HTTP connection pool for Azure OpenAI (one per worker process)
+AZURE_HTTP_MAX_CONNECTIONS = config('AZURE_HTTP_MAX_CONNECTIONS', default=20, cast=int)
+AZURE_HTTP_MAX_KEEPALIVE_CONNECTIONS = config('AZURE_HTTP_MAX_KEEPALIVE_CONNECTIONS', default=10, cast=int)
+AZURE_HTTP_TIMEOUT = config('AZURE_HTTP_TIMEOUT', default=120, cast=int)
+
+# Extraction cache (content-addressed by file SHA-256)
+EXTRACTION_CACHE_ENABLED = config('EXTRACTION_CACHE_ENABLED', default=True, cast=bool)
+EXTRACTION_CACHE_MAX_ENTRIES = config('EXTRACTION_CACHE_MAX_ENTRIES', default=1000, cast=int)
+EXTRACTION_CACHE_TTL = config('EXTRACTION_CACHE_TTL', default=30 * 24 * 3600, cast=int)  # 30 days
+
+# Summary cache (keyed on text hash and prompt parameters)
+SUMMARY_CACHE_ENABLED = config('SUMMARY_CACHE_ENABLED', default=True, cast=bool)
+SUMMARY_CACHE_BACKEND = config('SUMMARY_CACHE_BACKEND', default='ai_services.cache.DjangoCacheBackend')
+SUMMARY_CACHE_OPTIONS = {
+    'timeout': config('SUMMARY_CACHE_TIMEOUT', default=7 * 24 * 3600, cast=int),  # 7 days
+}
+
+# Q&A retrieval (passages sent to the model instead of the whole document)
+QA_PASSAGE_WORDS = config('QA_PASSAGE_WORDS', default=120, cast=int)
+QA_PASSAGE_OVERLAP_WORDS = config('QA_PASSAGE_OVERLAP_WORDS', default=20, cast=int)
+QA_RETRIEVAL_TOP_K = config('QA_RETRIEVAL_TOP_K', default=5, cast=int)
+
+# Document text is kept in DocumentContent; 'zlib' or 'none'
+DOCUMENT_CONTENT_COMPRESSION = config('DOCUMENT_CONTENT_COMPRESSION', default='zlib')
+DOCUMENT_CONTENT_COMPRESSION_LEVEL = config('DOCUMENT_CONTENT_COMPRESSION_LEVEL', default=6, cast=int)
+
+# Per-user dashboard statistics, invalidated when one of the user's documents changes
+DOCUMENT_STATS_CACHE_TTL = config('DOCUMENT_STATS_CACHE_TTL', default=300, cast=int)
 
 # Redis Configuration
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
+# AIServiceLog entries are written in batches of AI_LOG_BUFFER_SIZE or every AI_LOG_BUFFER_MAX_AGE seconds
+AI_LOG_BUFFER_ENABLED = config('AI_LOG_BUFFER_ENABLED', default=True, cast=bool)
+AI_LOG_BUFFER_SIZE = config('AI_LOG_BUFFER_SIZE', default=100, cast=int)
+AI_LOG_BUFFER_MAX_AGE = config('AI_LOG_BUFFER_MAX_AGE', default=5.0, cast=float)
+
+# AIServiceLog rollups for analytics and health checks, refreshed every AI_ROLLUP_INTERVAL seconds
+AI_ROLLUP_INTERVAL = config('AI_ROLLUP_INTERVAL', default=300, cast=int)
+AI_ROLLUP_BATCH_SIZE = config('AI_ROLLUP_BATCH_SIZE', default=5000, cast=int)
+# Logs newer than this are left for the next run so in-flight inserts can commit
+AI_ROLLUP_SETTLE_SECONDS = config('AI_ROLLUP_SETTLE_SECONDS', default=60, cast=int)
+
+# Log retention: rows older than the window for their level are archived as gzipped
+# JSONL under MEDIA_ROOT/LOG_ARCHIVE_DIR and deleted, LOG_RETENTION_BATCH_SIZE at a time
+LOG_ARCHIVE_DIR = config('LOG_ARCHIVE_DIR', default='archives/logs')
+LOG_RETENTION_BATCH_SIZE = config('LOG_RETENTION_BATCH_SIZE', default=2000, cast=int)
+LOG_RETENTION = {
+    'documents.processinglog': {
+        'time_field': 'timestamp',
+        'level_field': 'level',
+        'days': {'info': 30, 'warning': 90, 'error': 365},
+    },
+    'ai_services.aiservicelog': {
+        'time_field': 'created_at',
+        'level_field': 'status',
+        'days': {'success': 30, 'pending': 30, 'timeout': 90, 'failed': 180},
+        # Only rows already folded into the rollups
+        'watermark': 'service_rollups',
+    },
+}
+
+# AI service rate limiting (token bucket per service, daily counter per user)
+AI_RATE_LIMITER_BACKEND = config('AI_RATE_LIMITER_BACKEND', default='ai_services.rate_limit.RedisRateLimiter')
+AI_RATE_LIMITER_OPTIONS = {'url': REDIS_URL}
+AI_DAILY_REQUEST_LIMITS = {
+    'free': 50,
+    'pro': 500,
+    'edu': 1000,
+    'enterprise': 10000,
+}
+# Used when a service has no active ServiceConfiguration; 0 disables the per-minute limit
+AI_DEFAULT_REQUESTS_PER_MINUTE = config('AI_DEFAULT_REQUESTS_PER_MINUTE', default=0, cast=int)
+
+# View, audio play and share access counters are buffered and written every DOCUMENT_COUNTER_FLUSH_INTERVAL seconds
+DOCUMENT_COUNTER_BACKEND = config('DOCUMENT_COUNTER_BACKEND', default='documents.counters.RedisCounterBackend')
+DOCUMENT_COUNTER_OPTIONS = {'url': REDIS_URL}
+DOCUMENT_COUNTER_FLUSH_INTERVAL = config('DOCUMENT_COUNTER_FLUSH_INTERVAL', default=60, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = config("EMAIL_HOST", cast=str, default="smtp.gmail.com")
@@ -210,6 +291,60 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TIMEZONE = 'Africa/Nairobi'
 
+# Queues: interactive Q&A is kept apart from long-running extraction, summarization and TTS
+CELERY_TASK_DEFAULT_QUEUE = 'default'
+CELERY_TASK_ROUTES = {
+    'documents.tasks.process_question': {'queue': 'qa'},
+    'documents.tasks.process_document_pipeline': {'queue': 'extraction'},
+    'documents.tasks.extract_text_from_document': {'queue': 'extraction'},
+    'documents.tasks.generate_ai_summary': {'queue': 'summarization'},
+    'documents.tasks.generate_audio_summary': {'queue': 'audio'},
+    'documents.tasks.regenerate_audio_summary': {'queue': 'audio'},
+    'documents.tasks.generate_answer_audio': {'queue': 'audio'},
+    'documents.tasks.cleanup_failed_documents': {'queue': 'maintenance'},
+    'documents.tasks.cleanup_old_files': {'queue': 'maintenance'},
+    'documents.tasks.generate_usage_analytics': {'queue': 'maintenance'},
+    'documents.tasks.flush_buffered_counters': {'queue': 'maintenance'},
+    'ai_services.tasks.rollup_service_logs': {'queue': 'maintenance'},
+    'ai_services.tasks.archive_expired_logs': {'queue': 'maintenance'},
+    'ai_services.tasks.evict_extraction_cache': {'queue': 'maintenance'},
+}
+
+# Worker processes per queue, e.g. celery -A core worker -Q qa -c 8 (see manage.py queue_depth --worker-commands)
+CELERY_QUEUE_CONCURRENCY = {
+    'qa': config('CELERY_QA_CONCURRENCY', default=8, cast=int),
+    'extraction': config('CELERY_EXTRACTION_CONCURRENCY', default=4, cast=int),
+    'summarization': config('CELERY_SUMMARIZATION_CONCURRENCY', default=4, cast=int),
+    'audio': config('CELERY_AUDIO_CONCURRENCY', default=2, cast=int),
+    'maintenance': config('CELERY_MAINTENANCE_CONCURRENCY', default=1, cast=int),
+    'default': config('CELERY_DEFAULT_CONCURRENCY', default=2, cast=int),
+}
+
+# Task priority per subscription tier (Redis broker: 0 is served first)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_DEFAULT_PRIORITY = 5
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_TIER_PRIORITIES = {
+    'enterprise': 0,
+    'edu': 3,
+    'pro': 3,
+    'free': 6,
+}
+
+# Stuck documents are resumed from their last checkpoint until a stage has used this many attempts
+PIPELINE_MAX_STAGE_ATTEMPTS = config('PIPELINE_MAX_STAGE_ATTEMPTS', default=3, cast=int)
+
+# Users per grouped query and bulk_update batch in generate_usage_analytics
+USAGE_ANALYTICS_CHUNK_SIZE = config('USAGE_ANALYTICS_CHUNK_SIZE', default=500, cast=int)
+
+# Rows per chunk and concurrent file deletions in the cleanup sweeps
+CLEANUP_CHUNK_SIZE = config('CLEANUP_CHUNK_SIZE', default=500, cast=int)
+CLEANUP_FILE_DELETE_WORKERS = config('CLEANUP_FILE_DELETE_WORKERS', default=8, cast=int)
+
 # Celery beat schedule for periodic tasks
 CELERY_BEAT_SCHEDULE = {
     'cleanup-failed-documents': {
@@ -224,4 +359,20 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'documents.tasks.generate_usage_analytics',
         'schedule': 43200.0,  # Run twice daily
     },
+    'flush-buffered-counters': {
+        'task': 'documents.tasks.flush_buffered_counters',
+        'schedule': float(DOCUMENT_COUNTER_FLUSH_INTERVAL),
+    },
+    'rollup-service-logs': {
+        'task': 'ai_services.tasks.rollup_service_logs',
+        'schedule': float(AI_ROLLUP_INTERVAL),
+    },
+    'archive-expired-logs': {
+        'task': 'ai_services.tasks.archive_expired_logs',
+        'schedule': 86400.0,  # Run daily
+    },
+    'evict-extraction-cache': {
+        'task': 'ai_services.tasks.evict_extraction_cache',
+        'schedule': 3600.0,  # Run every hour
+    },
 }
\ No newline at end of file
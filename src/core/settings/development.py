@@ -13,6 +13,14 @@ DATABASES = {
     }
 }
 
+# In-process rate limiter, no Redis needed for development
+AI_RATE_LIMITER_BACKEND = 'ai_services.rate_limit.LocalRateLimiter'
+AI_RATE_LIMITER_OPTIONS = {}
+
+# In-process analytics counters, flushed by the web process itself
+DOCUMENT_COUNTER_BACKEND = 'documents.counters.LocalCounterBackend'
+DOCUMENT_COUNTER_OPTIONS = {}
+
 # Email backend for development
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
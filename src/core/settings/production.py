@@ -24,6 +24,8 @@ MEDIA_ROOT = '/app/media'
 
 # Redis configuration for production
 REDIS_URL = config('REDIS_URL', default='redis://redis:6379/0')
+AI_RATE_LIMITER_OPTIONS = {'url': REDIS_URL}
+DOCUMENT_COUNTER_OPTIONS = {'url': REDIS_URL}
 
 # Celery configuration for production
 CELERY_BROKER_URL = config('CELERY_BROKER_URL', default='redis://redis:6379/0')
@@ -0,0 +1,49 @@
+"""
+Helpers shared by the apps' test suites
+"""
+import tempfile
+
+from django.db import connection, transaction
+from django.test import override_settings
+
+
+def explain(queryset):
+    """Query plan for queryset, with sequential scans discouraged on PostgreSQL's tiny test tables"""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+
+class FakeClock:
+    """Stands in for the time module inside the module under test"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class IndexUsageTestMixin:
+    """assertUsesIndex for TestCase classes checking query plans"""
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = explain(queryset)
+        self.assertIn(index_name, plan, plan)
+
+
+class TemporaryMediaRootMixin:
+    """Point MEDIA_ROOT at a fresh temporary directory for each test"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
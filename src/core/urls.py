@@ -44,6 +44,7 @@ urlpatterns = [
     # API endpoints
     path('api/auth/', include('users.urls')),  # User API endpoints
     path('api/documents/', include('documents.urls')),  # Document API endpoints
+    path('api/realtime/', include('realtime.urls')),  # Processing events (SSE)
     
 ]
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Document, AudioSummary, Question, DocumentShare, ProcessingLog
+from .models import Document, DocumentContent, DocumentIndex, DocumentStageCheckpoint, AudioBlob, AudioSummary, Question, DocumentShare, ProcessingLog
 
 
 class AudioSummaryInline(admin.TabularInline):
@@ -101,6 +101,42 @@ class AudioSummaryAdmin(admin.ModelAdmin):
     audio_size_mb.short_description = 'Size (MB)'
 
 
+@admin.register(AudioBlob)
+class AudioBlobAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'audio_format', 'audio_size', 'reference_count', 'last_used_at', 'created_at')
+    list_filter = ('audio_format', 'created_at')
+    search_fields = ('content_hash',)
+    readonly_fields = (
+        'content_hash', 'audio_file', 'audio_size', 'audio_duration', 'segment_manifest',
+        'reference_count', 'last_used_at', 'created_at'
+    )
+
+
+@admin.register(DocumentIndex)
+class DocumentIndexAdmin(admin.ModelAdmin):
+    list_display = ('document', 'passage_count', 'term_count', 'built_at')
+    search_fields = ('document__title',)
+    exclude = ('index_data',)
+    readonly_fields = ('document', 'passage_count', 'term_count', 'built_at')
+
+
+@admin.register(DocumentContent)
+class DocumentContentAdmin(admin.ModelAdmin):
+    list_display = ('document', 'compression', 'extracted_text_size', 'summary_text_size', 'updated_at')
+    list_filter = ('compression',)
+    search_fields = ('document__title',)
+    exclude = ('extracted_text_data', 'summary_text_data')
+    readonly_fields = ('document', 'compression', 'extracted_text_size', 'summary_text_size', 'updated_at')
+
+
+@admin.register(DocumentStageCheckpoint)
+class DocumentStageCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('document', 'stage', 'status', 'attempts', 'completed_at', 'updated_at')
+    list_filter = ('stage', 'status')
+    search_fields = ('document__title',)
+    readonly_fields = ('started_at', 'completed_at', 'updated_at')
+
+
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = (
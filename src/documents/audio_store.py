@@ -0,0 +1,186 @@
+import hashlib
+import logging
+from typing import Dict, List, Tuple
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import AudioBlob, AudioSummary
+
+logger = logging.getLogger(__name__)
+
+
+def audio_content_hash(text, voice_name, speech_rate, speech_pitch, audio_format='mp3') -> str:
+    """Hash the inputs that fully determine the synthesized audio"""
+    key = '\x1f'.join([text, voice_name, speech_rate, speech_pitch, audio_format])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def get_or_create_audio_blob(text, voice_name, speech_rate='medium', speech_pitch='medium',
+                             audio_format='mp3', user=None) -> Tuple[AudioBlob, bool]:
+    """
+    Return the audio blob for the given text and voice settings,
+    synthesizing it only when no identical audio exists yet
+    
+    Returns:
+        Tuple of (blob, created)
+    """
+    content_hash = audio_content_hash(text, voice_name, speech_rate, speech_pitch, audio_format)
+    
+    blob = AudioBlob.objects.filter(content_hash=content_hash).first()
+    if blob and blob.audio_file and blob.audio_file.storage.exists(blob.audio_file.name):
+        return blob, False
+    
+    from ai_services.registry import get_speech_service
+    
+    speech_service = get_speech_service()
+    audio_result = speech_service.text_to_speech(
+        text=text,
+        voice_name=voice_name,
+        speech_rate=speech_rate,
+        speech_pitch=speech_pitch,
+        user=user
+    )
+    
+    if blob is None:
+        blob = AudioBlob(content_hash=content_hash, audio_format=audio_format)
+    
+    blob.audio_duration = audio_result['duration']
+    blob.audio_size = len(audio_result['audio_data'])
+    blob.segment_manifest = audio_result.get('segments', [])
+    blob.audio_file.save(f"{content_hash}.{audio_format}", ContentFile(audio_result['audio_data']), save=False)
+    
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # Another worker stored the same audio first; use theirs
+        blob.audio_file.delete(save=False)
+        return AudioBlob.objects.get(content_hash=content_hash), False
+    
+    return blob, True
+
+
+def create_audio_summary(document, voice_name, speech_rate='medium', speech_pitch='medium') -> Tuple[AudioSummary, bool]:
+    """
+    Create a completed audio summary for a document backed by a shared blob
+    
+    Returns:
+        Tuple of (audio summary, whether new audio was synthesized)
+    """
+    started_at = timezone.now()
+    while True:
+        blob, created = get_or_create_audio_blob(
+            document.summary_text, voice_name, speech_rate, speech_pitch, user=document.user
+        )
+        
+        with transaction.atomic():
+            # Hold the blob row until the summary referencing it exists, so a
+            # concurrent release_blob cannot delete the blob in between
+            if not AudioBlob.objects.select_for_update().filter(pk=blob.pk).exists():
+                # Released meanwhile; look it up or synthesize it again
+                continue
+            
+            # The post_save handler adds the blob reference in this transaction
+            audio_summary = AudioSummary.objects.create(
+                document=document,
+                blob=blob,
+                audio_file=blob.audio_file.name,
+                audio_format=blob.audio_format,
+                voice_name=voice_name,
+                speech_rate=speech_rate,
+                speech_pitch=speech_pitch,
+                audio_duration=blob.audio_duration,
+                audio_size=blob.audio_size,
+                segment_manifest=blob.segment_manifest,
+                generation_time=int((timezone.now() - started_at).total_seconds()),
+                status='completed'
+            )
+        
+        return audio_summary, created
+
+
+def acquire_blob(blob_id) -> None:
+    """Add a reference to a blob"""
+    AudioBlob.objects.filter(pk=blob_id).update(
+        reference_count=F('reference_count') + 1,
+        last_used_at=timezone.now()
+    )
+
+
+def release_blob(blob_id) -> bool:
+    """
+    Drop a reference to a blob, deleting the blob once the last reference
+    is gone and its file once that deletion commits
+    
+    Returns:
+        True if the blob was deleted
+    """
+    with transaction.atomic():
+        blob = AudioBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return False
+        
+        if blob.reference_count > 1 or AudioSummary.objects.filter(blob_id=blob_id).exists():
+            if blob.reference_count > 0:
+                AudioBlob.objects.filter(pk=blob_id).update(reference_count=F('reference_count') - 1)
+            return False
+        
+        file_name = blob.audio_file.name
+        storage = blob.audio_file.storage
+        blob.delete()
+        
+        # The blob row comes back if an enclosing transaction (such as a
+        # cascading Document delete) rolls back, so its file must stay until commit
+        transaction.on_commit(lambda: _delete_blob_file(storage, file_name))
+    
+    return True
+
+
+def _delete_blob_file(storage, file_name) -> None:
+    try:
+        if file_name and storage.exists(file_name):
+            storage.delete(file_name)
+            logger.info(f"Deleted audio blob file: {file_name}")
+    except Exception as e:
+        logger.error(f"Failed to delete audio blob file {file_name}: {str(e)}")
+
+
+def release_blobs(released: Dict[int, int]) -> List[str]:
+    """
+    Drop several references at once, given {blob_id: references released}
+    
+    Blobs no audio summary points at any more are deleted in bulk. The
+    caller removes their files.
+    
+    Returns:
+        Storage names of the deleted blobs' files
+    """
+    if not released:
+        return []
+    
+    with transaction.atomic():
+        # Lock the blobs before looking for references, as create_audio_summary
+        # adds its reference while holding the same lock
+        list(AudioBlob.objects.select_for_update().filter(pk__in=released).values_list('pk', flat=True))
+        referenced = set(
+            AudioSummary.objects.filter(blob_id__in=released).values_list('blob_id', flat=True).distinct()
+        )
+        orphaned = AudioBlob.objects.filter(pk__in=released).exclude(pk__in=referenced)
+        file_names = [name for name in orphaned.values_list('audio_file', flat=True) if name]
+        orphaned.delete()
+        
+        still_used = [blob_id for blob_id in released if blob_id in referenced]
+        if still_used:
+            AudioBlob.objects.filter(pk__in=still_used).update(
+                reference_count=Greatest(
+                    F('reference_count') - Case(
+                        *[When(pk=blob_id, then=Value(released[blob_id])) for blob_id in still_used],
+                        default=Value(0), output_field=IntegerField()
+                    ),
+                    Value(0)
+                )
+            )
+    
+    return file_names
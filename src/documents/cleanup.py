@@ -0,0 +1,125 @@
+"""
+Batched maintenance sweeps
+
+Sweeps stream their candidates with iterator(chunk_size=...) and act
+on one chunk at a time with bulk queries, so memory stays bounded however
+many rows match. Files are removed from storage by a thread pool. Each
+sweep returns a report dict with counts and throughput; with dry_run=True
+nothing is changed and the report describes what would have happened.
+"""
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from users.models import UserProfile
+from .audio_store import release_blobs
+from .models import AudioBlob, AudioSummary
+
+logger = logging.getLogger(__name__)
+
+
+def chunked(iterable: Iterable, size: int):
+    """Yield lists of up to size items"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def finish_report(report: Dict, started: float, processed: int) -> Dict:
+    """Add elapsed time and throughput to a sweep report"""
+    elapsed = time.monotonic() - started
+    report['elapsed_seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(processed / elapsed, 1) if elapsed > 0 else float(processed)
+    return report
+
+
+def delete_files(names: Iterable[str], storage=default_storage, workers: int = None) -> int:
+    """Delete storage files concurrently; returns the number deleted"""
+    names = [name for name in names if name]
+    if not names:
+        return 0
+
+    def delete(name):
+        try:
+            storage.delete(name)
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete file {name}: {str(e)}")
+            return False
+
+    workers = workers or getattr(settings, 'CLEANUP_FILE_DELETE_WORKERS', 8)
+    with ThreadPoolExecutor(max_workers=min(workers, len(names))) as executor:
+        return sum(executor.map(delete, names))
+
+
+def cleanup_old_audio(days: int = 90, dry_run: bool = False, chunk_size: int = None) -> Dict:
+    """
+    Delete free-tier audio summaries older than days
+
+    Rows are removed with one DELETE per chunk, bypassing the per-row delete
+    signals; the blob references, files and analytics updates those signals
+    would handle are done here in bulk instead.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CLEANUP_CHUNK_SIZE', 500)
+    cutoff_date = timezone.now() - timedelta(days=days)
+    started = time.monotonic()
+    report = {'dry_run': dry_run, 'audio_summaries': 0, 'blobs_deleted': 0, 'files_deleted': 0, 'bytes': 0}
+
+    expired = Q(generated_at__lt=cutoff_date, document__user__subscription_tier='free')
+    candidates = AudioSummary.objects.filter(expired).order_by().values_list(
+        'id', 'blob_id', 'audio_file', 'audio_size', 'document__user_id'
+    )
+    # Blobs the dry run has already counted; one may be shared by summaries in several chunks
+    counted_blobs = set()
+
+    for chunk in chunked(candidates.iterator(chunk_size=chunk_size), chunk_size):
+        report['audio_summaries'] += len(chunk)
+        ids = [summary_id for summary_id, _, _, _, _ in chunk]
+        owner_ids = {user_id for _, _, _, _, user_id in chunk}
+        released = Counter(blob_id for _, blob_id, _, _, _ in chunk if blob_id)
+        # Files owned by the summary itself; shared blob files go with the blob
+        own_files = [audio_file for _, blob_id, audio_file, _, _ in chunk if audio_file and not blob_id]
+        report['bytes'] += sum(audio_size or 0 for _, blob_id, _, audio_size, _ in chunk if not blob_id)
+
+        if dry_run:
+            # A blob goes once no summary outside the sweep points at it
+            new_blobs = set(released) - counted_blobs
+            counted_blobs |= new_blobs
+            kept = AudioSummary.objects.filter(blob_id__in=new_blobs).exclude(expired).values_list('blob_id', flat=True)
+            blob_files = [
+                name for name in AudioBlob.objects.filter(pk__in=new_blobs).exclude(pk__in=kept)
+                .values_list('audio_file', flat=True) if name
+            ]
+            report['blobs_deleted'] += len(blob_files)
+            report['files_deleted'] += len(own_files) + len(blob_files)
+            continue
+
+        with transaction.atomic():
+            # AudioSummary has no reverse relations, so a raw delete is safe
+            AudioSummary.objects.filter(pk__in=ids)._raw_delete(AudioSummary.objects.db)
+            blob_files = release_blobs(dict(released))
+            # Have generate_usage_analytics recount the owners' audio time
+            UserProfile.objects.filter(user_id__in=owner_ids).update(updated_at=timezone.now())
+
+        report['blobs_deleted'] += len(blob_files)
+        report['files_deleted'] += delete_files(own_files + blob_files)
+
+    report = finish_report(report, started, report['audio_summaries'])
+    logger.info(
+        f"Audio cleanup {'dry run ' if dry_run else ''}completed: {report['audio_summaries']} audio summaries, "
+        f"{report['blobs_deleted']} blobs, {report['files_deleted']} files "
+        f"({report['rows_per_second']} rows/s)."
+    )
+    return report
@@ -0,0 +1,282 @@
+"""
+Buffered analytics counters
+
+View, audio play and share access counts are incremented in Redis (or in
+process memory for development) instead of with a save() on every request.
+flush_counters() drains the pending increments and applies them with one
+F()-based UPDATE per model and batch, run by the flush_buffered_counters
+beat task. The process-local backend also flushes from a background
+thread, since the beat task runs in another process. A Redis drain
+interrupted before it finished is picked up again by a later flush.
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Fields that may be incremented through the buffer, per model
+COUNTED_FIELDS = {
+    'documents.document': ('view_count', 'audio_play_count'),
+    'documents.documentshare': ('access_count',),
+}
+
+# Timestamp fields set to the flush time when a model's counters are applied
+TOUCHED_FIELDS = {
+    'documents.documentshare': 'last_accessed',
+}
+
+# Models whose counters feed the owner's cached DocumentStatsService statistics
+STATS_MODELS = ('documents.document',)
+
+FLUSH_BATCH_SIZE = 500
+
+
+class BaseCounterBackend:
+    """Interface for counter backends"""
+
+    def incr(self, key: str, amount: int = 1) -> None:
+        raise NotImplementedError
+
+    def drain(self) -> dict:
+        """Remove and return all pending increments as {key: amount}"""
+        raise NotImplementedError
+
+    def restore(self, pending: dict) -> None:
+        """Put back increments that could not be written"""
+        for key, amount in pending.items():
+            self.incr(key, amount)
+
+
+class LocalCounterBackend(BaseCounterBackend):
+    """Process-local buffer for development; flushes itself every max_age seconds"""
+
+    def __init__(self, max_age: float = None, **kwargs):
+        self.max_age = max_age if max_age is not None else getattr(settings, 'DOCUMENT_COUNTER_FLUSH_INTERVAL', 60)
+        self._pending = {}
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + amount
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            stale = self._is_stale()
+
+        self._ensure_flusher()
+        if stale:
+            flush_counters()
+
+    def drain(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._oldest_at = None
+        return pending
+
+    def _is_stale(self) -> bool:
+        return self._oldest_at is not None and time.monotonic() - self._oldest_at >= self.max_age
+
+    def _ensure_flusher(self):
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+
+        with self._lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run_flusher, name='counter-flusher', daemon=True)
+                self._flusher.start()
+
+    def _run_flusher(self):
+        # Flushes counts that no later increment would flush
+        while True:
+            time.sleep(self.max_age)
+            with self._lock:
+                stale = self._is_stale()
+            if stale:
+                close_old_connections()
+                try:
+                    flush_counters()
+                except Exception as e:
+                    logger.error(f"Failed to flush counters: {str(e)}")
+
+
+class RedisCounterBackend(BaseCounterBackend):
+    """Counters in one Redis hash shared by all web and worker processes"""
+
+    KEY = 'counters:pending'
+    FLUSHING_PREFIX = 'counters:flushing:'
+
+    # A hash being drained for longer than this was left by a flush that died
+    STALE_FLUSH_SECONDS = 300
+
+    def __init__(self, url: str = None, **kwargs):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+
+    def incr(self, key, amount=1):
+        self.client.hincrby(self.KEY, key, amount)
+
+    def drain(self):
+        pending = {}
+        for key in self._stale_flushing_keys():
+            self._drain_key(key, pending)
+        self._drain_key(self.KEY, pending)
+        return pending
+
+    def _flushing_key(self) -> str:
+        return f'{self.FLUSHING_PREFIX}{int(time.time())}:{uuid.uuid4().hex}'
+
+    def _stale_flushing_keys(self):
+        """Hashes left behind by drains that never deleted them"""
+        cutoff = time.time() - self.STALE_FLUSH_SECONDS
+        for key in self.client.scan_iter(match=f'{self.FLUSHING_PREFIX}*'):
+            started = key.decode('utf-8')[len(self.FLUSHING_PREFIX):].split(':', 1)[0]
+            if not started.isdigit() or int(started) < cutoff:
+                yield key
+
+    def _drain_key(self, key, pending: dict) -> None:
+        """Move the hash at key into pending and delete it"""
+        import redis
+
+        # Renaming makes the drain atomic: increments arriving meanwhile go to a fresh hash,
+        # and only one process can claim a stale flushing hash
+        flushing_key = self._flushing_key()
+        try:
+            self.client.rename(key, flushing_key)
+        except redis.ResponseError:
+            # Nothing pending, or already claimed
+            return
+
+        for counter, amount in self.client.hgetall(flushing_key).items():
+            counter = counter.decode('utf-8')
+            pending[counter] = pending.get(counter, 0) + int(amount)
+        self.client.delete(flushing_key)
+
+    def restore(self, pending):
+        pipeline = self.client.pipeline()
+        for key, amount in pending.items():
+            pipeline.hincrby(self.KEY, key, amount)
+        pipeline.execute()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_counter_backend() -> BaseCounterBackend:
+    """Configured counter backend, created once per process"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            backend = import_string(getattr(settings, 'DOCUMENT_COUNTER_BACKEND', 'documents.counters.RedisCounterBackend'))
+            _backend = backend(**getattr(settings, 'DOCUMENT_COUNTER_OPTIONS', {}))
+        return _backend
+
+
+def _counter_key(label: str, pk, field: str) -> str:
+    return f'{label}:{pk}:{field}'
+
+
+def increment(instance, field: str, amount: int = 1) -> None:
+    """
+    Count amount against instance.field without writing the row
+
+    The in-memory instance is updated so the caller sees the new value.
+    If the backend is unavailable the increment is written directly.
+    """
+    label = instance._meta.label_lower
+    if field not in COUNTED_FIELDS.get(label, ()):
+        raise ValueError(f"{label}.{field} is not a buffered counter")
+
+    setattr(instance, field, (getattr(instance, field) or 0) + amount)
+
+    try:
+        get_counter_backend().incr(_counter_key(label, instance.pk, field), amount)
+    except Exception as e:
+        logger.warning(f"Counter backend unavailable, writing {label}.{field} directly: {str(e)}")
+        _apply(label, {field: {instance.pk: amount}})
+
+
+def _apply(label: str, increments: dict) -> int:
+    """Add {field: {pk: amount}} to the rows of one model; returns rows updated"""
+    model = apps.get_model(label)
+    touched_field = TOUCHED_FIELDS.get(label)
+    pks = sorted({pk for amounts in increments.values() for pk in amounts})
+
+    updated = 0
+    for start in range(0, len(pks), FLUSH_BATCH_SIZE):
+        batch = pks[start:start + FLUSH_BATCH_SIZE]
+        changes = {}
+        for field, amounts in increments.items():
+            whens = [When(pk=pk, then=Value(amounts[pk])) for pk in batch if pk in amounts]
+            if whens:
+                changes[field] = F(field) + Case(*whens, default=Value(0), output_field=IntegerField())
+        if touched_field:
+            changes[touched_field] = timezone.now()
+        updated += model.objects.filter(pk__in=batch).update(**changes)
+
+    if label in STATS_MODELS:
+        _invalidate_stats(model, pks)
+
+    return updated
+
+
+def _invalidate_stats(model, pks) -> None:
+    """Drop the cached statistics of the owners of rows updated in bulk"""
+    from .stats import DocumentStatsService
+
+    user_ids = model.objects.filter(pk__in=pks).values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        DocumentStatsService.invalidate(user_id)
+
+
+def flush_counters() -> int:
+    """Write all pending increments to the database; returns rows updated"""
+    backend = get_counter_backend()
+    pending = backend.drain()
+    if not pending:
+        return 0
+
+    # {label: {field: {pk: amount}}}
+    grouped = {}
+    for key, amount in pending.items():
+        label, pk, field = key.rsplit(':', 2)
+        if field not in COUNTED_FIELDS.get(label, ()):
+            logger.warning(f"Dropping unknown counter {key}")
+            continue
+        grouped.setdefault(label, {}).setdefault(field, {})[int(pk)] = amount
+
+    updated = 0
+    for label, increments in grouped.items():
+        try:
+            updated += _apply(label, increments)
+        except Exception as e:
+            logger.error(f"Failed to flush {label} counters: {str(e)}")
+            backend.restore({
+                _counter_key(label, pk, field): amount
+                for field, amounts in increments.items()
+                for pk, amount in amounts.items()
+            })
+
+    return updated
+
+
+def _flush_at_exit():
+    if isinstance(_backend, LocalCounterBackend):
+        try:
+            flush_counters()
+        except Exception as e:
+            logger.error(f"Failed to flush counters at exit: {str(e)}")
+
+
+atexit.register(_flush_at_exit)
@@ -0,0 +1,91 @@
+import logging
+from django.conf import settings
+from ai_services.cache import LocalMemoryCacheBackend
+from ai_services.retrieval import BM25Index, SentenceIndex
+from .models import DocumentIndex
+
+logger = logging.getLogger(__name__)
+
+# Recently used indexes, keyed on document id, index kind and build time
+_loaded_indexes = LocalMemoryCacheBackend(max_entries=64)
+
+
+def build_document_index(document) -> DocumentIndex:
+    """Build and store the retrieval and sentence indexes for a document's extracted text"""
+    text = document.extracted_text or ''
+    index = BM25Index.build(
+        text,
+        passage_words=getattr(settings, 'QA_PASSAGE_WORDS', 120),
+        overlap_words=getattr(settings, 'QA_PASSAGE_OVERLAP_WORDS', 20)
+    )
+    
+    document_index, _ = DocumentIndex.objects.update_or_create(
+        document=document,
+        defaults={
+            'index_data': index.to_bytes(),
+            'sentence_data': SentenceIndex.build(text).to_bytes(),
+            'passage_count': index.passage_count,
+            'term_count': len(index.terms),
+        }
+    )
+    
+    return document_index
+
+
+def _load_index(document, field: str, index_class):
+    """Load one serialized index of a document, building the indexes if missing"""
+    document_index = DocumentIndex.objects.filter(document=document).only('built_at').first()
+    if document_index is None:
+        document_index = build_document_index(document)
+    
+    cache_key = f"{document.pk}:{field}:{document_index.built_at.timestamp()}"
+    index = _loaded_indexes.get(cache_key)
+    if index is None:
+        data = DocumentIndex.objects.values_list(field, flat=True).get(pk=document_index.pk)
+        if data is None:
+            # Indexed before this kind of index was stored
+            document_index = build_document_index(document)
+            data = getattr(document_index, field)
+            cache_key = f"{document.pk}:{field}:{document_index.built_at.timestamp()}"
+        index = index_class.from_bytes(bytes(data))
+        _loaded_indexes.set(cache_key, index)
+    
+    return index
+
+
+def load_document_index(document) -> BM25Index:
+    """Load a document's passage retrieval index"""
+    return _load_index(document, 'index_data', BM25Index)
+
+
+def load_sentence_index(document) -> SentenceIndex:
+    """Load a document's sentence index, used for answer context snippets"""
+    return _load_index(document, 'sentence_data', SentenceIndex)
+
+
+def retrieve_context(document, question: str, top_k: int = None) -> str:
+    """
+    Get the passages of a document most relevant to a question
+    
+    Passages are returned in document order. When nothing matches, the
+    opening passages are used instead.
+    """
+    text = document.extracted_text or ''
+    top_k = top_k or getattr(settings, 'QA_RETRIEVAL_TOP_K', 5)
+    
+    try:
+        index = load_document_index(document)
+    except Exception as e:
+        logger.error(f"Failed to load retrieval index for document {document.pk}: {str(e)}")
+        return text
+    
+    passage_ids = [passage_id for passage_id, _ in index.search(question, top_k=top_k)]
+    if not passage_ids:
+        passage_ids = list(range(min(top_k, index.passage_count)))
+    
+    passages = []
+    for passage_id in sorted(passage_ids):
+        start, end = index.passage_span(passage_id)
+        passages.append(text[start:end])
+    
+    return "\n\n...\n\n".join(passages)
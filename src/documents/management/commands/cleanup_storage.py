@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from documents.cleanup import cleanup_old_audio
+from documents.tasks import cleanup_failed_documents
+
+
+class Command(BaseCommand):
+    help = 'Run the stuck-document and old-audio cleanup sweeps and report their throughput'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be cleaned up without changing anything')
+        parser.add_argument('--days', type=int, default=90, help='Age in days after which free-tier audio is removed')
+        parser.add_argument('--only', choices=['stuck', 'audio'], help='Run a single sweep')
+    
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        
+        if options['only'] in (None, 'stuck'):
+            self._write_report('Stuck documents', cleanup_failed_documents(dry_run=dry_run))
+        if options['only'] in (None, 'audio'):
+            self._write_report('Old audio', cleanup_old_audio(days=options['days'], dry_run=dry_run))
+    
+    def _write_report(self, title, report):
+        heading = f"{title}{' (dry run)' if report.pop('dry_run') else ''}"
+        self.stdout.write(self.style.MIGRATE_HEADING(heading))
+        for key, value in report.items():
+            self.stdout.write(f"  {key.replace('_', ' '):<20}{value:>12}")
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from documents.queues import get_queue_depths
+
+
+class Command(BaseCommand):
+    help = 'Report the number of waiting tasks per Celery queue'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-commands', action='store_true', help='Also print a worker command line per queue')
+    
+    def handle(self, *args, **options):
+        concurrency = getattr(settings, 'CELERY_QUEUE_CONCURRENCY', {})
+        
+        try:
+            depths = get_queue_depths()
+        except Exception as e:
+            self.stderr.write(self.style.ERROR(f"Could not connect to the broker: {str(e)}"))
+            return
+        
+        self.stdout.write(f"{'Queue':<16}{'Waiting':>10}{'Concurrency':>14}")
+        for queue, depth in depths.items():
+            self.stdout.write(f"{queue:<16}{'?' if depth is None else depth:>10}{concurrency.get(queue, ''):>14}")
+        
+        if options['worker_commands']:
+            self.stdout.write('')
+            for queue, workers in concurrency.items():
+                self.stdout.write(f"celery -A core worker -Q {queue} -c {workers} -n {queue}@%h")
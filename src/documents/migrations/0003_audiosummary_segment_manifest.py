@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_alter_audiosummary_audio_duration_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiosummary',
+            name='segment_manifest',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:14
+
+import django.db.models.deletion
+import django.utils.timezone
+import documents.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0003_audiosummary_segment_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('audio_file', models.FileField(upload_to=documents.models.audio_blob_upload_path)),
+                ('audio_format', models.CharField(default='mp3', max_length=10)),
+                ('audio_duration', models.PositiveIntegerField(blank=True, help_text='Duration in seconds', null=True)),
+                ('audio_size', models.PositiveIntegerField(blank=True, help_text='File size in bytes', null=True)),
+                ('segment_manifest', models.JSONField(blank=True, default=list)),
+                ('reference_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Audio Blob',
+                'verbose_name_plural': 'Audio Blobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='audiosummary',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='audio_summaries', to='documents.audioblob'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0004_audioblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index_data', models.BinaryField()),
+                ('passage_count', models.PositiveIntegerField(default=0)),
+                ('term_count', models.PositiveIntegerField(default=0)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='retrieval_index', to='documents.document')),
+            ],
+            options={
+                'verbose_name': 'Document Index',
+                'verbose_name_plural': 'Document Indexes',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_documentindex'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documentindex',
+            name='sentence_data',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='context_offsets',
+            field=models.JSONField(blank=True, default=list, help_text='Character offsets of the snippet sentences in the document text'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0006_sentence_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentStageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('text_extraction', 'Text Extraction'), ('summarization', 'AI Summarization'), ('audio_generation', 'Audio Generation')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error_message', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_checkpoints', to='documents.document')),
+            ],
+            options={
+                'verbose_name': 'Document Stage Checkpoint',
+                'verbose_name_plural': 'Document Stage Checkpoints',
+                'unique_together': {('document', 'stage')},
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:30
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_text_to_content(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    DocumentContent = apps.get_model('documents', 'DocumentContent')
+
+    batch = []
+    documents = Document.objects.exclude(extracted_text='', summary_text='').values_list(
+        'id', 'extracted_text', 'summary_text'
+    )
+    for document_id, extracted_text, summary_text in documents.iterator(chunk_size=200):
+        extracted = (extracted_text or '').encode('utf-8')
+        summary = (summary_text or '').encode('utf-8')
+        batch.append(DocumentContent(
+            document_id=document_id,
+            compression='zlib',
+            extracted_text_data=zlib.compress(extracted) if extracted else b'',
+            extracted_text_size=len(extracted),
+            summary_text_data=zlib.compress(summary) if summary else b'',
+            summary_text_size=len(summary),
+        ))
+        if len(batch) >= 200:
+            DocumentContent.objects.bulk_create(batch)
+            batch = []
+
+    if batch:
+        DocumentContent.objects.bulk_create(batch)
+
+
+def copy_content_to_text(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    DocumentContent = apps.get_model('documents', 'DocumentContent')
+
+    def decode(data, compression):
+        data = bytes(data or b'')
+        if data and compression == 'zlib':
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+    for content in DocumentContent.objects.iterator(chunk_size=200):
+        Document.objects.filter(pk=content.document_id).update(
+            extracted_text=decode(content.extracted_text_data, content.compression),
+            summary_text=decode(content.summary_text_data, content.compression),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_documentstagecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentContent',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='content', serialize=False, to='documents.document')),
+                ('compression', models.CharField(choices=[('none', 'None'), ('zlib', 'zlib')], default='zlib', max_length=10)),
+                ('extracted_text_data', models.BinaryField(default=b'')),
+                ('extracted_text_size', models.PositiveIntegerField(default=0, help_text='Uncompressed size in bytes')),
+                ('summary_text_data', models.BinaryField(default=b'')),
+                ('summary_text_size', models.PositiveIntegerField(default=0, help_text='Uncompressed size in bytes')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Document Content',
+                'verbose_name_plural': 'Document Contents',
+            },
+        ),
+        migrations.RunPython(copy_text_to_content, copy_content_to_text),
+        migrations.RemoveField(
+            model_name='document',
+            name='extracted_text',
+        ),
+        migrations.RemoveField(
+            model_name='document',
+            name='summary_text',
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_documentcontent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', '-created_at'], name='doc_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['user', 'status', '-created_at'], name='doc_user_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('status', 'processing')), fields=['processing_started_at'], name='doc_processing_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='processinglog',
+            index=models.Index(fields=['document', '-timestamp'], name='proclog_document_time_idx'),
+        ),
+    ]
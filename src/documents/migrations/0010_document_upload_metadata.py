@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='content_hash',
+            field=models.CharField(blank=True, help_text='SHA-256 of the file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='mime_type',
+            field=models.CharField(blank=True, help_text='MIME type detected from the file content', max_length=100),
+        ),
+    ]
@@ -1,8 +1,10 @@
 import os
+import zlib
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
+from .uploads import EXPECTED_MIME_TYPES, upload_mime_type, upload_sha256
 
 
 def document_upload_path(instance, filename):
@@ -16,6 +18,32 @@ def audio_upload_path(instance, filename):
     return f"audio/{instance.document.user.id}/{timezone.now().year}/{timezone.now().month}/{filename}"
 
 
+def audio_blob_upload_path(instance, filename):
+    """Generate upload path for shared audio blobs"""
+    # Create path: audio/blobs/ab/abcdef....mp3
+    return f"audio/blobs/{instance.content_hash[:2]}/{filename}"
+
+
+class DocumentQuerySet(models.QuerySet):
+    """QuerySet for Document"""
+    
+    def with_audio_info(self):
+        """
+        Annotate completed-audio availability and the latest completed audio summary
+        
+        Adds has_completed_audio, latest_audio_id, latest_audio_duration and
+        latest_audio_generated_at, so lists don't query audio per row.
+        """
+        completed_audio = AudioSummary.objects.filter(document=models.OuterRef('pk'), status='completed')
+        latest_audio = completed_audio.order_by('-generated_at')
+        return self.annotate(
+            has_completed_audio=models.Exists(completed_audio),
+            latest_audio_id=models.Subquery(latest_audio.values('id')[:1]),
+            latest_audio_duration=models.Subquery(latest_audio.values('audio_duration')[:1]),
+            latest_audio_generated_at=models.Subquery(latest_audio.values('generated_at')[:1]),
+        )
+
+
 class Document(models.Model):
     """Model for uploaded documents"""
     
@@ -50,6 +78,9 @@ class Document(models.Model):
     file_type = models.CharField(max_length=10, choices=DOCUMENT_TYPES)
     file_size = models.PositiveIntegerField(help_text="File size in bytes")
     original_filename = models.CharField(max_length=255)
+    # Computed while the upload streams in (see documents.uploads)
+    content_hash = models.CharField(max_length=64, blank=True, help_text="SHA-256 of the file")
+    mime_type = models.CharField(max_length=100, blank=True, help_text="MIME type detected from the file content")
     
     # Processing status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploaded')
@@ -57,14 +88,12 @@ class Document(models.Model):
     processing_completed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(blank=True)
     
-    # Extracted content
-    extracted_text = models.TextField(blank=True)
+    # Extracted content (text is stored in DocumentContent)
     text_extraction_confidence = models.FloatField(null=True, blank=True)
     page_count = models.PositiveIntegerField(null=True, blank=True)
     word_count = models.PositiveIntegerField(null=True, blank=True)
     
-    # AI Summary
-    summary_text = models.TextField(blank=True)
+    # AI Summary (text is stored in DocumentContent)
     summary_length = models.CharField(
         max_length=20,
         choices=[
@@ -99,10 +128,23 @@ class Document(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = DocumentQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Document'
         verbose_name_plural = 'Documents'
+        indexes = [
+            # Dashboard and API lists: a user's documents, newest first, optionally by status
+            models.Index(fields=['user', '-created_at'], name='doc_user_created_idx'),
+            models.Index(fields=['user', 'status', '-created_at'], name='doc_user_status_created_idx'),
+            # Stuck-document sweep only looks at documents still processing
+            models.Index(
+                fields=['processing_started_at'],
+                name='doc_processing_started_idx',
+                condition=models.Q(status='processing'),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.user.get_full_name()}"
@@ -139,17 +181,51 @@ class Document(models.Model):
     @property
     def has_audio(self):
         """Check if document has associated audio"""
+        # Set by Document.objects.with_audio_info()
+        if hasattr(self, 'has_completed_audio'):
+            return self.has_completed_audio
         return self.audio_summaries.filter(status='completed').exists()
     
+    def _get_content(self, create=False):
+        """Related DocumentContent, loaded on first access and cached on the instance"""
+        try:
+            return self.content
+        except DocumentContent.DoesNotExist:
+            if not create:
+                return None
+            content = DocumentContent(document=self)
+            self.content = content
+            return content
+    
+    @property
+    def extracted_text(self):
+        """Extracted document text"""
+        content = self._get_content()
+        return content.get_text('extracted_text') if content else ''
+    
+    @extracted_text.setter
+    def extracted_text(self, value):
+        self._get_content(create=True).set_text('extracted_text', value)
+    
+    @property
+    def summary_text(self):
+        """AI summary text"""
+        content = self._get_content()
+        return content.get_text('summary_text') if content else ''
+    
+    @summary_text.setter
+    def summary_text(self, value):
+        self._get_content(create=True).set_text('summary_text', value)
+    
     def increment_view_count(self):
-        """Increment view count"""
-        self.view_count += 1
-        self.save(update_fields=['view_count'])
+        """Increment view count (buffered, written by flush_buffered_counters)"""
+        from .counters import increment
+        increment(self, 'view_count')
     
     def increment_audio_play_count(self):
-        """Increment audio play count"""
-        self.audio_play_count += 1
-        self.save(update_fields=['audio_play_count'])
+        """Increment audio play count (buffered, written by flush_buffered_counters)"""
+        from .counters import increment
+        increment(self, 'audio_play_count')
     
     def increment_question_count(self):
         """Increment question count"""
@@ -168,12 +244,17 @@ class Document(models.Model):
                 raise ValidationError(f'File size exceeds maximum limit of {self.MAX_FILE_SIZE // (1024*1024)}MB.')
     
     def is_valid_file_type(self):
-        """Check if file type is valid"""
+        """Check if file type is valid and, for a new upload, that its content matches the extension"""
         if not self.file:
             return False
         
         extension = self.file.name.split('.')[-1].lower() if '.' in self.file.name else ''
-        return extension in self.ALLOWED_EXTENSIONS
+        if extension not in self.ALLOWED_EXTENSIONS:
+            return False
+        
+        if not self.file._committed:
+            return upload_mime_type(self.file.file) == EXPECTED_MIME_TYPES[extension]
+        return True
 
     def is_valid_file_size(self):
         """Check if file size is within limits"""
@@ -189,13 +270,144 @@ class Document(models.Model):
             self.original_filename = self.file.name
             self.file_size = self.file.size
             
+            if not self.file._committed:
+                self.content_hash = upload_sha256(self.file.file)
+                self.mime_type = upload_mime_type(self.file.file)
+            
             # Determine file type from extension
             if '.' in self.file.name:
                 extension = self.file.name.split('.')[-1].lower()
                 self.file_type = extension
         
+        # Text fields live in DocumentContent and are saved with it below
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = [
+                name for name in update_fields if name not in DocumentContent.TEXT_FIELDS
+            ]
+        
         # Call parent save method explicitly
         super(Document, self).save(*args, **kwargs)
+        
+        # Normally already saved by the save_document_content post_save receiver
+        self.save_content()
+    
+    def save_content(self):
+        """Write pending extracted_text/summary_text changes to DocumentContent"""
+        content = Document.content.related.get_cached_value(self, default=None)
+        if content is not None and content.has_changes:
+            content.document = self
+            content.save()
+
+
+def compress_text(text, compression):
+    """Encode text for a DocumentContent column"""
+    data = (text or '').encode('utf-8')
+    if compression == 'zlib':
+        return zlib.compress(data, getattr(settings, 'DOCUMENT_CONTENT_COMPRESSION_LEVEL', 6))
+    return data
+
+
+def decompress_text(data, compression):
+    """Inverse of compress_text"""
+    if not data:
+        return ''
+    data = bytes(data)
+    if compression == 'zlib':
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
+
+
+class DocumentContent(models.Model):
+    """Extracted and summary text of a document, kept out of the Document row"""
+    
+    COMPRESSION_CHOICES = [
+        ('none', 'None'),
+        ('zlib', 'zlib'),
+    ]
+    
+    TEXT_FIELDS = ('extracted_text', 'summary_text')
+    
+    document = models.OneToOneField(
+        Document, on_delete=models.CASCADE, primary_key=True, related_name='content'
+    )
+    compression = models.CharField(max_length=10, choices=COMPRESSION_CHOICES, default='zlib')
+    extracted_text_data = models.BinaryField(default=b'')
+    extracted_text_size = models.PositiveIntegerField(default=0, help_text="Uncompressed size in bytes")
+    summary_text_data = models.BinaryField(default=b'')
+    summary_text_size = models.PositiveIntegerField(default=0, help_text="Uncompressed size in bytes")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Document Content'
+        verbose_name_plural = 'Document Contents'
+    
+    def __str__(self):
+        return f"Content for {self.document_id}"
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._texts = {}
+        self._changed = set()
+        # New rows use the configured codec; rows loaded from the database pass args
+        if not args and 'compression' not in kwargs:
+            self.compression = getattr(settings, 'DOCUMENT_CONTENT_COMPRESSION', 'zlib')
+    
+    def get_text(self, name):
+        """Decoded text for name, decompressed once per instance"""
+        if name not in self._texts:
+            self._texts[name] = decompress_text(getattr(self, f'{name}_data'), self.compression)
+        return self._texts[name]
+    
+    def set_text(self, name, value):
+        value = value or ''
+        data = compress_text(value, self.compression)
+        setattr(self, f'{name}_data', data)
+        setattr(self, f'{name}_size', len(value.encode('utf-8')))
+        self._texts[name] = value
+        self._changed.add(name)
+    
+    @property
+    def has_changes(self):
+        return bool(self._changed)
+    
+    def save(self, *args, **kwargs):
+        # Only rewrite the columns that changed on an existing row
+        if not self._state.adding and self._changed and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = [
+                column for name in self._changed for column in (f'{name}_data', f'{name}_size')
+            ] + ['updated_at']
+        super().save(*args, **kwargs)
+        self._changed.clear()
+
+
+class AudioBlob(models.Model):
+    """Deduplicated synthesized audio shared by audio summaries"""
+    
+    # Hash of (text, voice, rate, pitch, format) the audio was synthesized from
+    content_hash = models.CharField(max_length=64, unique=True)
+    
+    # Audio file
+    audio_file = models.FileField(upload_to=audio_blob_upload_path)
+    audio_format = models.CharField(max_length=10, default='mp3')
+    audio_duration = models.PositiveIntegerField(null=True, blank=True, help_text="Duration in seconds")
+    audio_size = models.PositiveIntegerField(null=True, blank=True, help_text="File size in bytes")
+    segment_manifest = models.JSONField(default=list, blank=True)
+    
+    # Number of audio summaries pointing at this blob
+    reference_count = models.PositiveIntegerField(default=0)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Audio Blob'
+        verbose_name_plural = 'Audio Blobs'
+    
+    def __str__(self):
+        return f"{self.content_hash[:12]}... ({self.reference_count} refs)"
 
 
 class AudioSummary(models.Model):
@@ -209,8 +421,11 @@ class AudioSummary(models.Model):
     
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='audio_summaries')
     
-    # Audio file
+    # Audio file (points at the shared blob file when blob is set)
     audio_file = models.FileField(upload_to=audio_upload_path, blank=True)
+    blob = models.ForeignKey(
+        AudioBlob, on_delete=models.PROTECT, null=True, blank=True, related_name='audio_summaries'
+    )
     audio_format = models.CharField(max_length=10, default='mp3')
     audio_duration = models.PositiveIntegerField(null=True, blank=True, help_text="Duration in seconds")
     audio_size = models.PositiveIntegerField(null=True, blank=True, help_text="File size in bytes")
@@ -220,6 +435,9 @@ class AudioSummary(models.Model):
     speech_rate = models.CharField(max_length=20, default='medium')
     speech_pitch = models.CharField(max_length=20, default='medium')
     
+    # Per-segment manifest from chunked synthesis (offsets, byte ranges, timings)
+    segment_manifest = models.JSONField(default=list, blank=True)
+    
     # Generation info
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='generating')
     generated_at = models.DateTimeField(auto_now_add=True)
@@ -264,6 +482,7 @@ class Question(models.Model):
     # Context
     audio_timestamp = models.PositiveIntegerField(null=True, blank=True, help_text="Timestamp in audio when question was asked")
     context_snippet = models.TextField(blank=True, help_text="Relevant text snippet from document")
+    context_offsets = models.JSONField(default=list, blank=True, help_text="Character offsets of the snippet sentences in the document text")
     
     # AI processing
     is_answered = models.BooleanField(default=False)
@@ -341,10 +560,99 @@ class DocumentShare(models.Model):
         return False
     
     def increment_access_count(self):
-        """Increment access count and update last accessed"""
-        self.access_count += 1
+        """Increment access count and update last accessed (buffered, written by flush_buffered_counters)"""
+        from .counters import increment
         self.last_accessed = timezone.now()
-        self.save(update_fields=['access_count', 'last_accessed'])
+        increment(self, 'access_count')
+
+
+class DocumentIndex(models.Model):
+    """Retrieval index over a document's extracted text used to ground Q&A"""
+    
+    document = models.OneToOneField(Document, on_delete=models.CASCADE, related_name='retrieval_index')
+    
+    # Serialized ai_services.retrieval.BM25Index
+    index_data = models.BinaryField()
+    # Serialized ai_services.retrieval.SentenceIndex
+    sentence_data = models.BinaryField(null=True)
+    passage_count = models.PositiveIntegerField(default=0)
+    term_count = models.PositiveIntegerField(default=0)
+    
+    # Timestamps
+    built_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Document Index'
+        verbose_name_plural = 'Document Indexes'
+    
+    def __str__(self):
+        return f"Index for {self.document.title} ({self.passage_count} passages)"
+
+
+class DocumentStageCheckpoint(models.Model):
+    """Persistent record of which pipeline stages a document has finished"""
+    
+    STAGES = [
+        ('text_extraction', 'Text Extraction'),
+        ('summarization', 'AI Summarization'),
+        ('audio_generation', 'Audio Generation'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='stage_checkpoints')
+    stage = models.CharField(max_length=20, choices=STAGES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    result = models.JSONField(default=dict, blank=True)
+    error_message = models.TextField(blank=True)
+    
+    # Timestamps
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['document', 'stage']
+        verbose_name = 'Document Stage Checkpoint'
+        verbose_name_plural = 'Document Stage Checkpoints'
+    
+    def __str__(self):
+        return f"{self.document.title} - {self.stage} - {self.status}"
+    
+    @classmethod
+    def is_completed(cls, document_id, stage) -> bool:
+        return cls.objects.filter(document_id=document_id, stage=stage, status='completed').exists()
+    
+    @classmethod
+    def mark_started(cls, document_id, stage):
+        checkpoint, _ = cls.objects.get_or_create(document_id=document_id, stage=stage)
+        checkpoint.status = 'running'
+        checkpoint.attempts = models.F('attempts') + 1
+        checkpoint.error_message = ''
+        checkpoint.started_at = timezone.now()
+        checkpoint.save(update_fields=['status', 'attempts', 'error_message', 'started_at', 'updated_at'])
+    
+    @classmethod
+    def mark_completed(cls, document_id, stage, **result):
+        cls.objects.update_or_create(
+            document_id=document_id,
+            stage=stage,
+            defaults={'status': 'completed', 'result': result, 'completed_at': timezone.now()}
+        )
+    
+    @classmethod
+    def mark_failed(cls, document_id, stage, error_message):
+        cls.objects.update_or_create(
+            document_id=document_id,
+            stage=stage,
+            defaults={'status': 'failed', 'error_message': error_message}
+        )
 
 
 class ProcessingLog(models.Model):
@@ -375,6 +683,9 @@ class ProcessingLog(models.Model):
         ordering = ['-timestamp']
         verbose_name = 'Processing Log'
         verbose_name_plural = 'Processing Logs'
+        indexes = [
+            models.Index(fields=['document', '-timestamp'], name='proclog_document_time_idx'),
+        ]
     
     def __str__(self):
         return f"{self.document.title} - {self.step} - {self.level}"
\ No newline at end of file
@@ -0,0 +1,34 @@
+from django.conf import settings
+
+# Redis broker priorities: 0 is served first
+DEFAULT_TIER_PRIORITIES = {
+    'enterprise': 0,
+    'edu': 3,
+    'pro': 3,
+    'free': 6,
+}
+
+
+def priority_for_user(user) -> int:
+    """Celery task priority for a user's subscription tier"""
+    priorities = getattr(settings, 'CELERY_TIER_PRIORITIES', DEFAULT_TIER_PRIORITIES)
+    return priorities.get(getattr(user, 'subscription_tier', 'free'), priorities.get('free', 6))
+
+
+def get_queue_depths() -> dict:
+    """Number of waiting messages in each configured queue"""
+    from core.celery import app
+    
+    depths = {}
+    with app.connection_for_read() as connection:
+        connection.ensure_connection(max_retries=1)
+        for queue in getattr(settings, 'CELERY_QUEUE_CONCURRENCY', {}):
+            # A failed passive declare closes the channel, so use one per queue
+            with connection.channel() as channel:
+                try:
+                    depths[queue] = channel.queue_declare(queue=queue, passive=True).message_count
+                except connection.channel_errors:
+                    # Queues are created on first publish; a missing queue is empty
+                    depths[queue] = 0
+    
+    return depths
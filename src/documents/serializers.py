@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Document, AudioSummary, Question, DocumentShare, ProcessingLog
+from .uploads import EXPECTED_MIME_TYPES, upload_mime_type
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -15,20 +16,32 @@ class DocumentSerializer(serializers.ModelSerializer):
         model = Document
         fields = [
             'id', 'title', 'description', 'file', 'file_type', 'file_size', 'file_size_mb',
-            'original_filename', 'status', 'processing_started_at', 'processing_completed_at',
-            'error_message', 'extracted_text', 'text_extraction_confidence', 'page_count',
-            'word_count', 'summary_text', 'summary_length', 'tags', 'language',
+            'original_filename', 'content_hash', 'mime_type', 'status', 'processing_started_at',
+            'processing_completed_at', 'error_message', 'extracted_text', 'text_extraction_confidence',
+            'page_count', 'word_count', 'summary_text', 'summary_length', 'tags', 'language',
             'subject_area', 'difficulty_level', 'view_count', 'audio_play_count',
             'total_questions_asked', 'average_session_duration', 'created_at', 'updated_at',
             'processing_duration', 'is_processing', 'is_completed', 'has_audio'
         ]
         read_only_fields = [
-            'id', 'user', 'file_size', 'original_filename', 'status', 'processing_started_at',
-            'processing_completed_at', 'error_message', 'extracted_text', 'text_extraction_confidence',
+            'id', 'user', 'file_size', 'original_filename', 'content_hash', 'mime_type', 'status',
+            'processing_started_at', 'processing_completed_at', 'error_message', 'extracted_text', 'text_extraction_confidence',
             'page_count', 'word_count', 'summary_text', 'view_count', 'audio_play_count',
             'total_questions_asked', 'average_session_duration', 'created_at', 'updated_at'
         ]
     
+    def validate_file(self, value):
+        """Check the upload's size and that its content matches its extension"""
+        if value.size > Document.MAX_FILE_SIZE:
+            raise serializers.ValidationError(
+                f'File size exceeds maximum limit of {Document.MAX_FILE_SIZE // (1024*1024)}MB.'
+            )
+        
+        extension = value.name.split('.')[-1].lower() if '.' in value.name else ''
+        if upload_mime_type(value) != EXPECTED_MIME_TYPES.get(extension):
+            raise serializers.ValidationError('File content does not match its extension.')
+        return value
+    
     def create(self, validated_data):
         # Set user from request context
         validated_data['user'] = self.context['request'].user
@@ -49,7 +62,9 @@ class DocumentListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for document lists"""
     
     file_size_mb = serializers.ReadOnlyField()
+    # Reads the has_completed_audio annotation from Document.objects.with_audio_info() when present
     has_audio = serializers.ReadOnlyField()
+    latest_audio = serializers.SerializerMethodField()
     
     class Meta:
         model = Document
@@ -57,8 +72,18 @@ class DocumentListSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'file_type', 'file_size_mb', 'status',
             'summary_length', 'tags', 'subject_area', 'difficulty_level',
             'view_count', 'audio_play_count', 'total_questions_asked',
-            'created_at', 'has_audio'
+            'created_at', 'has_audio', 'latest_audio'
         ]
+    
+    def get_latest_audio(self, obj):
+        """Latest completed audio summary, taken from the with_audio_info() annotations"""
+        if getattr(obj, 'latest_audio_id', None) is None:
+            return None
+        return {
+            'id': obj.latest_audio_id,
+            'audio_duration': obj.latest_audio_duration,
+            'generated_at': serializers.DateTimeField().to_representation(obj.latest_audio_generated_at),
+        }
 
 
 class AudioSummarySerializer(serializers.ModelSerializer):
@@ -72,12 +97,12 @@ class AudioSummarySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'document', 'audio_file', 'audio_format', 'audio_duration',
             'audio_duration_formatted', 'audio_size', 'audio_size_mb', 'voice_name',
-            'speech_rate', 'speech_pitch', 'status', 'generated_at', 'generation_time',
-            'azure_request_id', 'azure_cost'
+            'speech_rate', 'speech_pitch', 'segment_manifest', 'status', 'generated_at',
+            'generation_time', 'azure_request_id', 'azure_cost'
         ]
         read_only_fields = [
             'id', 'document', 'audio_file', 'audio_format', 'audio_duration',
-            'audio_size', 'status', 'generated_at', 'generation_time',
+            'audio_size', 'segment_manifest', 'status', 'generated_at', 'generation_time',
             'azure_request_id', 'azure_cost'
         ]
 
@@ -91,12 +116,12 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Question
         fields = [
             'id', 'document', 'question_text', 'answer_text', 'audio_timestamp',
-            'context_snippet', 'is_answered', 'answer_confidence', 'processing_time',
+            'context_snippet', 'context_offsets', 'is_answered', 'answer_confidence', 'processing_time',
             'user_rating', 'user_feedback', 'azure_request_id', 'azure_cost',
             'asked_at', 'answered_at', 'response_time'
         ]
         read_only_fields = [
-            'id', 'user', 'document', 'answer_text', 'context_snippet', 'is_answered',
+            'id', 'user', 'document', 'answer_text', 'context_snippet', 'context_offsets', 'is_answered',
             'answer_confidence', 'processing_time', 'azure_request_id', 'azure_cost',
             'asked_at', 'answered_at'
         ]
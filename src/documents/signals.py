@@ -5,11 +5,43 @@ from django.db.models.signals import post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.core.files.storage import default_storage
-from .models import Document, AudioSummary, Question, ProcessingLog
+from .models import Document, DocumentStageCheckpoint, AudioSummary, Question, ProcessingLog
+from .audio_store import acquire_blob, release_blob
+from .stats import DocumentStatsService
+from realtime.events import document_status_event, processing_log_event, publish_event, stage_event
+from users.models import UserProfile
 
 logger = logging.getLogger(__name__)
 
 
+@receiver(post_save, sender=Document)
+def save_document_content(sender, instance, **kwargs):
+    """Persist text set on the instance before the handlers below read or refresh it"""
+    instance.save_content()
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_document_stats(sender, instance, **kwargs):
+    """Drop the owner's cached dashboard statistics"""
+    DocumentStatsService.invalidate(instance.user_id)
+
+
+# A delete leaves no changed row behind, so the owner's profile is touched
+# for generate_usage_analytics to recount it
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=Question)
+def mark_usage_analytics_stale(sender, instance, **kwargs):
+    """Have the owner's profile analytics recomputed on the next run"""
+    UserProfile.objects.filter(user_id=instance.user_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=AudioSummary)
+def mark_audio_usage_analytics_stale(sender, instance, **kwargs):
+    """Have the document owner's profile analytics recomputed on the next run"""
+    UserProfile.objects.filter(user__documents=instance.document_id).update(updated_at=timezone.now())
+
+
 @receiver(post_save, sender=Document)
 def document_post_save(sender, instance, created, **kwargs):
     """Handle document creation and updates"""
@@ -33,7 +65,10 @@ def document_post_save(sender, instance, created, **kwargs):
             status='processing',
             processing_started_at=timezone.now()
         )
+        # The update bypasses invalidate_document_stats
+        DocumentStatsService.invalidate(instance.user_id)
         instance.refresh_from_db()
+        publish_event(instance.user_id, document_status_event(instance))
         
         # Process synchronously for development
         try:
@@ -45,7 +80,8 @@ def document_post_save(sender, instance, created, **kwargs):
             else:
                 # Use Celery in production
                 from .tasks import process_document_pipeline
-                process_document_pipeline.delay(instance.id)
+                from .queues import priority_for_user
+                process_document_pipeline.apply_async((instance.id,), priority=priority_for_user(instance.user))
                 
             logger.info(f"Started processing pipeline for document {instance.id}")
         except Exception as e:
@@ -55,6 +91,9 @@ def document_post_save(sender, instance, created, **kwargs):
                 status='failed',
                 error_message=f"Failed to start processing: {str(e)}"
             )
+            DocumentStatsService.invalidate(instance.user_id)
+            instance.refresh_from_db()
+            publish_event(instance.user_id, document_status_event(instance))
             
             ProcessingLog.objects.create(
                 document=instance,
@@ -64,6 +103,32 @@ def document_post_save(sender, instance, created, **kwargs):
             )
 
 
+# Realtime processing events
+@receiver(post_save, sender=Document)
+def publish_document_status(sender, instance, created, update_fields=None, **kwargs):
+    """Push document status changes to the owner's event stream"""
+    
+    if created or update_fields is None or 'status' in update_fields:
+        publish_event(instance.user_id, document_status_event(instance))
+
+
+@receiver(post_save, sender=ProcessingLog)
+def publish_processing_log(sender, instance, created, **kwargs):
+    """Push new processing log entries to the owner's event stream"""
+    
+    if created:
+        publish_event(instance.document.user_id, processing_log_event(instance))
+
+
+@receiver(post_save, sender=DocumentStageCheckpoint)
+def publish_stage_transition(sender, instance, **kwargs):
+    """Push pipeline stage transitions to the owner's event stream"""
+    
+    user_id = Document.objects.filter(id=instance.document_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        publish_event(user_id, stage_event(instance))
+
+
 @receiver(pre_delete, sender=Document)
 def document_pre_delete(sender, instance, **kwargs):
     """Handle document deletion - cleanup files"""
@@ -75,8 +140,8 @@ def document_pre_delete(sender, instance, **kwargs):
     if instance.file:
         files_to_delete.append(instance.file.path)
     
-    # Add associated audio files
-    for audio_summary in instance.audio_summaries.all():
+    # Add associated audio files (shared blobs are released by the audio summary signals)
+    for audio_summary in instance.audio_summaries.filter(blob__isnull=True):
         if audio_summary.audio_file:
             files_to_delete.append(audio_summary.audio_file.path)
     
@@ -117,6 +182,10 @@ def audio_summary_post_save(sender, instance, created, **kwargs):
     """Handle audio summary creation and updates"""
     
     if created:
+        # Take a reference on the shared audio blob
+        if instance.blob_id:
+            acquire_blob(instance.blob_id)
+        
         ProcessingLog.objects.create(
             document=instance.document,
             step='audio_generation',
@@ -133,13 +202,18 @@ def audio_summary_post_save(sender, instance, created, **kwargs):
 @receiver(pre_delete, sender=AudioSummary)
 def audio_summary_pre_delete(sender, instance, **kwargs):
     """Handle audio summary deletion - cleanup audio file"""
-    if instance.audio_file:
+    # Shared blob files are only removed when their last reference is released
+    if instance.audio_file and not instance.blob_id:
         instance._audio_file_path = instance.audio_file.path
 
 
 @receiver(post_delete, sender=AudioSummary)
 def audio_summary_post_delete(sender, instance, **kwargs):
     """Cleanup audio file after deletion"""
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+        return
+    
     audio_file_path = getattr(instance, '_audio_file_path', None)
     
     if audio_file_path:
@@ -169,11 +243,16 @@ def question_post_save(sender, instance, created, **kwargs):
             }
         )
         
+        # Questions answered over the realtime stream are saved already answered
+        if instance.is_answered:
+            return
+        
         # Trigger AI processing for the question
         from .tasks import process_question
+        from .queues import priority_for_user
         
         try:
-            process_question.delay(instance.id)
+            process_question.apply_async((instance.id,), priority=priority_for_user(instance.user))
             logger.info(f"Started processing question {instance.id}")
         except Exception as e:
             logger.error(f"Failed to start question processing for question {instance.id}: {str(e)}")
@@ -222,25 +301,3 @@ def update_audio_analytics(sender, instance, **kwargs):
         
         profile.total_audio_time_listened = total_audio_time
         profile.save(update_fields=['total_audio_time_listened'])
-
-
-# Cleanup signals for orphaned files
-@receiver(post_save, sender=Document)
-def cleanup_failed_documents(sender, instance, **kwargs):
-    """Cleanup documents that have been in processing state too long"""
-    
-    if instance.status == 'processing' and instance.processing_started_at:
-        # Check if processing has been running for more than 30 minutes
-        processing_time = timezone.now() - instance.processing_started_at
-        
-        if processing_time.total_seconds() > 1800:  # 30 minutes
-            instance.status = 'failed'
-            instance.error_message = 'Processing timeout - operation took too long'
-            instance.save(update_fields=['status', 'error_message'])
-            
-            ProcessingLog.objects.create(
-                document=instance,
-                step='processing',
-                level='error',
-                message='Document processing timed out after 30 minutes'
-            )
\ No newline at end of file
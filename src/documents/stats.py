@@ -0,0 +1,61 @@
+"""
+Per-user document statistics
+
+All counters come from one conditional aggregate over the user's documents
+and are cached until one of the user's documents is saved or deleted.
+"""
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import Document
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentStatsService:
+    """Aggregate document statistics for a user"""
+
+    CACHE_KEY = 'documents:stats:{user_id}'
+
+    def __init__(self, timeout: int = None):
+        self.timeout = timeout if timeout is not None else getattr(settings, 'DOCUMENT_STATS_CACHE_TTL', 300)
+
+    @staticmethod
+    def aggregate(queryset) -> dict:
+        """Document counts by status and summed analytics for queryset, in one query"""
+        return queryset.order_by().aggregate(
+            total_documents=Count('id'),
+            completed_documents=Count('id', filter=Q(status='completed')),
+            processing_documents=Count('id', filter=Q(status__in=['uploaded', 'processing'])),
+            failed_documents=Count('id', filter=Q(status__in=['failed', 'error'])),
+            total_questions_asked=Coalesce(Sum('total_questions_asked'), 0),
+            total_audio_plays=Coalesce(Sum('audio_play_count'), 0),
+        )
+
+    def get_stats(self, user) -> dict:
+        """Cached statistics over all of user's documents"""
+        key = self.CACHE_KEY.format(user_id=user.pk)
+        try:
+            stats = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Failed to read document stats cache for user {user.pk}: {str(e)}")
+            stats = None
+
+        if stats is None:
+            stats = self.aggregate(Document.objects.filter(user=user))
+            try:
+                cache.set(key, stats, self.timeout)
+            except Exception as e:
+                logger.warning(f"Failed to cache document stats for user {user.pk}: {str(e)}")
+
+        return stats
+
+    @classmethod
+    def invalidate(cls, user_id) -> None:
+        """Drop cached statistics for a user"""
+        try:
+            cache.delete(cls.CACHE_KEY.format(user_id=user_id))
+        except Exception as e:
+            logger.warning(f"Failed to invalidate document stats for user {user_id}: {str(e)}")
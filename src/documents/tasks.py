@@ -1,17 +1,102 @@
 import os
 import logging
+import time
 from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
-from celery import shared_task
-from .models import Document, AudioSummary, Question, ProcessingLog
-from ai_services.document_intelligence import DocumentIntelligenceService
-from ai_services.openai_service import OpenAIService
-from ai_services.speech_service import SpeechService
+from celery import chain, shared_task
+from .models import Document, DocumentStageCheckpoint, AudioSummary, Question, ProcessingLog
+from .audio_store import create_audio_summary
+from .cleanup import chunked, cleanup_old_audio, finish_report
+from .counters import flush_counters
+from .queues import priority_for_user
+from .stats import DocumentStatsService
+from .indexing import build_document_index, load_sentence_index, retrieve_context
+from ai_services.registry import get_document_intelligence_service, get_openai_service, get_speech_service
+from realtime.events import document_status_event, processing_log_event, publish_event, stage_event
 
 logger = logging.getLogger(__name__)
 
 
+def _summary_progress_logger(document):
+    """Build a callback that records map-reduce summarization progress per chunk"""
+    
+    def log_chunk_progress(completed, total, chunk_result):
+        ProcessingLog.objects.create(
+            document=document,
+            step='summarization',
+            level='info',
+            message=f'Summarized chunk {completed} of {total}',
+            details={
+                'chunk_index': chunk_result['index'],
+                'completed_chunks': completed,
+                'total_chunks': total,
+                'tokens_used': chunk_result['total_tokens']
+            }
+        )
+    
+    return log_chunk_progress
+
+
+def _build_retrieval_index(document):
+    """Index extracted text for Q&A; on failure the index is built on the first question"""
+    try:
+        document_index = build_document_index(document)
+        ProcessingLog.objects.create(
+            document=document,
+            step='text_extraction',
+            level='info',
+            message=f'Retrieval index built with {document_index.passage_count} passages',
+            details={
+                'passage_count': document_index.passage_count,
+                'term_count': document_index.term_count
+            }
+        )
+    except Exception as e:
+        logger.warning(f"Failed to build retrieval index for document {document.id}: {str(e)}")
+
+
+PIPELINE_STAGES = ['text_extraction', 'summarization', 'audio_generation']
+
+
+def _skip_completed_stage(document, stage):
+    """Return True, and log it, when a checkpoint shows the stage already finished"""
+    if not DocumentStageCheckpoint.is_completed(document.id, stage):
+        return False
+    
+    ProcessingLog.objects.create(
+        document=document,
+        step=stage,
+        level='info',
+        message=f'Skipping {stage.replace("_", " ")}; already completed'
+    )
+    return True
+
+
+def _complete_document(document, message='Document processing pipeline completed successfully'):
+    """Mark a document whose pipeline stages have all finished as completed"""
+    document.status = 'completed'
+    document.processing_completed_at = timezone.now()
+    document.save(update_fields=['status', 'processing_completed_at'])
+    
+    ProcessingLog.objects.create(
+        document=document,
+        step='completion',
+        level='info',
+        message=message
+    )
+
+
+def build_document_pipeline(document_id, priority=None):
+    """Chain of pipeline stages; each stage skips itself when already checkpointed"""
+    options = {} if priority is None else {'priority': priority}
+    return chain(
+        extract_text_from_document.si(document_id).set(**options),
+        generate_ai_summary.si(document_id).set(**options),
+        generate_audio_summary.si(document_id).set(**options),
+    )
+
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def process_document_pipeline(self, document_id):
     """
@@ -31,8 +116,8 @@ def process_document_pipeline(self, document_id):
             message='Starting document processing pipeline'
         )
         
-        # Step 1: Extract text from document
-        extract_text_from_document.delay(document_id)
+        # Run the stages in order; completed stages are skipped on a resume
+        build_document_pipeline(document_id, priority_for_user(document.user)).apply_async()
         
     except Document.DoesNotExist:
         logger.error(f"Document {document_id} not found")
@@ -70,6 +155,10 @@ def extract_text_from_document(self, document_id):
     try:
         document = Document.objects.get(id=document_id)
         
+        if _skip_completed_stage(document, 'text_extraction'):
+            return
+        
+        DocumentStageCheckpoint.mark_started(document_id, 'text_extraction')
         ProcessingLog.objects.create(
             document=document,
             step='text_extraction',
@@ -77,11 +166,13 @@ def extract_text_from_document(self, document_id):
             message='Starting text extraction'
         )
         
-        # Initialize Document Intelligence service
-        doc_intel_service = DocumentIntelligenceService()
+        # Shared Document Intelligence service
+        doc_intel_service = get_document_intelligence_service()
         
         # Extract text from document
-        extraction_result = doc_intel_service.extract_text(document.file.path)
+        extraction_result = doc_intel_service.extract_text(
+            document.file.path, content_hash=document.content_hash or None
+        )
         
         # Update document with extracted content
         document.extracted_text = extraction_result['text']
@@ -91,6 +182,7 @@ def extract_text_from_document(self, document_id):
         document.save(update_fields=[
             'extracted_text', 'text_extraction_confidence', 'page_count', 'word_count'
         ])
+        _build_retrieval_index(document)
         
         ProcessingLog.objects.create(
             document=document,
@@ -100,12 +192,11 @@ def extract_text_from_document(self, document_id):
             details={
                 'word_count': document.word_count,
                 'page_count': document.page_count,
-                'confidence': document.text_extraction_confidence
+                'confidence': document.text_extraction_confidence,
+                'cache_hit': extraction_result.get('cache_hit', False)
             }
         )
-        
-        # Proceed to summarization
-        generate_ai_summary.delay(document_id)
+        DocumentStageCheckpoint.mark_completed(document_id, 'text_extraction', word_count=document.word_count)
         
     except Document.DoesNotExist:
         logger.error(f"Document {document_id} not found for text extraction")
@@ -114,6 +205,7 @@ def extract_text_from_document(self, document_id):
         logger.error(f"Text extraction failed for document {document_id}: {str(exc)}")
         
         try:
+            DocumentStageCheckpoint.mark_failed(document_id, 'text_extraction', str(exc))
             document = Document.objects.get(id=document_id)
             document.status = 'failed'
             document.error_message = f"Text extraction failed: {str(exc)}"
@@ -141,9 +233,13 @@ def generate_ai_summary(self, document_id):
     try:
         document = Document.objects.get(id=document_id)
         
+        if _skip_completed_stage(document, 'summarization'):
+            return
+        
         if not document.extracted_text:
             raise ValueError("No extracted text available for summarization")
         
+        DocumentStageCheckpoint.mark_started(document_id, 'summarization')
         ProcessingLog.objects.create(
             document=document,
             step='summarization',
@@ -151,8 +247,8 @@ def generate_ai_summary(self, document_id):
             message='Starting AI summarization'
         )
         
-        # Initialize OpenAI service
-        openai_service = OpenAIService()
+        # Shared OpenAI service
+        openai_service = get_openai_service()
         
         # Determine summary length based on user preference or document setting
         summary_style = 'teacher'  # Teacher-like explanation style
@@ -164,7 +260,8 @@ def generate_ai_summary(self, document_id):
             style=summary_style,
             length=summary_length,
             subject_area=document.subject_area,
-            difficulty_level=document.difficulty_level
+            difficulty_level=document.difficulty_level,
+            progress_callback=_summary_progress_logger(document)
         )
         
         # Update document with summary
@@ -178,13 +275,15 @@ def generate_ai_summary(self, document_id):
             message=f'AI summary generated successfully. {len(summary_result["summary"])} characters.',
             details={
                 'summary_length': len(summary_result['summary']),
-                'tokens_used': summary_result.get('tokens_used'),
-                'cost': summary_result.get('cost')
+                'tokens_used': summary_result.get('total_tokens'),
+                'cost': summary_result.get('estimated_cost'),
+                'chunk_count': summary_result.get('chunk_count', 1),
+                'cache_hit': summary_result.get('cache_hit', False)
             }
         )
-        
-        # Proceed to audio generation
-        generate_audio_summary.delay(document_id)
+        DocumentStageCheckpoint.mark_completed(
+            document_id, 'summarization', tokens_used=summary_result.get('total_tokens')
+        )
         
     except Document.DoesNotExist:
         logger.error(f"Document {document_id} not found for summarization")
@@ -193,6 +292,7 @@ def generate_ai_summary(self, document_id):
         logger.error(f"AI summarization failed for document {document_id}: {str(exc)}")
         
         try:
+            DocumentStageCheckpoint.mark_failed(document_id, 'summarization', str(exc))
             document = Document.objects.get(id=document_id)
             document.status = 'failed'
             document.error_message = f"AI summarization failed: {str(exc)}"
@@ -214,12 +314,22 @@ def generate_ai_summary(self, document_id):
 
 
 @shared_task(bind=True, max_retries=3)
-def generate_audio_summary(self, document_id, voice_name=None, speech_rate='medium', speech_pitch='medium'):
-    """Generate audio summary using Azure Speech Service"""
+def generate_audio_summary(self, document_id, voice_name=None, speech_rate='medium', speech_pitch='medium', force=False):
+    """
+    Generate audio summary using Azure Speech Service
+    
+    force regenerates the audio even when the pipeline stage is checkpointed,
+    e.g. for a different voice.
+    """
     
     try:
         document = Document.objects.get(id=document_id)
         
+        if not force and _skip_completed_stage(document, 'audio_generation'):
+            if document.status != 'completed':
+                _complete_document(document)
+            return
+        
         if not document.summary_text:
             raise ValueError("No summary text available for audio generation")
         
@@ -227,6 +337,7 @@ def generate_audio_summary(self, document_id, voice_name=None, speech_rate='medi
         if not voice_name:
             voice_name = document.user.preferred_voice
         
+        DocumentStageCheckpoint.mark_started(document_id, 'audio_generation')
         ProcessingLog.objects.create(
             document=document,
             step='audio_generation',
@@ -234,59 +345,33 @@ def generate_audio_summary(self, document_id, voice_name=None, speech_rate='medi
             message=f'Starting audio generation with voice {voice_name}'
         )
         
-        # Initialize Speech service FIRST
-        speech_service = SpeechService()
-        
-        # Generate audio BEFORE creating AudioSummary record
-        audio_result = speech_service.text_to_speech(
-            text=document.summary_text,
-            voice_name=voice_name,
-            speech_rate=speech_rate,
-            speech_pitch=speech_pitch
-        )
-        
-        # Save audio file
-        audio_filename = f"summary_{document_id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.mp3"
-        audio_path = f"audio/{document.user.id}/{timezone.now().year}/{timezone.now().month}/"
-        
-        # Ensure directory exists
-        full_audio_path = os.path.join(settings.MEDIA_ROOT, audio_path)
-        os.makedirs(full_audio_path, exist_ok=True)
-        
-        # Save audio file
-        full_audio_filename = os.path.join(full_audio_path, audio_filename)
-        with open(full_audio_filename, 'wb') as audio_file:
-            audio_file.write(audio_result['audio_data'])
-        
-        # NOW create AudioSummary record with all the data
-        audio_summary = AudioSummary.objects.create(
-            document=document,
-            audio_file=os.path.join(audio_path, audio_filename),
-            voice_name=voice_name,
-            speech_rate='medium',
-            speech_pitch='medium',
-            audio_duration=audio_result['duration'],
-            audio_size=len(audio_result['audio_data']),
-            status='completed'
+        # Reuse identical audio when it already exists, synthesize it otherwise
+        audio_summary, synthesized = create_audio_summary(
+            document, voice_name, speech_rate=speech_rate, speech_pitch=speech_pitch
         )
         
-        # Mark document as completed
-        document.status = 'completed'
-        document.processing_completed_at = timezone.now()
-        document.save(update_fields=['status', 'processing_completed_at'])
-        
         ProcessingLog.objects.create(
             document=document,
-            step='completion',
+            step='audio_generation',
             level='info',
-            message='Document processing pipeline completed successfully'
+            message='Audio generated' if synthesized else 'Reused existing audio with identical settings',
+            details={
+                'audio_summary_id': audio_summary.id,
+                'blob_id': audio_summary.blob_id,
+                'synthesized': synthesized
+            }
         )
+        DocumentStageCheckpoint.mark_completed(document_id, 'audio_generation', audio_summary_id=audio_summary.id)
+        
+        # Mark document as completed
+        _complete_document(document)
         
     except Exception as exc:
         logger.error(f"Audio generation failed for document {document_id}: {str(exc)}")
         
         # Mark document as failed
         try:
+            DocumentStageCheckpoint.mark_failed(document_id, 'audio_generation', str(exc))
             document = Document.objects.get(id=document_id)
             document.status = 'failed'
             document.error_message = f"Audio generation failed: {str(exc)}"
@@ -319,17 +404,28 @@ def process_question(self, question_id):
             message=f'Processing question: {question.question_text[:50]}...'
         )
         
-        # Initialize OpenAI service
-        openai_service = OpenAIService()
+        # Shared OpenAI service
+        openai_service = get_openai_service()
         
         # Process the question
         start_time = timezone.now()
         
+        # Only send the passages most relevant to the question
+        context = retrieve_context(document, question.question_text)
+        
+        try:
+            sentence_index = load_sentence_index(document)
+        except Exception as e:
+            logger.warning(f"Failed to load sentence index for document {document.id}: {str(e)}")
+            sentence_index = None
+        
         answer_result = openai_service.answer_question(
             question=question.question_text,
-            context=document.extracted_text,
+            context=context,
             summary=document.summary_text,
-            audio_timestamp=question.audio_timestamp
+            audio_timestamp=question.audio_timestamp,
+            sentence_index=sentence_index,
+            source_text=document.extracted_text
         )
         
         end_time = timezone.now()
@@ -338,6 +434,7 @@ def process_question(self, question_id):
         # Update question with answer
         question.answer_text = answer_result['answer']
         question.context_snippet = answer_result.get('context_snippet', '')
+        question.context_offsets = answer_result.get('context_offsets', [])
         question.answer_confidence = answer_result.get('confidence', 0.0)
         question.processing_time = processing_time
         question.azure_request_id = answer_result.get('request_id', '')
@@ -401,8 +498,8 @@ def generate_answer_audio(self, question_id):
             logger.info(f"User {question.user.id} doesn't have premium features for audio answers")
             return
         
-        # Initialize Speech service
-        speech_service = SpeechService()
+        # Shared Speech service
+        speech_service = get_speech_service()
         
         # Use user's preferred voice
         voice_name = question.user.preferred_voice
@@ -456,96 +553,204 @@ def generate_answer_audio(self, question_id):
 
 
 @shared_task
-def cleanup_failed_documents():
-    """Periodic task to cleanup documents stuck in processing state"""
+def cleanup_failed_documents(dry_run=False):
+    """
+    Periodic task to resume documents stuck in processing state
+    
+    The pipeline is re-dispatched and skips checkpointed stages. A document
+    is only marked failed once its next stage has used up
+    PIPELINE_MAX_STAGE_ATTEMPTS attempts. Stuck documents are streamed in
+    chunks; each chunk is failed with one UPDATE and logged with one bulk
+    insert. With dry_run nothing is changed.
     
-    # Find documents that have been processing for more than 1 hour
+    Returns:
+        Report with counts, elapsed time and documents per second
+    """
+    chunk_size = getattr(settings, 'CLEANUP_CHUNK_SIZE', 500)
     cutoff_time = timezone.now() - timedelta(hours=1)
+    max_attempts = getattr(settings, 'PIPELINE_MAX_STAGE_ATTEMPTS', 3)
+    started = time.monotonic()
+    report = {'dry_run': dry_run, 'checked': 0, 'resumed': 0, 'failed': 0, 'completed': 0}
+    
+    # Find documents that have been processing for more than 1 hour with no stage activity since
     stuck_documents = Document.objects.filter(
         status='processing',
         processing_started_at__lt=cutoff_time
-    )
+    ).exclude(
+        stage_checkpoints__updated_at__gte=cutoff_time
+    ).select_related('user').prefetch_related('stage_checkpoints')
     
-    for document in stuck_documents:
-        document.status = 'failed'
-        document.error_message = 'Processing timeout - document was stuck in processing state'
-        document.save(update_fields=['status', 'error_message'])
-        
-        ProcessingLog.objects.create(
-            document=document,
-            step='processing',
-            level='error',
-            message='Document processing timed out and was marked as failed'
-        )
-        
-        logger.warning(f"Document {document.id} was stuck in processing and marked as failed")
+    for chunk in chunked(stuck_documents.iterator(chunk_size=chunk_size), chunk_size):
+        to_fail, to_resume = [], []
+        for document in chunk:
+            report['checked'] += 1
+            checkpoints = {checkpoint.stage: checkpoint for checkpoint in document.stage_checkpoints.all()}
+            next_stage = next(
+                (stage for stage in PIPELINE_STAGES
+                 if stage not in checkpoints or checkpoints[stage].status != 'completed'),
+                None
+            )
+            
+            if next_stage is None:
+                # Every stage finished but the final status update was lost
+                report['completed'] += 1
+                if not dry_run:
+                    _complete_document(document)
+                continue
+            
+            attempts = checkpoints[next_stage].attempts if next_stage in checkpoints else 0
+            if attempts >= max_attempts:
+                to_fail.append((document, next_stage, attempts))
+            else:
+                to_resume.append((document, next_stage))
+        
+        report['failed'] += len(to_fail)
+        report['resumed'] += len(to_resume)
+        if dry_run:
+            continue
+        
+        logs = []
+        if to_fail:
+            error_message = 'Processing timeout - document was stuck in processing state'
+            Document.objects.filter(pk__in=[document.pk for document, _, _ in to_fail]).update(
+                status='failed', error_message=error_message
+            )
+            for document, stage, attempts in to_fail:
+                document.status = 'failed'
+                document.error_message = error_message
+                # The bulk update bypasses the post_save handlers
+                publish_event(document.user_id, document_status_event(document))
+                DocumentStatsService.invalidate(document.user_id)
+                logs.append(ProcessingLog(
+                    document=document,
+                    step=stage,
+                    level='error',
+                    message=f'Document processing timed out after {attempts} attempts and was marked as failed'
+                ))
+            logger.warning(f"{len(to_fail)} documents were stuck in processing and marked as failed")
+        
+        if to_resume:
+            # Touch the checkpoints so the documents are not resumed again before the stage runs
+            DocumentStageCheckpoint.objects.bulk_create(
+                [DocumentStageCheckpoint(document=document, stage=stage, status='pending') for document, stage in to_resume],
+                update_conflicts=True,
+                unique_fields=['document', 'stage'],
+                update_fields=['status', 'updated_at']
+            )
+            for document, stage in to_resume:
+                publish_event(document.user_id, stage_event(
+                    DocumentStageCheckpoint(document=document, stage=stage, status='pending')
+                ))
+                build_document_pipeline(document.id, priority_for_user(document.user)).apply_async()
+                logs.append(ProcessingLog(
+                    document=document,
+                    step=stage,
+                    level='warning',
+                    message=f'Document processing was stuck; resuming at {stage.replace("_", " ")}'
+                ))
+            logger.warning(f"{len(to_resume)} documents were stuck in processing and resumed")
+        
+        for log in ProcessingLog.objects.bulk_create(logs):
+            publish_event(log.document.user_id, processing_log_event(log))
     
-    logger.info(f"Cleanup completed. {stuck_documents.count()} documents were marked as failed.")
+    report = finish_report(report, started, report['checked'])
+    logger.info(
+        f"Cleanup {'dry run ' if dry_run else ''}completed. {report['resumed']} documents were resumed, "
+        f"{report['failed']} were marked as failed ({report['rows_per_second']} documents/s)."
+    )
+    return report
 
 
 @shared_task
-def cleanup_old_files():
+def cleanup_old_files(dry_run=False):
     """Periodic task to cleanup old files and optimize storage"""
     
-    # Find audio summaries older than 90 days for free users
-    cutoff_date = timezone.now() - timedelta(days=90)
-    old_audio_summaries = AudioSummary.objects.filter(
-        generated_at__lt=cutoff_date,
-        document__user__subscription_tier='free'
-    )
-    
-    deleted_count = 0
-    for audio_summary in old_audio_summaries:
-        try:
-            if audio_summary.audio_file and os.path.exists(audio_summary.audio_file.path):
-                os.remove(audio_summary.audio_file.path)
-                deleted_count += 1
-            audio_summary.delete()
-        except Exception as e:
-            logger.error(f"Failed to cleanup audio summary {audio_summary.id}: {str(e)}")
-    
-    logger.info(f"Cleanup completed. {deleted_count} old audio files were deleted.")
+    # Audio summaries older than 90 days for free users
+    return cleanup_old_audio(days=90, dry_run=dry_run)
+
+
+@shared_task
+def flush_buffered_counters():
+    """Periodic task writing buffered view, audio play and share access counts"""
+    updated = flush_counters()
+    if updated:
+        logger.info(f"Flushed buffered counters for {updated} rows.")
+    return updated
 
 
 @shared_task
 def generate_usage_analytics():
-    """Generate usage analytics and update user profiles"""
+    """
+    Recompute profile analytics for users with activity since the last run
     
+    Counts come from one grouped aggregate per metric and chunk of users,
+    and profiles are written with bulk_update.
+    """
     from django.contrib.auth import get_user_model
-    from django.db.models import Count, Sum, Avg
+    from django.db.models import Count, Sum
+    from ai_services.models import AggregationWatermark
+    from users.models import UserProfile
     
     User = get_user_model()
+    chunk_size = getattr(settings, 'USAGE_ANALYTICS_CHUNK_SIZE', 500)
+    started_at = timezone.now()
+    watermark, _ = AggregationWatermark.objects.get_or_create(name='usage_analytics')
+    since = watermark.last_timestamp
     
-    for user in User.objects.filter(is_active=True):
-        try:
-            # Calculate analytics
-            user_documents = Document.objects.filter(user=user)
-            
-            analytics = {
-                'total_documents': user_documents.count(),
-                'completed_documents': user_documents.filter(status='completed').count(),
-                'total_questions': Question.objects.filter(user=user).count(),
-                'total_audio_time': AudioSummary.objects.filter(
-                    document__user=user,
-                    status='completed'
-                ).aggregate(Sum('audio_duration'))['audio_duration__sum'] or 0,
-                'average_processing_time': user_documents.filter(
-                    status='completed'
-                ).aggregate(Avg('processing_duration'))['processing_duration__avg'] or 0
-            }
-            
-            # Update user profile if it exists
-            if hasattr(user, 'profile'):
-                profile = user.profile
-                profile.total_documents_processed = analytics['completed_documents']
-                profile.total_questions_asked = analytics['total_questions']
-                profile.total_audio_time_listened = analytics['total_audio_time']
-                profile.save()
-            
-        except Exception as e:
-            logger.error(f"Failed to generate analytics for user {user.id}: {str(e)}")
+    # Users whose documents, questions or audio changed since the last run (everyone on the first run).
+    # Deletes touch the owner's profile; profiles this task wrote are stamped with since itself.
+    if since is None:
+        user_ids = User.objects.filter(is_active=True).values_list('id', flat=True)
+    else:
+        user_ids = Document.objects.filter(updated_at__gte=since).order_by().values_list('user_id', flat=True).union(
+            Question.objects.filter(asked_at__gte=since).order_by().values_list('user_id', flat=True),
+            AudioSummary.objects.filter(generated_at__gte=since).order_by().values_list('document__user_id', flat=True),
+            UserProfile.objects.filter(updated_at__gt=since).order_by().values_list('user_id', flat=True)
+        )
+    user_ids = sorted(set(user_ids))
+    
+    updated_count = 0
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        
+        completed_documents = dict(
+            Document.objects.filter(user_id__in=chunk, status='completed').order_by()
+            .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+        )
+        total_questions = dict(
+            Question.objects.filter(user_id__in=chunk).order_by()
+            .values('user_id').annotate(total=Count('id')).values_list('user_id', 'total')
+        )
+        total_audio_time = dict(
+            AudioSummary.objects.filter(document__user_id__in=chunk, status='completed').order_by()
+            .values('document__user_id').annotate(total=Sum('audio_duration'))
+            .values_list('document__user_id', 'total')
+        )
+        
+        changed = []
+        for profile in UserProfile.objects.filter(user_id__in=chunk, user__is_active=True):
+            analytics = (
+                completed_documents.get(profile.user_id, 0),
+                total_questions.get(profile.user_id, 0),
+                total_audio_time.get(profile.user_id) or 0,
+            )
+            if analytics != (profile.total_documents_processed, profile.total_questions_asked, profile.total_audio_time_listened):
+                (profile.total_documents_processed, profile.total_questions_asked,
+                 profile.total_audio_time_listened) = analytics
+                profile.updated_at = started_at
+                changed.append(profile)
+        
+        UserProfile.objects.bulk_update(
+            changed,
+            ['total_documents_processed', 'total_questions_asked', 'total_audio_time_listened', 'updated_at'],
+            batch_size=chunk_size
+        )
+        updated_count += len(changed)
     
-    logger.info("Usage analytics generation completed.")
+    watermark.last_timestamp = started_at
+    watermark.save(update_fields=['last_timestamp', 'updated_at'])
+    
+    logger.info(f"Usage analytics generation completed. {len(user_ids)} active users checked, {updated_count} profiles updated.")
 
 
 @shared_task(bind=True)
@@ -559,7 +764,11 @@ def regenerate_audio_summary(self, document_id, voice_name, speech_rate='medium'
             raise ValueError("No summary text available for audio regeneration")
         
         # Call the audio generation task with custom settings
-        generate_audio_summary.delay(document_id, voice_name, speech_rate, speech_pitch)
+        generate_audio_summary.apply_async(
+            (document_id, voice_name, speech_rate, speech_pitch),
+            {'force': True},
+            priority=priority_for_user(document.user)
+        )
         
         ProcessingLog.objects.create(
             document=document,
@@ -607,6 +816,10 @@ def extract_text_sync(document_id):
     try:
         document = Document.objects.get(id=document_id)
         
+        if _skip_completed_stage(document, 'text_extraction'):
+            return
+        
+        DocumentStageCheckpoint.mark_started(document_id, 'text_extraction')
         ProcessingLog.objects.create(
             document=document,
             step='text_extraction',
@@ -614,11 +827,13 @@ def extract_text_sync(document_id):
             message='Starting text extraction'
         )
         
-        # Initialize Document Intelligence service
-        doc_intel_service = DocumentIntelligenceService()
+        # Shared Document Intelligence service
+        doc_intel_service = get_document_intelligence_service()
         
         # Extract text from document
-        extraction_result = doc_intel_service.extract_text(document.file.path)
+        extraction_result = doc_intel_service.extract_text(
+            document.file.path, content_hash=document.content_hash or None
+        )
         
         # Update document with extracted content
         document.extracted_text = extraction_result['text']
@@ -628,6 +843,7 @@ def extract_text_sync(document_id):
         document.save(update_fields=[
             'extracted_text', 'text_extraction_confidence', 'page_count', 'word_count'
         ])
+        _build_retrieval_index(document)
         
         ProcessingLog.objects.create(
             document=document,
@@ -635,9 +851,11 @@ def extract_text_sync(document_id):
             level='info',
             message=f'Text extraction completed. {document.word_count} words extracted.'
         )
+        DocumentStageCheckpoint.mark_completed(document_id, 'text_extraction', word_count=document.word_count)
         
     except Exception as exc:
         logger.error(f"Text extraction failed for document {document_id}: {str(exc)}")
+        DocumentStageCheckpoint.mark_failed(document_id, 'text_extraction', str(exc))
         raise exc
 
 
@@ -646,9 +864,13 @@ def generate_summary_sync(document_id):
     try:
         document = Document.objects.get(id=document_id)
         
+        if _skip_completed_stage(document, 'summarization'):
+            return
+        
         if not document.extracted_text:
             raise ValueError("No extracted text available for summarization")
         
+        DocumentStageCheckpoint.mark_started(document_id, 'summarization')
         ProcessingLog.objects.create(
             document=document,
             step='summarization',
@@ -656,8 +878,8 @@ def generate_summary_sync(document_id):
             message='Starting AI summarization'
         )
         
-        # Initialize OpenAI service
-        openai_service = OpenAIService()
+        # Shared OpenAI service
+        openai_service = get_openai_service()
         
         # Generate summary
         summary_result = openai_service.generate_summary(
@@ -665,7 +887,8 @@ def generate_summary_sync(document_id):
             style='teacher',
             length=document.summary_length or 'medium',
             subject_area=document.subject_area or '',
-            difficulty_level=document.difficulty_level or 'intermediate'
+            difficulty_level=document.difficulty_level or 'intermediate',
+            progress_callback=_summary_progress_logger(document)
         )
         
         # Update document with summary
@@ -678,17 +901,26 @@ def generate_summary_sync(document_id):
             level='info',
             message='AI summary generated successfully.'
         )
+        DocumentStageCheckpoint.mark_completed(
+            document_id, 'summarization', tokens_used=summary_result.get('total_tokens')
+        )
         
     except Exception as exc:
         logger.error(f"AI summarization failed for document {document_id}: {str(exc)}")
+        DocumentStageCheckpoint.mark_failed(document_id, 'summarization', str(exc))
         raise exc
 
 
-def generate_audio_sync(document_id, voice_name=None):
+def generate_audio_sync(document_id, voice_name=None, speech_rate='medium', speech_pitch='medium'):
     """Synchronous audio generation"""
     try:
         document = Document.objects.get(id=document_id)
         
+        if _skip_completed_stage(document, 'audio_generation'):
+            if document.status != 'completed':
+                _complete_document(document, 'Document processing completed successfully')
+            return
+        
         if not document.summary_text:
             raise ValueError("No summary text available for audio generation")
         
@@ -696,6 +928,7 @@ def generate_audio_sync(document_id, voice_name=None):
         if not voice_name:
             voice_name = 'en-US-JennyNeural'
         
+        DocumentStageCheckpoint.mark_started(document_id, 'audio_generation')
         ProcessingLog.objects.create(
             document=document,
             step='audio_generation',
@@ -703,59 +936,33 @@ def generate_audio_sync(document_id, voice_name=None):
             message=f'Starting audio generation with voice {voice_name}'
         )
         
-        # Initialize Speech service FIRST
-        speech_service = SpeechService()
-        
-        # Generate audio BEFORE creating AudioSummary record
-        audio_result = speech_service.text_to_speech(
-            text=document.summary_text,
-            voice_name=voice_name,
-            speech_rate='medium',
-            speech_pitch='medium'
+        # Reuse identical audio when it already exists, synthesize it otherwise
+        audio_summary, synthesized = create_audio_summary(
+            document, voice_name, speech_rate=speech_rate, speech_pitch=speech_pitch
         )
         
-        # Save audio file
-        audio_filename = f"summary_{document_id}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.mp3"
-        audio_path = f"audio/{document.user.id}/{timezone.now().year}/{timezone.now().month}/"
-        
-        # Ensure directory exists
-        full_audio_path = os.path.join(settings.MEDIA_ROOT, audio_path)
-        os.makedirs(full_audio_path, exist_ok=True)
-        
-        # Save audio file
-        full_audio_filename = os.path.join(full_audio_path, audio_filename)
-        with open(full_audio_filename, 'wb') as audio_file:
-            audio_file.write(audio_result['audio_data'])
-        
-        # NOW create AudioSummary record with all the data
-        audio_summary = AudioSummary.objects.create(
-            document=document,
-            audio_file=os.path.join(audio_path, audio_filename),
-            voice_name=voice_name,
-            speech_rate='medium',
-            speech_pitch='medium',
-            audio_duration=audio_result['duration'],
-            audio_size=len(audio_result['audio_data']),
-            status='completed'
-        )
-        
-        # Mark document as completed
-        document.status = 'completed'
-        document.processing_completed_at = timezone.now()
-        document.save(update_fields=['status', 'processing_completed_at'])
-        
         ProcessingLog.objects.create(
             document=document,
-            step='completion',
+            step='audio_generation',
             level='info',
-            message='Document processing completed successfully'
+            message='Audio generated' if synthesized else 'Reused existing audio with identical settings',
+            details={
+                'audio_summary_id': audio_summary.id,
+                'blob_id': audio_summary.blob_id,
+                'synthesized': synthesized
+            }
         )
+        DocumentStageCheckpoint.mark_completed(document_id, 'audio_generation', audio_summary_id=audio_summary.id)
+        
+        # Mark document as completed
+        _complete_document(document, 'Document processing completed successfully')
         
     except Exception as exc:
         logger.error(f"Audio generation failed for document {document_id}: {str(exc)}")
         
         # Mark document as failed
         try:
+            DocumentStageCheckpoint.mark_failed(document_id, 'audio_generation', str(exc))
             document = Document.objects.get(id=document_id)
             document.status = 'failed'
             document.error_message = f"Audio generation failed: {str(exc)}"
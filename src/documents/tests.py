@@ -1,3 +1,770 @@
-from django.test import TestCase
+import hashlib
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.core.files.uploadedfile import InMemoryUploadedFile, SimpleUploadedFile, TemporaryUploadedFile
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.celery import app
+from core.test_utils import FakeClock, IndexUsageTestMixin, TemporaryMediaRootMixin
+from .audio_store import audio_content_hash, create_audio_summary, release_blob, release_blobs
+from .cleanup import cleanup_old_audio
+from .counters import LocalCounterBackend, RedisCounterBackend, flush_counters, increment
+from .indexing import retrieve_context
+from .models import (
+    AudioBlob, AudioSummary, Document, DocumentContent, DocumentStageCheckpoint, ProcessingLog, Question,
+    compress_text, decompress_text,
+)
+from .queues import priority_for_user
+from .stats import DocumentStatsService
+from .tasks import (
+    build_document_pipeline, cleanup_failed_documents, flush_buffered_counters, generate_usage_analytics,
+)
+from .uploads import get_upload_error, install_upload_handler
+
+try:
+    import fakeredis
+except ImportError:
+    # fakeredis is optional; the Redis counter tests are skipped without it
+    fakeredis = None
+
+
+class DocumentListQueryCountTests(TestCase):
+    """List endpoints must not query audio summaries per document"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='reader', email='reader@example.com', password='password'
+        )
+
+    def create_documents(self, count, with_audio=False):
+        # bulk_create skips the post_save handlers that start processing
+        documents = Document.objects.bulk_create([
+            Document(
+                user=self.user, title=f'Document {index}', file=f'documents/doc{index}.txt',
+                file_type='txt', file_size=100, original_filename=f'doc{index}.txt', status='completed'
+            )
+            for index in range(count)
+        ])
+        if with_audio:
+            AudioSummary.objects.bulk_create([
+                AudioSummary(document=document, status='completed', audio_duration=30)
+                for document in documents
+            ])
+        return documents
+
+    def list_documents(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get(reverse('document-list-create'))
+
+    def test_with_audio_info_annotations(self):
+        with_audio, without_audio = self.create_documents(2)
+        audio = AudioSummary.objects.create(document=with_audio, status='completed', audio_duration=42)
+        AudioSummary.objects.create(document=without_audio, status='failed')
+
+        documents = {document.pk: document for document in Document.objects.with_audio_info()}
+
+        with self.assertNumQueries(0):
+            self.assertTrue(documents[with_audio.pk].has_audio)
+            self.assertFalse(documents[without_audio.pk].has_audio)
+        self.assertEqual(documents[with_audio.pk].latest_audio_id, audio.pk)
+        self.assertEqual(documents[with_audio.pk].latest_audio_duration, 42)
+        self.assertIsNone(documents[without_audio.pk].latest_audio_id)
+
+    def test_list_query_count_is_constant(self):
+        self.create_documents(2, with_audio=True)
+        with self.assertNumQueries(1):
+            response = self.list_documents()
+        self.assertEqual(response.status_code, 200)
+
+        self.create_documents(20, with_audio=True)
+        with self.assertNumQueries(1):
+            response = self.list_documents()
+        self.assertEqual(response.status_code, 200)
+
+        documents = response.data
+        self.assertTrue(all(document['has_audio'] for document in documents))
+        self.assertTrue(all(document['latest_audio']['audio_duration'] == 30 for document in documents))
+
+
+class DocumentIndexUsageTests(IndexUsageTestMixin, TestCase):
+    """Hot document queries are served by the Meta.indexes"""
+
+    def test_dashboard_list_uses_user_created_index(self):
+        self.assertUsesIndex(Document.objects.filter(user_id=1).order_by('-created_at'), 'doc_user_created_idx')
+
+    def test_status_filtered_list_uses_user_status_index(self):
+        self.assertUsesIndex(
+            Document.objects.filter(user_id=1, status='completed').order_by('-created_at'),
+            'doc_user_status_created_idx'
+        )
+
+    def test_stuck_document_sweep_uses_partial_index(self):
+        queryset = Document.objects.filter(
+            status='processing', processing_started_at__lt=timezone.now() - timedelta(hours=1)
+        )
+        self.assertUsesIndex(queryset, 'doc_processing_started_idx')
+
+    def test_processing_log_timeline_uses_document_time_index(self):
+        self.assertUsesIndex(ProcessingLog.objects.filter(document_id=1), 'proclog_document_time_idx')
+
+
+class DocumentUploadHandlerTests(SimpleTestCase):
+    """Uploads are streamed to disk with their hash and sniffed type, and oversize files are stopped"""
+
+    def post_file(self, name, content):
+        request = RequestFactory().post('/upload/', {'file': SimpleUploadedFile(name, content)})
+        install_upload_handler(request)
+        return request, request.FILES.get('file')
+
+    def test_upload_is_hashed_and_sniffed_while_streaming(self):
+        content = b'%PDF-1.7\n' + b'x' * 200000
+        request, uploaded = self.post_file('notes.pdf', content)
+
+        self.assertIsInstance(uploaded, TemporaryUploadedFile)
+        self.assertEqual(uploaded.size, len(content))
+        self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(uploaded.mime_type, 'application/pdf')
+        self.assertIsNone(get_upload_error(request))
+
+    def test_office_documents_are_told_apart_by_extension(self):
+        _, uploaded = self.post_file('slides.pptx', b'PK\x03\x04' + b'\x00' * 100)
+        self.assertEqual(uploaded.mime_type, 'application/vnd.openxmlformats-officedocument.presentationml.presentation')
+
+    def test_oversize_upload_is_stopped(self):
+        with mock.patch.object(Document, 'MAX_FILE_SIZE', 1024):
+            request, uploaded = self.post_file('notes.pdf', b'%PDF-1.7\n' + b'x' * 4096)
+
+        self.assertIsNone(uploaded)
+        self.assertIn('exceeds maximum limit', get_upload_error(request))
+
+    def test_other_requests_keep_the_default_handlers(self):
+        request = RequestFactory().post('/avatar/', {'file': SimpleUploadedFile('avatar.png', b'\x89PNG' + b'\x00' * 100)})
+        self.assertIsInstance(request.FILES['file'], InMemoryUploadedFile)
+        self.assertFalse(hasattr(request.FILES['file'], 'sha256'))
+
+
+class TaskRoutingTests(SimpleTestCase):
+    """Tasks go to their workload's queue, with priorities taken from the subscription tier"""
+
+    QUEUES = {
+        'documents.tasks.process_question': 'qa',
+        'documents.tasks.process_document_pipeline': 'extraction',
+        'documents.tasks.extract_text_from_document': 'extraction',
+        'documents.tasks.generate_ai_summary': 'summarization',
+        'documents.tasks.generate_audio_summary': 'audio',
+        'documents.tasks.regenerate_audio_summary': 'audio',
+        'documents.tasks.generate_answer_audio': 'audio',
+        'documents.tasks.cleanup_failed_documents': 'maintenance',
+        'documents.tasks.cleanup_old_files': 'maintenance',
+        'documents.tasks.generate_usage_analytics': 'maintenance',
+        'documents.tasks.flush_buffered_counters': 'maintenance',
+        'ai_services.tasks.rollup_service_logs': 'maintenance',
+        'ai_services.tasks.archive_expired_logs': 'maintenance',
+        'ai_services.tasks.evict_extraction_cache': 'maintenance',
+    }
+
+    def test_tier_priorities(self):
+        for tier, priority in [('enterprise', 0), ('edu', 3), ('pro', 3), ('free', 6), ('unknown', 6)]:
+            with self.subTest(tier):
+                self.assertEqual(priority_for_user(SimpleNamespace(subscription_tier=tier)), priority)
+
+        # Anonymous callers without a tier are served as free users
+        self.assertEqual(priority_for_user(None), 6)
+
+    def test_tasks_are_routed_to_their_queues(self):
+        for name, queue in self.QUEUES.items():
+            with self.subTest(name):
+                self.assertEqual(app.amqp.router.route({}, name)['queue'].name, queue)
+
+    def test_every_task_is_routed_to_a_worker_queue(self):
+        # Imports every app's tasks module, not only the ones this test run loaded
+        app.loader.import_default_modules()
+        tasks = {name for name in app.tasks if name.startswith(('documents.', 'ai_services.'))}
+        self.assertEqual(tasks, set(self.QUEUES))
+        self.assertLessEqual(set(self.QUEUES.values()), set(settings.CELERY_QUEUE_CONCURRENCY))
+
+    def test_pipeline_stages_share_the_priority(self):
+        pipeline = build_document_pipeline(1, priority_for_user(SimpleNamespace(subscription_tier='enterprise')))
+        self.assertEqual([stage.options['priority'] for stage in pipeline.tasks], [0, 0, 0])
+
+
+class DocumentUploadViewTests(TestCase):
+    """The upload views stream files through DocumentUploadHandler and report oversize files"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='uploader', email='uploader@example.com', password='password')
+
+    def setUp(self):
+        patcher = mock.patch.object(Document, 'MAX_FILE_SIZE', 1024)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.oversize = SimpleUploadedFile('notes.pdf', b'%PDF-1.7\n' + b'x' * 4096)
+
+    def test_api_rejects_oversize_upload(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('django.request', 'WARNING'):
+            response = client.post(
+                reverse('document-list-create'), {'title': 'Notes', 'file_type': 'pdf', 'file': self.oversize}, format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('exceeds maximum limit', response.data['error'])
+        self.assertFalse(Document.objects.exists())
+
+    def test_form_upload_is_csrf_checked_after_the_handler_is_installed(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        token = 'a' * 32
+        client.cookies['csrftoken'] = token
+
+        # Parsed by the default handlers, the file would reach the view and fail its type check instead
+        upload = SimpleUploadedFile('notes.exe', b'x' * 4096)
+
+        with self.assertLogs('django.security.csrf', 'WARNING'):
+            response = client.post(reverse('upload'), {'file': upload}, headers={'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 403)
+
+        upload.seek(0)
+        with self.assertLogs('django.request', 'WARNING'):
+            response = client.post(
+                reverse('upload'), {'csrfmiddlewaretoken': token, 'file': upload},
+                headers={'X-Requested-With': 'XMLHttpRequest'}
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('exceeds maximum limit', response.json()['error'])
+
+
+class RetrieveContextTests(TestCase):
+    """Question context is built from the document's retrieval index"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='asker', email='asker@example.com', password='password')
+        # bulk_create skips the post_save handlers that start processing
+        cls.document = Document.objects.bulk_create([Document(
+            user=user, title='Biology', file='documents/biology.txt', file_type='txt',
+            file_size=100, original_filename='biology.txt', status='completed'
+        )])[0]
+        cls.document.extracted_text = ' '.join(
+            f'Sentence {index} is about filler topic number {index}.' for index in range(40)
+        ) + ' The mitochondria produces ATP for the cell.'
+        cls.document.save_content()
+
+    def test_matching_passage_is_returned(self):
+        with self.settings(QA_PASSAGE_WORDS=20, QA_PASSAGE_OVERLAP_WORDS=0):
+            context = retrieve_context(self.document, 'What produces ATP?', top_k=1)
+        self.assertIn('mitochondria produces ATP', context)
+        self.assertNotIn('Sentence 0 ', context)
+
+    def test_opening_passages_when_nothing_matches(self):
+        with self.settings(QA_PASSAGE_WORDS=20, QA_PASSAGE_OVERLAP_WORDS=0):
+            context = retrieve_context(self.document, 'quantum entanglement', top_k=2)
+        self.assertTrue(context.startswith('Sentence 0 is about'))
+        self.assertEqual(context.count('\n\n...\n\n'), 1)
+        self.assertNotIn('ATP', context)
+
+
+class StuckDocumentResumeTests(TestCase):
+    """Long-running documents are resumed from their checkpoints rather than failed on save"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='slow', email='slow@example.com', password='password')
+
+    def create_processing_document(self, started_minutes_ago):
+        # bulk_create skips the post_save handlers that start processing
+        return Document.objects.bulk_create([Document(
+            user=self.user, title='Long lecture', file='documents/lecture.pdf', file_type='pdf',
+            file_size=100, original_filename='lecture.pdf', status='processing',
+            processing_started_at=timezone.now() - timedelta(minutes=started_minutes_ago)
+        )])[0]
+
+    def test_saving_a_long_running_document_keeps_it_processing(self):
+        document = self.create_processing_document(45)
+        DocumentStageCheckpoint.mark_started(document.id, 'text_extraction')
+
+        document.page_count = 300
+        document.save(update_fields=['page_count'])
+
+        document.refresh_from_db()
+        self.assertEqual(document.status, 'processing')
+        self.assertFalse(ProcessingLog.objects.filter(document=document, level='error').exists())
+
+    @mock.patch('documents.tasks.build_document_pipeline')
+    def test_stuck_document_resumes_at_next_stage(self, build_document_pipeline):
+        document = self.create_processing_document(120)
+        DocumentStageCheckpoint.objects.create(document=document, stage='text_extraction', status='completed')
+        DocumentStageCheckpoint.objects.create(document=document, stage='summarization', status='failed', attempts=1)
+        DocumentStageCheckpoint.objects.filter(document=document).update(updated_at=timezone.now() - timedelta(minutes=90))
+
+        with self.assertLogs('documents.tasks', 'WARNING'):
+            report = cleanup_failed_documents()
+
+        self.assertEqual((report['resumed'], report['failed']), (1, 0))
+        build_document_pipeline.assert_called_once()
+        document.refresh_from_db()
+        self.assertEqual(document.status, 'processing')
+        self.assertEqual(
+            DocumentStageCheckpoint.objects.get(document=document, stage='summarization').status, 'pending'
+        )
+
+
+class BufferedCounterTests(TestCase):
+    """Buffered counters are written in bulk and reach the owner's statistics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='listener', email='listener@example.com', password='password')
+        # bulk_create skips the post_save handlers that start processing
+        cls.document = Document.objects.bulk_create([Document(
+            user=cls.user, title='Podcast notes', file='documents/podcast.txt', file_type='txt',
+            file_size=100, original_filename='podcast.txt', status='completed'
+        )])[0]
+
+    def setUp(self):
+        self.backend = LocalCounterBackend(max_age=3600)
+        for target, value in [
+            ('documents.counters._backend', self.backend),
+            # The background flusher thread is exercised directly in test_local_backend_flushes_stale_counts_in_background
+            ('documents.counters.LocalCounterBackend._ensure_flusher', lambda backend: None),
+        ]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_flush_invalidates_cached_stats(self):
+        stats = DocumentStatsService()
+        self.assertEqual(stats.get_stats(self.user)['total_audio_plays'], 0)
+
+        increment(self.document, 'audio_play_count', 2)
+        self.assertEqual(flush_counters(), 1)
+
+        self.assertEqual(stats.get_stats(self.user)['total_audio_plays'], 2)
+
+    def test_flush_task_drains_local_backend(self):
+        increment(self.document, 'view_count')
+        self.assertEqual(flush_buffered_counters(), 1)
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 1)
+        self.assertEqual(self.backend.drain(), {})
+
+    def test_local_backend_flushes_stale_counts_in_background(self):
+        clock = FakeClock()
+
+        class Stop(Exception):
+            pass
+
+        def sleep(seconds):
+            if clock.now > 1000.0:
+                raise Stop
+            clock.now += seconds
+
+        clock.sleep = sleep
+        with mock.patch('documents.counters.time', clock):
+            increment(self.document, 'view_count')
+            with mock.patch('documents.counters.close_old_connections'), self.assertRaises(Stop):
+                self.backend._run_flusher()
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 1)
+
+
+@skipUnless(fakeredis, 'fakeredis is not installed')
+class RedisCounterBackendTests(TestCase):
+    """Redis counters survive a flush that died between draining and deleting"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='viewer', email='viewer@example.com', password='password')
+        # bulk_create skips the post_save handlers that start processing
+        cls.document = Document.objects.bulk_create([Document(
+            user=user, title='Lecture notes', file='documents/lecture.txt', file_type='txt',
+            file_size=100, original_filename='lecture.txt', status='completed'
+        )])[0]
+
+    def setUp(self):
+        self.client = fakeredis.FakeRedis()
+        with mock.patch('redis.Redis.from_url', return_value=self.client):
+            self.backend = RedisCounterBackend()
+        patcher = mock.patch('documents.counters._backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.counter = f'documents.document:{self.document.pk}:view_count'
+
+    def test_leftover_flushing_hash_is_drained(self):
+        started = int(timezone.now().timestamp()) - RedisCounterBackend.STALE_FLUSH_SECONDS - 1
+        self.client.hset(f'counters:flushing:{started}:dead', self.counter, 3)
+        increment(self.document, 'view_count')
+
+        self.assertEqual(flush_counters(), 1)
+
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.view_count, 4)
+        self.assertEqual(list(self.client.scan_iter(match='counters:*')), [])
+
+    def test_hash_being_flushed_by_another_process_is_left_alone(self):
+        in_progress = f'counters:flushing:{int(timezone.now().timestamp())}:busy'
+        self.client.hset(in_progress, self.counter, 3)
+
+        self.assertEqual(flush_counters(), 0)
+        self.assertTrue(self.client.exists(in_progress))
+
+
+class UsageAnalyticsTests(TestCase):
+    """Profile analytics are recomputed for users whose documents changed, including by deletion"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='student', email='student@example.com', password='password')
+        # bulk_create skips the post_save handlers that start processing
+        cls.documents = Document.objects.bulk_create([
+            Document(
+                user=cls.user, title=f'Chapter {index}', file=f'documents/chapter{index}.txt', file_type='txt',
+                file_size=100, original_filename=f'chapter{index}.txt', status='completed'
+            )
+            for index in range(2)
+        ])
+        Question.objects.bulk_create([
+            Question(document=document, user=cls.user, question_text='What is this about?')
+            for document in cls.documents
+        ])
+
+    def analytics(self):
+        profile = self.user.profile
+        profile.refresh_from_db()
+        return profile.total_documents_processed, profile.total_questions_asked
+
+    def test_deletes_are_counted_on_the_next_run(self):
+        generate_usage_analytics()
+        self.assertEqual(self.analytics(), (2, 2))
+
+        Question.objects.filter(document=self.documents[0]).delete()
+        generate_usage_analytics()
+        self.assertEqual(self.analytics(), (2, 1))
+
+        self.documents[1].delete()
+        generate_usage_analytics()
+        self.assertEqual(self.analytics(), (1, 0))
+
+    def test_unchanged_users_are_not_recounted(self):
+        generate_usage_analytics()
+
+        # Profiles written by the first run must not select their users again
+        with mock.patch('users.models.UserProfile.objects.bulk_update') as bulk_update:
+            generate_usage_analytics()
+        bulk_update.assert_not_called()
+
+
+class AudioCleanupTests(TemporaryMediaRootMixin, TestCase):
+    """Old free-tier audio is swept in bulk, releasing shared blobs and updating analytics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.free_user = User.objects.create_user(username='free', email='free@example.com', password='password')
+        pro_user = User.objects.create_user(
+            username='pro', email='pro@example.com', password='password', subscription_tier='pro'
+        )
+        # bulk_create skips the post_save handlers that start processing
+        cls.free_document, cls.pro_document = Document.objects.bulk_create([
+            Document(
+                user=user, title='Lecture', file=f'documents/{user.username}.txt', file_type='txt',
+                file_size=100, original_filename='lecture.txt', status='completed'
+            )
+            for user in (cls.free_user, pro_user)
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.shared_blob = self.create_blob('shared')
+        self.single_blob = self.create_blob('single')
+        self.own_file = default_storage.save('audio/own.mp3', ContentFile(b'12345'))
+
+        self.create_summary(self.free_document, blob=self.shared_blob, audio_duration=10)
+        self.create_summary(self.free_document, blob=self.single_blob, audio_duration=20)
+        self.create_summary(self.free_document, blob=self.single_blob, audio_duration=20)
+        self.create_summary(self.free_document, audio_file=self.own_file, audio_size=5, audio_duration=120)
+        self.create_summary(self.free_document, audio_duration=30, days_ago=1)
+        self.create_summary(self.pro_document, blob=self.shared_blob, audio_duration=10)
+
+    def create_blob(self, name):
+        blob = AudioBlob(content_hash=name * 8, audio_duration=10, audio_size=3)
+        blob.audio_file.save(f'{name}.mp3', ContentFile(b'mp3'), save=False)
+        blob.save()
+        return blob
+
+    def create_summary(self, document, blob=None, days_ago=120, **kwargs):
+        if blob is not None:
+            kwargs['audio_file'] = blob.audio_file.name
+        summary = AudioSummary.objects.create(document=document, blob=blob, status='completed', **kwargs)
+        AudioSummary.objects.filter(pk=summary.pk).update(generated_at=timezone.now() - timedelta(days=days_ago))
+        return summary
+
+    def assertReport(self, report, **expected):
+        self.assertEqual({key: report[key] for key in expected}, expected)
+
+    def test_dry_run_reports_without_deleting(self):
+        report = cleanup_old_audio(dry_run=True, chunk_size=1)
+
+        self.assertReport(report, audio_summaries=4, blobs_deleted=1, files_deleted=2, bytes=5)
+        self.assertEqual(AudioSummary.objects.count(), 6)
+        self.assertEqual(AudioBlob.objects.count(), 2)
+        self.assertTrue(default_storage.exists(self.own_file))
+
+    def test_sweep_releases_blobs_and_removes_files(self):
+        with self.assertLogs('documents.cleanup', 'INFO'):
+            report = cleanup_old_audio(chunk_size=1)
+
+        self.assertReport(report, audio_summaries=4, blobs_deleted=1, files_deleted=2, bytes=5)
+        self.assertEqual(AudioSummary.objects.filter(document=self.free_document).count(), 1)
+        self.assertFalse(AudioBlob.objects.filter(pk=self.single_blob.pk).exists())
+        self.assertFalse(default_storage.exists(self.single_blob.audio_file.name))
+        self.assertFalse(default_storage.exists(self.own_file))
+        self.shared_blob.refresh_from_db()
+        self.assertEqual(self.shared_blob.reference_count, 1)
+        self.assertTrue(default_storage.exists(self.shared_blob.audio_file.name))
+
+    def test_sweep_is_counted_by_the_next_analytics_run(self):
+        generate_usage_analytics()
+        with self.assertLogs('documents.cleanup', 'INFO'):
+            cleanup_old_audio()
+        generate_usage_analytics()
+
+        self.free_user.profile.refresh_from_db()
+        self.assertEqual(self.free_user.profile.total_audio_time_listened, 30)
+
+
+class AudioBlobStoreTests(TemporaryMediaRootMixin, TestCase):
+    """Audio summaries share blobs by content hash and reference-count them"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(username='narrated', email='narrated@example.com', password='password')
+        # bulk_create skips the post_save handlers that start processing
+        cls.document = Document.objects.bulk_create([Document(
+            user=user, title='Narrated', file='documents/narrated.txt', file_type='txt',
+            file_size=100, original_filename='narrated.txt', status='completed'
+        )])[0]
+
+    def create_blob(self):
+        blob = AudioBlob(content_hash='a' * 64, audio_duration=10, audio_size=3)
+        blob.audio_file.save('blob.mp3', ContentFile(b'mp3'), save=False)
+        blob.save()
+        return blob
+
+    def create_summary(self, blob):
+        return AudioSummary.objects.create(
+            document=self.document, blob=blob, audio_file=blob.audio_file.name, status='completed'
+        )
+
+    def synthesize(self):
+        speech_service = mock.Mock()
+        speech_service.text_to_speech.return_value = {'audio_data': b'mp3 bytes', 'duration': 12, 'segments': []}
+        return mock.patch('ai_services.registry.get_speech_service', return_value=speech_service)
+
+    def test_identical_audio_is_synthesized_once_and_shared(self):
+        self.document.summary_text = 'A short summary.'
+        with self.synthesize() as get_speech_service:
+            first, first_created = create_audio_summary(self.document, 'en-US-JennyNeural')
+            second, second_created = create_audio_summary(self.document, 'en-US-JennyNeural')
+
+        self.assertEqual((first_created, second_created), (True, False))
+        get_speech_service.return_value.text_to_speech.assert_called_once()
+        self.assertEqual(first.blob_id, second.blob_id)
+        blob = AudioBlob.objects.get()
+        self.assertEqual(blob.content_hash, audio_content_hash('A short summary.', 'en-US-JennyNeural', 'medium', 'medium'))
+        self.assertEqual(blob.reference_count, 2)
+        self.assertEqual((second.audio_duration, second.audio_size), (12, len(b'mp3 bytes')))
+
+    def test_blob_released_before_it_is_locked_is_looked_up_again(self):
+        self.document.summary_text = 'A short summary.'
+        released = self.create_blob()
+        AudioBlob.objects.filter(pk=released.pk).delete()
+        current = AudioBlob.objects.create(content_hash='b' * 64, audio_file='audio_blobs/current.mp3')
+
+        with mock.patch('documents.audio_store.get_or_create_audio_blob', side_effect=[(released, False), (current, False)]):
+            summary, created = create_audio_summary(self.document, 'en-US-JennyNeural')
+
+        self.assertFalse(created)
+        self.assertEqual(summary.blob_id, current.pk)
+        current.refresh_from_db()
+        self.assertEqual(current.reference_count, 1)
+
+    def test_release_keeps_a_blob_another_summary_points_at(self):
+        blob = self.create_blob()
+        first, second = self.create_summary(blob), self.create_summary(blob)
+        blob.refresh_from_db()
+        self.assertEqual(blob.reference_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.reference_count, 1)
+        self.assertTrue(default_storage.exists(blob.audio_file.name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(AudioBlob.objects.filter(pk=blob.pk).exists())
+
+    def test_release_of_unknown_blob_is_ignored(self):
+        self.assertFalse(release_blob(0))
+
+    def test_bulk_release_counts_down_and_returns_orphaned_files(self):
+        shared, single = self.create_blob(), AudioBlob.objects.create(content_hash='c' * 64, audio_file='audio_blobs/single.mp3')
+        keep, drop = self.create_summary(shared), self.create_summary(shared)
+        gone = self.create_summary(single)
+        # Raw deletes skip the post_delete handlers, as the bulk sweep does
+        AudioSummary.objects.filter(pk__in=[drop.pk, gone.pk])._raw_delete(AudioSummary.objects.db)
+
+        self.assertEqual(release_blobs({shared.pk: 1, single.pk: 1}), ['audio_blobs/single.mp3'])
+
+        shared.refresh_from_db()
+        self.assertEqual(shared.reference_count, 1)
+        self.assertFalse(AudioBlob.objects.filter(pk=single.pk).exists())
+        self.assertTrue(AudioSummary.objects.filter(pk=keep.pk).exists())
+
+    def test_blob_file_is_deleted_when_the_release_commits(self):
+        blob = self.create_blob()
+        summary = self.create_summary(blob)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            summary.delete()
+
+        self.assertFalse(AudioBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.audio_file.name))
+
+    def test_blob_file_survives_a_rolled_back_cascade(self):
+        blob = self.create_blob()
+        self.create_summary(blob)
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.document.delete()
+                raise RuntimeError('rolled back')
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.reference_count, 1)
+        self.assertTrue(default_storage.exists(blob.audio_file.name))
+
+
+class DocumentContentCodecTests(SimpleTestCase):
+    """Document text survives the DocumentContent codecs unchanged"""
+
+    def test_round_trip(self):
+        text = 'Photosynthesis — CO₂ + H₂O → glucose. ' * 50
+        for compression in ('none', 'zlib'):
+            with self.subTest(compression=compression):
+                self.assertEqual(decompress_text(compress_text(text, compression), compression), text)
+                self.assertEqual(decompress_text(compress_text('', compression), compression), '')
+
+        self.assertEqual(compress_text(text, 'none'), text.encode('utf-8'))
+        self.assertLess(len(compress_text(text, 'zlib')), len(text.encode('utf-8')) // 10)
+
+
+class DocumentContentTests(TestCase):
+    """Document text lives in DocumentContent and is saved with the document"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='writer', email='writer@example.com', password='password')
+
+    def create_document(self):
+        # bulk_create skips the post_save handlers that start processing
+        return Document.objects.bulk_create([Document(
+            user=self.user, title='Essay', file='documents/essay.txt', file_type='txt',
+            file_size=100, original_filename='essay.txt', status='completed'
+        )])[0]
+
+    def test_document_without_content_row_reads_empty_text(self):
+        document = Document.objects.get(pk=self.create_document().pk)
+
+        self.assertEqual((document.extracted_text, document.summary_text), ('', ''))
+        self.assertFalse(DocumentContent.objects.exists())
+
+    def test_update_fields_text_reaches_content(self):
+        document = self.create_document()
+        document.summary_text = 'A concise summary.'
+        document.page_count = 3
+        document.save(update_fields=['summary_text', 'page_count'])
+
+        document = Document.objects.get(pk=document.pk)
+        self.assertEqual(document.summary_text, 'A concise summary.')
+        self.assertEqual(document.page_count, 3)
+        self.assertEqual(document.content.summary_text_size, len('A concise summary.'))
+
+        document.extracted_text = 'Full text.'
+        document.save(update_fields=['extracted_text'])
+        content = DocumentContent.objects.get(pk=document.pk)
+        self.assertEqual((content.get_text('extracted_text'), content.get_text('summary_text')), ('Full text.', 'A concise summary.'))
+
+    def test_new_content_uses_configured_compression(self):
+        document = self.create_document()
+        with self.settings(DOCUMENT_CONTENT_COMPRESSION='none'):
+            document.extracted_text = 'Plain text.'
+        document.save_content()
+
+        content = DocumentContent.objects.get(pk=document.pk)
+        self.assertEqual(content.compression, 'none')
+        self.assertEqual(bytes(content.extracted_text_data), b'Plain text.')
+
+
+class DocumentContentMigrationTests(TransactionTestCase):
+    """Migration 0008 moves document text into DocumentContent and back"""
+
+    before = [('documents', '0007_documentstagecheckpoint')]
+    after = [('documents', '0008_documentcontent')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_text_is_moved_both_ways(self):
+        apps = self.migrate(self.before)
+        user = apps.get_model('users', 'User').objects.create(username='legacy', email='legacy@example.com')
+        Document = apps.get_model('documents', 'Document')
+        with_text = Document.objects.create(
+            user=user, title='Old', file='documents/old.txt', file_type='txt', file_size=1,
+            original_filename='old.txt', extracted_text='Old extracted text.', summary_text='Old summary.'
+        )
+        without_text = Document.objects.create(
+            user=user, title='Empty', file='documents/empty.txt', file_type='txt', file_size=1, original_filename='empty.txt'
+        )
+
+        apps = self.migrate(self.after)
+        contents = apps.get_model('documents', 'DocumentContent').objects.all()
+        self.assertEqual([content.document_id for content in contents], [with_text.pk])
+        self.assertEqual(
+            (decompress_text(contents[0].extracted_text_data, 'zlib'), decompress_text(contents[0].summary_text_data, 'zlib')),
+            ('Old extracted text.', 'Old summary.')
+        )
+
+        apps = self.migrate(self.before)
+        Document = apps.get_model('documents', 'Document')
+        self.assertEqual(
+            list(Document.objects.order_by('pk').values_list('extracted_text', 'summary_text')),
+            [('Old extracted text.', 'Old summary.'), ('', '')]
+        )
+        self.assertEqual(Document.objects.get(pk=without_text.pk).title, 'Empty')
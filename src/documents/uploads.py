@@ -0,0 +1,136 @@
+"""
+Streaming document uploads
+
+The document upload views install DocumentUploadHandler ahead of Django's
+memory and temporary-file handlers (see install_upload_handler). Every
+uploaded file is written to a temporary file in chunk_size pieces while
+its SHA-256 is updated and its first bytes are matched against known file
+signatures, so memory per upload stays flat whatever the file size. Once a
+request's body or streamed file exceeds Document.MAX_FILE_SIZE nothing
+more is stored; the rest of the body is discarded so the view can still
+respond, and the reason is left on the request (see get_upload_error).
+"""
+import hashlib
+import logging
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+logger = logging.getLogger(__name__)
+
+# Bytes inspected for a file signature
+SNIFF_BYTES = 512
+
+# Allowance for the non-file form fields when checking the request size
+FORM_FIELDS_ALLOWANCE = 1024 * 1024  # 1MB
+
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+PPTX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+
+# MIME type each allowed extension must sniff as
+EXPECTED_MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'docx': DOCX_MIME_TYPE,
+    'pptx': PPTX_MIME_TYPE,
+    'txt': 'text/plain',
+}
+
+# Office Open XML formats are zip archives and are told apart by extension
+ZIP_MIME_TYPES = {
+    'docx': DOCX_MIME_TYPE,
+    'pptx': PPTX_MIME_TYPE,
+}
+
+
+def sniff_mime_type(head: bytes, file_name: str = '') -> str:
+    """MIME type from the leading bytes of a file"""
+    extension = file_name.rsplit('.', 1)[-1].lower() if '.' in file_name else ''
+
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    if head.startswith(b'PK\x03\x04'):
+        return ZIP_MIME_TYPES.get(extension, 'application/zip')
+    if head and b'\x00' not in head:
+        return 'text/plain'
+    return 'application/octet-stream'
+
+
+def upload_sha256(uploaded_file) -> str:
+    """SHA-256 of an uploaded file, computed while streaming when possible"""
+    content_hash = getattr(uploaded_file, 'sha256', None)
+    if content_hash:
+        return content_hash
+
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def upload_mime_type(uploaded_file) -> str:
+    """Sniffed MIME type of an uploaded file, detected while streaming when possible"""
+    mime_type = getattr(uploaded_file, 'mime_type', None)
+    if mime_type:
+        return mime_type
+
+    uploaded_file.seek(0)
+    head = uploaded_file.read(SNIFF_BYTES)
+    uploaded_file.seek(0)
+    return sniff_mime_type(head, uploaded_file.name or '')
+
+
+def install_upload_handler(request) -> None:
+    """Stream request's uploads through DocumentUploadHandler; call before its body is parsed"""
+    request.upload_handlers.insert(0, DocumentUploadHandler(request))
+
+
+def get_upload_error(request):
+    """Why DocumentUploadHandler stopped the request's upload, if it did"""
+    return getattr(request, 'upload_error', None)
+
+
+class DocumentUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to disk, hashing and sniffing them and enforcing Document.MAX_FILE_SIZE"""
+
+    chunk_size = 64 * 2 ** 10  # 64KB
+
+    def __init__(self, request=None):
+        from .models import Document
+
+        super().__init__(request)
+        self.max_size = Document.MAX_FILE_SIZE
+        self.request_too_large = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # The body holds the file, so a larger body is rejected before any of it is read
+        self.request_too_large = content_length > self.max_size + FORM_FIELDS_ALLOWANCE
+        return None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        if self.request_too_large:
+            self._reject()
+        self.digest = hashlib.sha256()
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > self.max_size:
+            self._reject()
+
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.sha256 = self.digest.hexdigest()
+        uploaded_file.mime_type = sniff_mime_type(self.head, self.file_name or '')
+        return uploaded_file
+
+    def _reject(self):
+        message = f'File size exceeds maximum limit of {self.max_size // (1024 * 1024)}MB.'
+        if self.request is not None:
+            self.request.upload_error = message
+        logger.info(f"Stopped upload of {self.file_name}: {message}")
+        # The parser closes, and so removes, the temporary file and reads past the rest of the body
+        raise StopUpload()
@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.http import Http404, JsonResponse
 from django.contrib import messages
 from django.core.paginator import Paginator
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
@@ -12,6 +13,8 @@ from .serializers import (
     DocumentSerializer, DocumentListSerializer, AudioSummarySerializer,
     QuestionSerializer, QuestionCreateSerializer, DocumentShareSerializer
 )
+from .stats import DocumentStatsService
+from .uploads import get_upload_error, install_upload_handler
 
 
 # Web Views
@@ -32,17 +35,15 @@ def dashboard(request):
         documents = documents.filter(title__icontains=search_query)
     
     # Pagination
-    paginator = Paginator(documents, 10)
+    paginator = Paginator(documents.with_audio_info(), 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Statistics
-    stats = {
-        'total_documents': documents.count(),
-        'completed_documents': documents.filter(status='completed').count(),
-        'processing_documents': documents.filter(status__in=['uploaded', 'processing']).count(),
-        'failed_documents': documents.filter(status__in=['failed', 'error']).count(),
-    }
+    # Statistics (cached for the unfiltered dashboard)
+    if status_filter or search_query:
+        stats = DocumentStatsService.aggregate(documents)
+    else:
+        stats = DocumentStatsService().get_stats(user)
     
     context = {
         'documents': page_obj,
@@ -78,9 +79,17 @@ def document_detail(request, document_id):
     return render(request, 'documents/detail.html', context)
 
 
+@csrf_exempt
 @login_required
 def upload_document(request):
     """Document upload view"""
+    # The CSRF check reads request.POST, so the handler goes in first and the check follows
+    install_upload_handler(request)
+    return _upload_document(request)
+
+
+@csrf_protect
+def _upload_document(request):
     if request.method == 'POST':
         # Handle file upload via AJAX or form
         if request.FILES.get('file'):
@@ -152,7 +161,7 @@ def upload_document(request):
                     messages.error(request, error_msg)
                     return render(request, 'documents/upload.html')
         else:
-            error_msg = 'No file selected for upload.'
+            error_msg = get_upload_error(request) or 'No file selected for upload.'
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'error': error_msg}, status=400)
             else:
@@ -175,13 +184,19 @@ class DocumentListCreateView(generics.ListCreateAPIView):
     parser_classes = [MultiPartParser, FormParser]
     
     def get_queryset(self):
-        return Document.objects.filter(user=self.request.user)
+        return Document.objects.filter(user=self.request.user).with_audio_info()
     
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return DocumentListSerializer
         return DocumentSerializer
     
+    def initialize_request(self, request, *args, **kwargs):
+        if request.method == 'POST':
+            # Ahead of authentication, whose CSRF check may parse the body
+            install_upload_handler(request)
+        return super().initialize_request(request, *args, **kwargs)
+    
     def create(self, request, *args, **kwargs):
         # Check if user can upload more documents
         if not request.user.can_upload_document:
@@ -190,6 +205,11 @@ class DocumentListCreateView(generics.ListCreateAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        request.data  # force parsing so the upload handler runs
+        upload_error = get_upload_error(request)
+        if upload_error:
+            return Response({'error': upload_error}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
         return super(DocumentListCreateView, self).create(request, *args, **kwargs)
     
     def perform_create(self, serializer):
@@ -209,7 +229,7 @@ class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Document.objects.filter(user=self.request.user)
+        return Document.objects.filter(user=self.request.user).select_related('content')
 
 
 class DocumentAudioView(generics.RetrieveAPIView):
@@ -329,7 +349,8 @@ def shared_document_view(request, share_token):
         share.increment_access_count()
         
         # Return document data based on permissions
-        document_data = DocumentListSerializer(share.document).data
+        document = Document.objects.with_audio_info().get(pk=share.document_id)
+        document_data = DocumentListSerializer(document).data
         
         # Remove sensitive fields for shared view
         allowed_fields = ['id', 'title', 'description', 'summary_text', 'created_at']
@@ -357,15 +378,9 @@ def shared_document_view(request, share_token):
 def user_stats(request):
     """API endpoint for user document statistics"""
     user = request.user
-    documents = Document.objects.filter(user=user)
     
     stats = {
-        'total_documents': documents.count(),
-        'completed_documents': documents.filter(status='completed').count(),
-        'processing_documents': documents.filter(status__in=['uploaded', 'processing']).count(),
-        'failed_documents': documents.filter(status__in=['failed', 'error']).count(),
-        'total_questions_asked': sum(doc.total_questions_asked for doc in documents),
-        'total_audio_plays': sum(doc.audio_play_count for doc in documents),
+        **DocumentStatsService().get_stats(user),
         'monthly_usage': {
             'documents_uploaded': user.documents_uploaded_this_month,
             'questions_asked': user.questions_asked_this_month,
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.db import close_old_connections
+from django.utils import timezone
+from documents.models import Document, Question
+from documents.serializers import QuestionSerializer
+from .events import processing_snapshot, user_group_name
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionStreamConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams answers to questions about a document token by token
+    
+    Client sends {"question": "...", "audio_timestamp": 12} and receives
+    "answer.delta" events while the answer is generated, followed by one
+    "answer.completed" event with the saved question. If the client
+    disconnects mid-answer, generation is stopped.
+    """
+    
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        
+        if not user.has_realtime_qa:
+            await self.close(code=4403)
+            return
+        
+        self.document = await self._get_document(user, self.scope['url_route']['kwargs']['document_id'])
+        if self.document is None:
+            await self.close(code=4404)
+            return
+        
+        self.streaming = False
+        self.stream_task = None
+        self.stream_cancelled = threading.Event()
+        await self.accept()
+    
+    async def disconnect(self, code):
+        if getattr(self, 'stream_task', None) is not None:
+            # Stops the producer thread at its next delta, and with it the model call
+            self.stream_cancelled.set()
+            self.stream_task.cancel()
+    
+    async def receive_json(self, content, **kwargs):
+        if self.streaming:
+            await self.send_json({'type': 'error', 'message': 'A question is already being answered.'})
+            return
+        
+        question_text = (content.get('question') or '').strip()
+        if len(question_text) < 3:
+            await self.send_json({'type': 'error', 'message': 'Question must be at least 3 characters long.'})
+            return
+        
+        user = self.scope['user']
+        if not await database_sync_to_async(lambda: user.can_ask_question)():
+            await self.send_json({
+                'type': 'error',
+                'message': f'Monthly question limit of {user.monthly_question_limit} questions reached.'
+            })
+            return
+        
+        # Answer in a task so the consumer keeps receiving, and sees a disconnect mid-answer
+        self.streaming = True
+        self.stream_cancelled.clear()
+        self.stream_task = asyncio.create_task(
+            self._run_stream(user, question_text, content.get('audio_timestamp'))
+        )
+    
+    async def _run_stream(self, user, question_text, audio_timestamp):
+        try:
+            await self._stream_answer(user, question_text, audio_timestamp)
+        finally:
+            self.streaming = False
+            self.stream_task = None
+    
+    async def _stream_answer(self, user, question_text, audio_timestamp):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        self.started_at = timezone.now()
+        
+        def produce():
+            # Runs in a worker thread; the OpenAI client is synchronous. Its ORM
+            # work gets the connection handling database_sync_to_async would give it
+            close_old_connections()
+            events = None
+            try:
+                events = self._answer_events(user, question_text, audio_timestamp)
+                for event in events:
+                    if self.stream_cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, event)
+            except Exception as e:
+                logger.error(f"Streaming answer failed for document {self.document.id}: {str(e)}")
+                loop.call_soon_threadsafe(queue.put_nowait, {'type': 'error', 'message': str(e)})
+            finally:
+                if events is not None:
+                    # Closing the generator closes the model response stream
+                    events.close()
+                close_old_connections()
+                if not loop.is_closed():
+                    loop.call_soon_threadsafe(queue.put_nowait, None)
+        
+        producer = loop.run_in_executor(None, produce)
+        
+        while True:
+            event = await queue.get()
+            if event is None:
+                break
+            
+            if event['type'] == 'delta':
+                await self.send_json({'type': 'answer.delta', 'delta': event['text']})
+            elif event['type'] == 'done':
+                question = await self._save_question(user, question_text, audio_timestamp, event)
+                await self.send_json({'type': 'answer.completed', 'question': question})
+            else:
+                await self.send_json(event)
+        
+        await producer
+    
+    def _answer_events(self, user, question_text, audio_timestamp):
+        from ai_services.registry import get_openai_service
+        from documents.indexing import load_sentence_index, retrieve_context
+        
+        context = retrieve_context(self.document, question_text)
+        try:
+            sentence_index = load_sentence_index(self.document)
+        except Exception as e:
+            logger.warning(f"Failed to load sentence index for document {self.document.id}: {str(e)}")
+            sentence_index = None
+        
+        return get_openai_service().stream_answer(
+            question=question_text,
+            context=context,
+            summary=self.document.summary_text,
+            audio_timestamp=audio_timestamp,
+            user=user,
+            sentence_index=sentence_index,
+            source_text=self.document.extracted_text
+        )
+    
+    @database_sync_to_async
+    def _get_document(self, user, document_id):
+        return Document.objects.filter(
+            id=document_id, user=user, status='completed'
+        ).select_related('content').first()
+    
+    @database_sync_to_async
+    def _save_question(self, user, question_text, audio_timestamp, result):
+        """Persist the answered question in a single insert"""
+        answered_at = timezone.now()
+        question = Question.objects.create(
+            document=self.document,
+            user=user,
+            question_text=question_text,
+            audio_timestamp=audio_timestamp,
+            answer_text=result['answer'],
+            context_snippet=result['context_snippet'],
+            context_offsets=result['context_offsets'],
+            answer_confidence=result['confidence'],
+            azure_request_id=result['request_id'],
+            azure_cost=result['estimated_cost'],
+            is_answered=True,
+            answered_at=answered_at,
+            processing_time=int((answered_at - self.started_at).total_seconds() * 1000)
+        )
+        
+        user.increment_question_count()
+        self.document.increment_question_count()
+        
+        return QuestionSerializer(question).data
+
+
+class DocumentEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes a user's document processing events
+    
+    On connect the client receives the status of its unfinished documents,
+    then every pipeline stage transition, status change and processing log
+    entry as it happens.
+    """
+    
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        
+        self.group_name = user_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        
+        for event in await database_sync_to_async(processing_snapshot)(user.id):
+            await self.send_json(event)
+    
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def document_event(self, message):
+        await self.send_json(message['event'])
@@ -0,0 +1,84 @@
+"""
+Per-user processing events
+
+Pipeline stage transitions, document status changes and ProcessingLog
+entries are published to a channel group per user, which the WebSocket
+consumer and the SSE endpoint relay to the browser.
+"""
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_MESSAGE_TYPE = 'document.event'
+
+
+def user_group_name(user_id) -> str:
+    return f"user_{user_id}_documents"
+
+
+def publish_event(user_id, event: dict) -> None:
+    """Send an event to a user's group once the current transaction commits"""
+    
+    def send():
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                user_group_name(user_id),
+                {'type': EVENT_MESSAGE_TYPE, 'event': event}
+            )
+        except Exception as e:
+            # Events are best effort; clients can always fall back to the API
+            logger.warning(f"Failed to publish {event.get('type')} event for user {user_id}: {str(e)}")
+    
+    transaction.on_commit(send)
+
+
+def document_status_event(document) -> dict:
+    return {
+        'type': 'document.status',
+        'document_id': document.id,
+        'status': document.status,
+        'error_message': document.error_message or '',
+        'processing_completed_at': (
+            document.processing_completed_at.isoformat() if document.processing_completed_at else None
+        ),
+    }
+
+
+def processing_log_event(log) -> dict:
+    return {
+        'type': 'processing.log',
+        'document_id': log.document_id,
+        'step': log.step,
+        'level': log.level,
+        'message': log.message,
+        'details': log.details,
+        'timestamp': log.timestamp.isoformat() if log.timestamp else None,
+    }
+
+
+def stage_event(checkpoint) -> dict:
+    return {
+        'type': 'pipeline.stage',
+        'document_id': checkpoint.document_id,
+        'stage': checkpoint.stage,
+        'status': checkpoint.status,
+    }
+
+
+def processing_snapshot(user_id) -> list:
+    """Current status of a user's unfinished documents, sent when a client connects"""
+    from documents.models import Document
+    
+    return [
+        {'type': 'document.status', 'document_id': document_id, 'status': status,
+         'error_message': '', 'processing_completed_at': None}
+        for document_id, status in Document.objects.filter(
+            user_id=user_id, status__in=['uploaded', 'processing']
+        ).values_list('id', 'status')
+    ]
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/documents/events/', consumers.DocumentEventsConsumer.as_asgi()),
+    path('ws/documents/<int:document_id>/questions/', consumers.QuestionStreamConsumer.as_asgi()),
+]
@@ -1,3 +1,102 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+
+from documents.models import Document, Question
+from .routing import websocket_urlpatterns
+
+
+class StubAnswerService:
+    """Stands in for the OpenAI service, streaming a fixed answer"""
+
+    def __init__(self, deltas, hold=None):
+        self.deltas = deltas
+        # When set, the stream pauses after its first delta until hold is set
+        self.hold = hold
+        self.closed = threading.Event()
+
+    def stream_answer(self, **kwargs):
+        try:
+            for index, delta in enumerate(self.deltas):
+                yield {'type': 'delta', 'text': delta}
+                if self.hold is not None and index == 0:
+                    self.hold.wait(5)
+            yield {
+                'type': 'done', 'answer': ''.join(self.deltas), 'context_snippet': '', 'context_offsets': [],
+                'confidence': 0.9, 'request_id': 'req-1', 'estimated_cost': 0,
+            }
+        except GeneratorExit:
+            self.closed.set()
+            raise
+
+
+class QuestionStreamConsumerTests(TransactionTestCase):
+    """Answers stream over the websocket, and stop when the client goes away"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='streamer', email='streamer@example.com', password='password', subscription_tier='pro'
+        )
+        # bulk_create skips the post_save handlers that start processing
+        self.document = Document.objects.bulk_create([Document(
+            user=self.user, title='Physics', file='documents/physics.txt', file_type='txt',
+            file_size=100, original_filename='physics.txt', status='completed'
+        )])[0]
+        self.document.extracted_text = 'Energy is conserved in a closed system.'
+        self.document.save_content()
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/documents/{self.document.id}/questions/'
+        )
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def stub(self, service):
+        return mock.patch('ai_services.registry.get_openai_service', return_value=service)
+
+    def test_answer_is_streamed_and_saved(self):
+        service = StubAnswerService(['Energy ', 'is conserved.'])
+
+        async def ask():
+            communicator = await self.connect()
+            await communicator.send_json_to({'question': 'What is conserved?'})
+            events = [await communicator.receive_json_from(timeout=5) for _ in range(3)]
+            await communicator.disconnect()
+            return events
+
+        with self.stub(service), mock.patch('realtime.consumers.close_old_connections') as close_old_connections:
+            events = async_to_sync(ask)()
+
+        self.assertEqual([event['type'] for event in events], ['answer.delta', 'answer.delta', 'answer.completed'])
+        self.assertEqual(events[2]['question']['answer_text'], 'Energy is conserved.')
+        self.assertTrue(Question.objects.filter(document=self.document, is_answered=True).exists())
+        # Once before and once after the worker thread's ORM work
+        self.assertEqual(close_old_connections.call_count, 2)
+
+    def test_disconnect_stops_generation(self):
+        hold = threading.Event()
+        service = StubAnswerService(['Energy ', 'is conserved.'], hold=hold)
+
+        async def ask_and_leave():
+            communicator = await self.connect()
+            await communicator.send_json_to({'question': 'What is conserved?'})
+            first = await communicator.receive_json_from(timeout=5)
+            await communicator.disconnect()
+            hold.set()
+            await sync_to_async(service.closed.wait)(5)
+            return first
+
+        with self.stub(service):
+            first = async_to_sync(ask_and_leave)()
+
+        self.assertEqual(first, {'type': 'answer.delta', 'delta': 'Energy '})
+        self.assertTrue(service.closed.is_set())
+        self.assertFalse(Question.objects.exists())
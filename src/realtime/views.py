@@ -1,3 +1,49 @@
-from django.shortcuts import render
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.http import HttpResponse, StreamingHttpResponse
+from .events import processing_snapshot, user_group_name
 
-# Create your views here.
+# Comment line sent when idle so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+
+def _format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def document_events(request):
+    """Server-sent events fallback for clients that cannot open a WebSocket"""
+    
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return HttpResponse(status=503)
+    
+    async def stream():
+        channel_name = await channel_layer.new_channel()
+        group_name = user_group_name(user.id)
+        await channel_layer.group_add(group_name, channel_name)
+        
+        try:
+            for event in await sync_to_async(processing_snapshot)(user.id):
+                yield _format_event(event)
+            
+            while True:
+                try:
+                    message = await asyncio.wait_for(channel_layer.receive(channel_name), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_event(message['event'])
+        finally:
+            await channel_layer.group_discard(group_name, channel_name)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response